@@ -0,0 +1,179 @@
+"""
+Benchmark round trips to a local echo server.
+
+Starts the echo server from ``tests/socket_fixtures.py`` in a separate
+process, and connects with `WebSocket.connect`. For each kind of
+traffic, reports messages and MB per second with several messages in
+flight, and the p50 / p99 round trip latency with one message in
+flight. No network access is required.
+
+Run with::
+
+    python benchmarks/echo.py
+
+Pass ``--fast-parser`` or ``--queue-writes`` to compare options, and
+``-k`` to select traffic by name.
+
+"""
+
+from __future__ import print_function
+
+import argparse
+from collections import deque
+import multiprocessing
+import os
+import socket
+import sys
+import time
+from timeit import default_timer
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tests'))
+
+from lomond.websocket import WebSocket  # noqa: E402
+from socket_fixtures import get_free_port, LocalEchoServer  # noqa: E402
+
+
+# Maximum bytes in flight, so that neither end blocks on a full socket
+WINDOW_BYTES = 512 * 1024
+MAX_WINDOW = 64
+
+# Name, text, payload size, compress, fragment size
+TRAFFIC = [
+    ('text 64 B', True, 64, False, None),
+    ('binary 1 KiB', False, 1024, False, None),
+    ('binary 64 KiB', False, 64 * 1024, False, None),
+    ('compressed text 4 KiB', True, 4 * 1024, True, None),
+    ('fragmented 256 KiB', False, 256 * 1024, False, 16 * 1024),
+]
+
+
+def serve(port):
+    """Run the echo server until the process is terminated."""
+    server = LocalEchoServer(port)
+    server.start()
+    while True:
+        time.sleep(60)
+
+
+def wait_for_server(port, timeout=10.0):
+    start = time.time()
+    while time.time() - start < timeout:
+        try:
+            socket.create_connection(('127.0.0.1', port), 1.0).close()
+        except socket.error:
+            time.sleep(0.05)
+        else:
+            return
+    raise RuntimeError('echo server failed to start')
+
+
+def make_payload(text, size):
+    if text:
+        return ('{"price": 43210.12} ' * (size // 20 + 1))[:size]
+    return (b'\x00\x01\x02\x03' * (size // 4 + 1))[:size]
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, int(len(values) * percent / 100.0))
+    return values[index]
+
+
+def echo(url, traffic, count, window, options):
+    """Send `count` messages, with up to `window` in flight. Return
+    elapsed time and a list of round trip times.
+
+    """
+    _name, text, size, compress, fragment_size = traffic
+    websocket = WebSocket(
+        url,
+        proxies={},
+        compress=compress,
+        fragment_size=fragment_size,
+        fast_parser=options.fast_parser
+    )
+    payload = make_payload(text, size)
+    send = websocket.send_text if text else websocket.send_binary
+    send_times = deque()
+    round_trips = []
+    sent = 0
+    start = None
+    elapsed = None
+
+    for event in websocket.connect(
+        poll=60, ping_rate=0, queue_writes=options.queue_writes
+    ):
+        if event.name == 'ready':
+            start = default_timer()
+            while sent < min(window, count):
+                send_times.append(default_timer())
+                send(payload)
+                sent += 1
+        elif event.name in ('text', 'binary'):
+            now = default_timer()
+            round_trips.append(now - send_times.popleft())
+            if len(round_trips) == count:
+                elapsed = now - start
+                websocket.close()
+            elif sent < count:
+                send_times.append(default_timer())
+                send(payload)
+                sent += 1
+        elif event.name in ('connect_fail', 'rejected'):
+            raise RuntimeError('unable to connect; {}'.format(event))
+    if elapsed is None:
+        raise RuntimeError('disconnected before all messages were echoed')
+    return elapsed, round_trips
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(description='Echo benchmark')
+    parser.add_argument(
+        '--count', type=int, default=2000, help='messages per run'
+    )
+    parser.add_argument(
+        '--fast-parser', action='store_true', help='use the fast parser'
+    )
+    parser.add_argument(
+        '--queue-writes', action='store_true', help='queue writes'
+    )
+    parser.add_argument(
+        '-k', dest='keyword', default='',
+        help='only run traffic containing this string'
+    )
+    options = parser.parse_args(argv)
+
+    port = get_free_port()
+    server = multiprocessing.Process(target=serve, args=(port,))
+    server.daemon = True
+    server.start()
+    try:
+        wait_for_server(port)
+        url = 'ws://127.0.0.1:{}/'.format(port)
+        print('{:<24}{:>8}{:>12}{:>10}{:>10}{:>10}'.format(
+            'traffic', 'window', 'msgs/s', 'MB/s', 'p50 ms', 'p99 ms'
+        ))
+        for traffic in TRAFFIC:
+            name, _text, size = traffic[:3]
+            if options.keyword not in name:
+                continue
+            count = max(100, min(options.count, (256 * 1024 * 1024) // size))
+            window = max(1, min(MAX_WINDOW, WINDOW_BYTES // size))
+            elapsed, _ = echo(url, traffic, count, window, options)
+            _, round_trips = echo(url, traffic, min(count, 1000), 1, options)
+            print('{:<24}{:>8}{:>12.0f}{:>10.1f}{:>10.3f}{:>10.3f}'.format(
+                name,
+                window,
+                count / elapsed,
+                count * size / elapsed / 1e6,
+                percentile(round_trips, 50) * 1000.0,
+                percentile(round_trips, 99) * 1000.0
+            ))
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,73 @@
+"""
+Benchmark parsing streams of small frames.
+
+Reports frames per second for the coroutine `FrameParser` and the state
+machine `FastFrameParser`, with the stream fed in 64K chunks (as the
+session reads it from the socket).
+
+Run with::
+
+    python benchmarks/frame_parser.py
+
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+from timeit import default_timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lomond.frame import Frame  # noqa: E402
+from lomond.frame_parser import (  # noqa: E402
+    ClientFrameParser,
+    FastClientFrameParser
+)
+from lomond.opcode import Opcode  # noqa: E402
+
+
+FRAME_COUNT = 200000
+FEED_SIZE = 64 * 1024
+PAYLOADS = [
+    ('binary 0 B', Opcode.BINARY, b''),
+    ('binary 16 B', Opcode.BINARY, b'\x00' * 16),
+    ('text 64 B', Opcode.TEXT, b'{"symbol": "BTC-USD", "price": 43210.12}'),
+    ('binary 1 KiB', Opcode.BINARY, b'\x00' * 1024),
+]
+
+
+def make_stream(opcode, payload):
+    frame = Frame(opcode, payload, mask=False).to_bytes()
+    count = max(1, min(FRAME_COUNT, (16 * 1024 * 1024) // len(frame)))
+    return frame * count, count
+
+
+def bench(parser_class, data, count):
+    parser = parser_class(parse_headers=False)
+    view = memoryview(data)
+    parsed = 0
+    start = default_timer()
+    for pos in range(0, len(data), FEED_SIZE):
+        for _frame in parser.feed(view[pos:pos + FEED_SIZE]):
+            parsed += 1
+    elapsed = default_timer() - start
+    assert parsed == count
+    return count / elapsed
+
+
+def run():
+    print('{:<16}{:>16}{:>16}{:>10}'.format(
+        'frames', 'FrameParser/s', 'Fast/s', 'speedup'
+    ))
+    for name, opcode, payload in PAYLOADS:
+        data, count = make_stream(opcode, payload)
+        slow = bench(ClientFrameParser, data, count)
+        fast = bench(FastClientFrameParser, data, count)
+        print('{:<16}{:>16.0f}{:>16.0f}{:>9.1f}x'.format(
+            name, slow, fast, fast / slow
+        ))
+
+
+if __name__ == "__main__":
+    run()
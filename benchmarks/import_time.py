@@ -0,0 +1,74 @@
+"""
+Benchmark the time taken to import lomond.
+
+Each import is timed in a fresh interpreter, and the median of several
+runs is reported. On Python 3.7+ the time spent in each lomond module
+(excluding its imports) is reported, via ``-X importtime``.
+
+Run with::
+
+    python benchmarks/import_time.py
+
+"""
+
+from __future__ import print_function
+
+import os
+import subprocess
+import sys
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+TIME_IMPORT = (
+    "from timeit import default_timer;"
+    "start = default_timer();"
+    "import lomond;"
+    "print(default_timer() - start)"
+)
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def time_import():
+    """Time import lomond, return seconds and a dict of self times."""
+    args = [sys.executable]
+    if sys.version_info >= (3, 7):
+        args += ['-X', 'importtime']
+    args += ['-c', TIME_IMPORT]
+    process = subprocess.Popen(
+        args, cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    stdout, stderr = process.communicate()
+    module_times = {}
+    for line in stderr.decode('utf-8').splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        module = fields[2].strip()
+        if module.startswith('lomond') and fields[0].strip().isdigit():
+            module_times[module] = int(fields[0]) / 1e6
+    return float(stdout.strip()), module_times
+
+
+def run(runs=21):
+    totals = []
+    module_times = {}
+    for _ in range(runs):
+        total, times = time_import()
+        totals.append(total)
+        for module, module_time in times.items():
+            module_times.setdefault(module, []).append(module_time)
+    for module in sorted(module_times):
+        print('{:<24}{:>8.2f}ms'.format(
+            module, median(module_times[module]) * 1000
+        ))
+    print('{:<24}{:>8.2f}ms'.format('import lomond', median(totals) * 1000))
+
+
+if __name__ == "__main__":
+    run()
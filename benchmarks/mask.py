@@ -0,0 +1,87 @@
+"""
+Benchmark payload masking.
+
+Reports MB/s for each masking method, and for the method picked by
+`mask_payload`, against the original strided translate implementation.
+
+Run with::
+
+    python benchmarks/mask.py
+
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lomond import mask  # noqa: E402
+
+
+SIZES = [
+    ('64 B', 64),
+    ('4 KiB', 4 * 1024),
+    ('1 MiB', 1024 * 1024),
+    ('64 MiB', 64 * 1024 * 1024),
+]
+
+
+def original(masking_key, data):
+    """The table based implementation prior to mask_payload selecting
+    a method by size.
+
+    """
+    a, b, c, d = (mask._get_xor_table(n) for n in bytearray(masking_key))
+    data[::4] = data[::4].translate(a)
+    data[1::4] = data[1::4].translate(b)
+    data[2::4] = data[2::4].translate(c)
+    data[3::4] = data[3::4].translate(d)
+
+
+def get_methods():
+    methods = [
+        ('original', original),
+        ('translate', mask._mask_translate),
+        ('translate_blocks', mask._mask_translate_blocks),
+    ]
+    if hasattr(int, 'from_bytes'):
+        methods.append(('int', mask._mask_int))
+    if mask._get_numpy() is not None:
+        methods.append(('numpy', mask._mask_numpy))
+    methods.append(('mask_payload', mask.mask_payload))
+    return methods
+
+
+def bench(method, size, min_time=0.2):
+    """Return throughput in MB/s."""
+    masking_key = mask.make_masking_key()
+    data = bytearray(os.urandom(size))
+    number = 1
+    while True:
+        elapsed = timeit.timeit(
+            lambda: method(masking_key, data), number=number
+        )
+        if elapsed >= min_time:
+            break
+        number *= 2
+    return size * number / elapsed / 1e6
+
+
+def run():
+    methods = get_methods()
+    print('{:<18}'.format('method') + ''.join(
+        '{:>12}'.format(label) for label, _size in SIZES
+    ))
+    for name, method in methods:
+        results = [bench(method, size) for _label, size in SIZES]
+        print('{:<18}'.format(name) + ''.join(
+            '{:>12.1f}'.format(result) for result in results
+        ))
+    print('(MB/s)')
+
+
+if __name__ == "__main__":
+    run()
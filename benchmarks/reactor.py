@@ -0,0 +1,186 @@
+"""
+Benchmark many idle websockets on a reactor.
+
+Connects 1k, 5k and 10k websockets to a local server (run in a separate
+process), and reports the memory used by the client and the CPU time
+spent by the reactor while the connections are idle.
+
+Run with::
+
+    python benchmarks/reactor.py
+
+The number of connections is limited by the maximum number of open
+files; raise the hard limit (e.g. ``ulimit -Hn``) to test more.
+
+"""
+
+from __future__ import print_function
+
+import base64
+import hashlib
+import multiprocessing
+import os
+import selectors
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lomond.reactor import Reactor  # noqa: E402
+from lomond.websocket import WebSocket  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+
+COUNTS = [1000, 5000, 10000]
+IDLE_TIME = 10.0
+GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+def raise_file_limit():
+    """Raise the soft limit on open files, return the limit."""
+    if resource is None:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY:
+        hard = 65536
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+def get_rss():
+    """Get the resident memory of this process, in bytes."""
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError):
+        # ru_maxrss is in KiB on Linux, bytes on MacOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def handshake_response(request):
+    """Build a response to upgrade a websocket request."""
+    for line in request.split(b'\r\n'):
+        name, _, value = line.partition(b':')
+        if name.strip().lower() == b'sec-websocket-key':
+            key = value.strip()
+            break
+    else:
+        return None
+    accept = base64.b64encode(hashlib.sha1(key + GUID).digest())
+    return (
+        b'HTTP/1.1 101 Switching Protocols\r\n'
+        b'Upgrade: websocket\r\n'
+        b'Connection: Upgrade\r\n'
+        b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n'
+    )
+
+
+def serve(server_sock):
+    """Accept websockets and leave them idle, until killed."""
+    raise_file_limit()
+    selector = selectors.DefaultSelector()
+    server_sock.setblocking(False)
+    selector.register(server_sock, selectors.EVENT_READ, None)
+    requests = {}
+    while True:
+        for key, _mask in selector.select():
+            if key.data is None:
+                try:
+                    sock, _address = server_sock.accept()
+                except socket.error:
+                    continue
+                sock.setblocking(False)
+                requests[sock] = b''
+                selector.register(sock, selectors.EVENT_READ, sock)
+                continue
+            sock = key.data
+            try:
+                data = sock.recv(4096)
+            except socket.error:
+                data = b''
+            if not data:
+                selector.unregister(sock)
+                requests.pop(sock, None)
+                sock.close()
+                continue
+            if sock in requests:
+                request = requests[sock] + data
+                if b'\r\n\r\n' in request:
+                    del requests[sock]
+                    sock.sendall(handshake_response(request))
+                else:
+                    requests[sock] = request
+
+
+def bench(port, count):
+    """Connect `count` websockets, return (rss, cpu seconds per second)."""
+    ready = [0]
+    failed = [0]
+
+    def on_event(event):
+        if event.name == 'ready':
+            ready[0] += 1
+        elif event.name in ('connect_fail', 'rejected', 'disconnected'):
+            failed[0] += 1
+
+    reactor = Reactor()
+    thread = reactor.start()
+    start_rss = get_rss()
+    url = 'ws://127.0.0.1:{}/'.format(port)
+    for _ in range(count):
+        reactor.add(WebSocket(url), callback=on_event, ping_rate=0)
+    while ready[0] + failed[0] < count:
+        time.sleep(0.1)
+    rss = get_rss() - start_rss
+    start_cpu = time.process_time()
+    time.sleep(IDLE_TIME)
+    cpu = (time.process_time() - start_cpu) / IDLE_TIME
+    reactor.stop()
+    thread.join()
+    reactor.close()
+    return ready[0], rss, cpu
+
+
+def run():
+    limit = raise_file_limit()
+    server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server_sock.bind(('127.0.0.1', 0))
+    server_sock.listen(1024)
+    port = server_sock.getsockname()[1]
+    server = multiprocessing.Process(target=serve, args=(server_sock,))
+    server.daemon = True
+    server.start()
+    server_sock.close()
+    try:
+        print('{:<14}{:>10}{:>12}{:>16}{:>10}'.format(
+            'connections', 'ready', 'rss (MiB)', 'per conn (KiB)', 'cpu %'
+        ))
+        for count in COUNTS:
+            if limit is not None and count + 64 > limit:
+                print('{:<14}skipped, open file limit is {}'.format(
+                    count, limit
+                ))
+                continue
+            ready, rss, cpu = bench(port, count)
+            print('{:<14}{:>10}{:>12.1f}{:>16.1f}{:>10.2f}'.format(
+                count,
+                ready,
+                rss / (1024.0 * 1024.0),
+                rss / 1024.0 / max(1, ready),
+                cpu * 100.0
+            ))
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,82 @@
+"""
+Benchmark sending many small messages.
+
+Compares messages per second sending messages individually with
+`send_text`, against batches sent with `send_many`. Messages are sent
+over a local socket pair, and drained by a thread.
+
+Run with::
+
+    python benchmarks/send_many.py
+
+"""
+
+from __future__ import print_function
+
+import os
+import socket
+import sys
+import threading
+from timeit import default_timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lomond.session import WebsocketSession  # noqa: E402
+from lomond.websocket import WebSocket  # noqa: E402
+
+
+MESSAGE_COUNT = 20000
+BATCH_SIZES = [10, 100, 1000]
+TICK = u'{"symbol": "BTC-USD", "price": 43210.12, "size": 0.01}'
+
+
+def drain(sock):
+    while sock.recv(1024 * 1024):
+        pass
+
+
+def make_websocket():
+    """Get a websocket with a session connected to a socket pair."""
+    websocket = WebSocket('ws://127.0.0.1/')
+    session = WebsocketSession(websocket)
+    websocket.state.session = session
+    sock, remote_sock = socket.socketpair()
+    session._sock = sock
+    thread = threading.Thread(target=drain, args=(remote_sock,))
+    thread.daemon = True
+    thread.start()
+    return websocket, sock, remote_sock
+
+
+def bench_individual():
+    websocket, sock, remote_sock = make_websocket()
+    start = default_timer()
+    for _ in range(MESSAGE_COUNT):
+        websocket.send_text(TICK)
+    elapsed = default_timer() - start
+    sock.close()
+    return MESSAGE_COUNT / elapsed
+
+
+def bench_send_many(batch_size):
+    websocket, sock, remote_sock = make_websocket()
+    batch = [TICK] * batch_size
+    start = default_timer()
+    for _ in range(MESSAGE_COUNT // batch_size):
+        websocket.send_many(batch)
+    elapsed = default_timer() - start
+    sock.close()
+    return MESSAGE_COUNT / elapsed
+
+
+def run():
+    print('{:<24}{:>12.0f} msgs/s'.format('send_text', bench_individual()))
+    for batch_size in BATCH_SIZES:
+        print('{:<24}{:>12.0f} msgs/s'.format(
+            'send_many ({})'.format(batch_size),
+            bench_send_many(batch_size)
+        ))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmarks for the hot paths, with stored baselines.
+
+Measures frame parsing, masking, building frames, UTF-8 validation,
+compression, and feeding a WebSocket from a socket pair, over a mix of
+message sizes. Each benchmark is timed several times, and the fastest
+time per operation is compared against ``benchmarks/baseline.json``.
+
+Run with::
+
+    python benchmarks/suite.py
+
+Exits with a non-zero status if any benchmark is slower than the
+baseline by more than the threshold (default 25%). Times are compared
+relative to a pure Python calibration loop, to allow for the speed of
+the machine, but baselines are best recorded on the machine and Python
+version they will be compared on. To record a new baseline, run::
+
+    python benchmarks/suite.py --save
+
+"""
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import argparse
+from base64 import b64encode
+from hashlib import sha1
+import json
+import os
+import platform
+import random
+import socket
+import sys
+import threading
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lomond import constants  # noqa: E402
+from lomond.compression import Deflate  # noqa: E402
+from lomond.frame import Frame  # noqa: E402
+from lomond.frame_parser import (  # noqa: E402
+    ClientFrameParser,
+    FastClientFrameParser
+)
+from lomond.mask import mask_payload  # noqa: E402
+from lomond.opcode import Opcode  # noqa: E402
+from lomond.utf8decoder import Utf8Decoder  # noqa: E402
+from lomond.utf8validator import Utf8Validator  # noqa: E402
+from lomond.websocket import WebSocket  # noqa: E402
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+THRESHOLD = 0.25
+REPEAT = 7
+MIN_TIME = 0.2
+FEED_SIZE = 64 * 1024
+
+# Message sizes as (weight, min size, max size)
+SIZE_DISTRIBUTION = [
+    (60, 16, 128),
+    (30, 128, 2048),
+    (9, 2048, 16 * 1024),
+    (1, 64 * 1024, 64 * 1024),
+]
+MESSAGE_COUNT = 1000
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Register a benchmark setup function.
+
+    The function should return a callable to time, and the number of
+    bytes processed per call.
+
+    """
+    def register(setup):
+        BENCHMARKS.append((name, setup))
+        return setup
+    return register
+
+
+def make_text(size, rand):
+    """Make JSON-like text of a given size in bytes."""
+    words = ['"price"', '"size"', '43210.12', '"BTC-USD"', '"été"']
+    text = []
+    length = 0
+    while length < size:
+        word = rand.choice(words)
+        text.append(word)
+        length += len(word.encode('utf-8')) + 1
+    encoded = ' '.join(text).encode('utf-8')[:size]
+    # Don't end part way through a code point
+    return encoded.decode('utf-8', 'ignore').encode('utf-8')
+
+
+def make_messages():
+    """Make a list of (opcode, payload), with a fixed distribution of
+    sizes.
+
+    """
+    rand = random.Random(0)
+    weights = [weight for weight, _, _ in SIZE_DISTRIBUTION]
+    messages = []
+    for _ in range(MESSAGE_COUNT):
+        pick = rand.uniform(0, sum(weights))
+        for weight, min_size, max_size in SIZE_DISTRIBUTION:
+            pick -= weight
+            if pick <= 0:
+                break
+        size = rand.randint(min_size, max_size)
+        if rand.random() < 0.5:
+            messages.append((Opcode.TEXT, make_text(size, rand)))
+        else:
+            payload = bytes(bytearray(
+                rand.getrandbits(8) for _ in range(min(size, 256))
+            ))
+            messages.append(
+                (Opcode.BINARY, (payload * (size // 256 + 1))[:size])
+            )
+    return messages
+
+
+def make_stream(messages):
+    """Encode messages as unmasked frames, as sent by a server."""
+    return b''.join(
+        Frame(opcode, payload, mask=False).to_bytes()
+        for opcode, payload in messages
+    )
+
+
+MESSAGES = make_messages()
+STREAM = make_stream(MESSAGES)
+
+
+def _feed_parser(parser_class):
+    view = memoryview(STREAM)
+
+    def feed():
+        parser = parser_class(parse_headers=False)
+        for pos in range(0, len(view), FEED_SIZE):
+            for _frame in parser.feed(view[pos:pos + FEED_SIZE]):
+                pass
+    return feed, len(STREAM)
+
+
+@benchmark('FrameParser.feed (mixed)')
+def bench_frame_parser():
+    return _feed_parser(ClientFrameParser)
+
+
+@benchmark('FastFrameParser.feed (mixed)')
+def bench_fast_frame_parser():
+    return _feed_parser(FastClientFrameParser)
+
+
+def _mask(size):
+    data = bytearray(os.urandom(size))
+    masking_key = b'\x01\x02\x03\x04'
+    return (lambda: mask_payload(masking_key, data)), size
+
+
+@benchmark('mask_payload (64 B)')
+def bench_mask_small():
+    return _mask(64)
+
+
+@benchmark('mask_payload (4 KiB)')
+def bench_mask_medium():
+    return _mask(4 * 1024)
+
+
+@benchmark('mask_payload (1 MiB)')
+def bench_mask_large():
+    return _mask(1024 * 1024)
+
+
+@benchmark('Frame.build (mixed)')
+def bench_frame_build():
+    build = Frame.build
+    total = sum(len(payload) for _, payload in MESSAGES)
+
+    def build_frames():
+        for opcode, payload in MESSAGES:
+            build(opcode, payload)
+    return build_frames, total
+
+
+def _text_payloads():
+    return [
+        payload for opcode, payload in MESSAGES if opcode == Opcode.TEXT
+    ]
+
+
+# On Python 3 without wsaccel, Utf8Validator is an alias for
+# Utf8Decoder, which is benchmarked below
+if Utf8Validator is not Utf8Decoder:
+    @benchmark('Utf8Validator.validate (mixed)')
+    def bench_utf8_validator():
+        payloads = _text_payloads()[:100]
+
+        def validate():
+            validator = Utf8Validator()
+            for payload in payloads:
+                validator.reset()
+                validator.validate(payload)
+        return validate, sum(len(payload) for payload in payloads)
+
+
+@benchmark('Utf8Decoder.validate (mixed)')
+def bench_utf8_decoder():
+    payloads = _text_payloads()
+
+    def validate():
+        validator = Utf8Decoder()
+        for payload in payloads:
+            validator.reset()
+            validator.validate(payload)
+    return validate, sum(len(payload) for payload in payloads)
+
+
+@benchmark('Deflate.compress (mixed)')
+def bench_compress():
+    payloads = [payload for _, payload in MESSAGES]
+
+    def compress():
+        deflate = Deflate(15, 15, True, True)
+        for payload in payloads:
+            deflate.compress(payload)
+    return compress, sum(len(payload) for payload in payloads)
+
+
+@benchmark('Deflate.decompress (mixed)')
+def bench_decompress():
+    deflate = Deflate(15, 15, True, True)
+    compressed = [
+        [Frame(Opcode.BINARY, deflate.compress(payload), rsv1=1)]
+        for _, payload in MESSAGES
+    ]
+
+    def decompress():
+        inflate = Deflate(15, 15, True, True)
+        for frames in compressed:
+            inflate.decompress(frames)
+    return decompress, sum(len(payload) for _, payload in MESSAGES)
+
+
+def _handshake_response(websocket):
+    accept = b64encode(sha1(websocket.key + constants.WS_KEY).digest())
+    return (
+        b'HTTP/1.1 101 Switching Protocols\r\n'
+        b'Upgrade: websocket\r\n'
+        b'Connection: Upgrade\r\n'
+        b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n'
+    )
+
+
+def _send(sock, data):
+    sock.sendall(data)
+
+
+@benchmark('WebSocket.feed (socketpair)')
+def bench_websocket_feed():
+    buffer = bytearray(FEED_SIZE)
+    view = memoryview(buffer)
+
+    def feed():
+        websocket = WebSocket('ws://127.0.0.1/', proxies={})
+        data = _handshake_response(websocket) + STREAM
+        sock, remote_sock = socket.socketpair()
+        thread = threading.Thread(target=_send, args=(remote_sock, data))
+        thread.start()
+        received = 0
+        try:
+            while received < len(data):
+                count = sock.recv_into(buffer)
+                received += count
+                for _event in websocket.feed(view[:count]):
+                    pass
+        finally:
+            thread.join()
+            sock.close()
+            remote_sock.close()
+    return feed, len(STREAM)
+
+
+def time_benchmark(function):
+    """Get the fastest time for a call to `function`."""
+    timer = timeit.Timer(function)
+    number = 1
+    while timer.timeit(number) < MIN_TIME:
+        number *= 2
+    return min(timer.repeat(REPEAT, number)) / number
+
+
+def calibrate():
+    """Time a fixed pure Python workload, as a measure of machine
+    speed.
+
+    """
+    def work():
+        total = 0
+        for index in range(10000):
+            total += index & 0xff
+        return total
+    return time_benchmark(work)
+
+
+def load_baseline(path):
+    try:
+        with open(path) as baseline_file:
+            return json.load(baseline_file)
+    except (IOError, OSError):
+        return None
+
+
+def get_environment():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+    }
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark lomond')
+    parser.add_argument(
+        '--save', action='store_true', help='save results as the baseline'
+    )
+    parser.add_argument(
+        '--baseline', default=BASELINE_PATH, help='path to baseline JSON'
+    )
+    parser.add_argument(
+        '--threshold', type=float, default=THRESHOLD,
+        help='fail if slower than the baseline by this fraction'
+    )
+    parser.add_argument(
+        '-k', dest='keyword', default='',
+        help='only run benchmarks containing this string'
+    )
+    args = parser.parse_args(argv)
+    if args.save and args.keyword:
+        parser.error('a baseline must be saved with all benchmarks')
+
+    baseline = None if args.save else load_baseline(args.baseline)
+    environment = get_environment()
+    if baseline is not None and baseline.get('environment') != environment:
+        print('warning: baseline was recorded with {!r}'.format(
+            baseline.get('environment')
+        ))
+    baseline_results = (baseline or {}).get('results', {})
+    calibration = calibrate()
+    # Scale baseline times by the relative speed of this machine
+    scale = calibration / (baseline or {}).get('calibration', calibration)
+
+    print('{:<34}{:>12}{:>12}{:>10}'.format(
+        'benchmark', 'time', 'MB/s', 'change'
+    ))
+    results = {}
+    regressions = []
+    for name, setup in BENCHMARKS:
+        if args.keyword not in name:
+            continue
+        function, size = setup()
+        elapsed = time_benchmark(function)
+        results[name] = elapsed
+        change = ''
+        if name in baseline_results:
+            ratio = elapsed / (baseline_results[name] * scale)
+            change = '{:+.0%}'.format(ratio - 1.0)
+            if ratio > 1.0 + args.threshold:
+                regressions.append(name)
+                change += ' !'
+        print('{:<34}{:>10.1f}us{:>12.1f}{:>10}'.format(
+            name, elapsed * 1e6, size / elapsed / 1e6, change
+        ))
+
+    if args.save:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(
+                {
+                    'environment': environment,
+                    'calibration': calibration,
+                    'results': results
+                },
+                baseline_file,
+                indent=2,
+                sort_keys=True
+            )
+            baseline_file.write('\n')
+        print('saved baseline to {}'.format(args.baseline))
+        return 0
+    if regressions:
+        print(
+            '{} benchmark(s) slower than baseline by more than {:.0%}'.format(
+                len(regressions), args.threshold
+            )
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
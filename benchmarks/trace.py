@@ -0,0 +1,126 @@
+"""
+Benchmark the cost of tracing when feeding a WebSocket.
+
+Feeds a stream of small text messages (the worst case for per-message
+overhead) to a WebSocket with tracing disabled, sampled 1 in 100, and
+enabled for every message, and reports the time per message.
+
+With tracing disabled, each trace point is a single check of
+``websocket.tracer``. The check is timed on its own, and multiplied by
+the number of trace points in a feed, to give the overhead of tracing
+as a fraction of the time to feed the stream. The timings of whole
+feeds vary by more than 1% between runs, so can't measure this
+directly.
+
+Run with::
+
+    python benchmarks/trace.py
+
+Exits with a non-zero status if the overhead with tracing disabled is
+1% or more.
+
+"""
+
+from __future__ import print_function
+
+from base64 import b64encode
+from hashlib import sha1
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lomond import constants  # noqa: E402
+from lomond.frame import Frame  # noqa: E402
+from lomond.opcode import Opcode  # noqa: E402
+from lomond.trace import Tracer  # noqa: E402
+from lomond.websocket import WebSocket  # noqa: E402
+
+
+MESSAGE_COUNT = 20000
+FEED_SIZE = 64 * 1024
+REPEAT = 7
+PAYLOAD = b'{"symbol": "BTC-USD", "price": 43210.12}'
+STREAM = Frame(Opcode.TEXT, PAYLOAD, mask=False).to_bytes() * MESSAGE_COUNT
+
+
+def _discard(record):
+    pass
+
+
+def handshake_response(websocket):
+    accept = b64encode(sha1(websocket.key + constants.WS_KEY).digest())
+    return (
+        b'HTTP/1.1 101 Switching Protocols\r\n'
+        b'Upgrade: websocket\r\n'
+        b'Connection: Upgrade\r\n'
+        b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n'
+    )
+
+
+def feed(trace):
+    """Feed the stream to a new websocket, return the number of trace
+    points.
+
+    """
+    websocket = WebSocket('ws://127.0.0.1/', proxies={}, trace=trace)
+    data = handshake_response(websocket) + STREAM
+    view = memoryview(data)
+    feeds = 0
+    for pos in range(0, len(data), FEED_SIZE):
+        feeds += 1
+        for _event in websocket.feed(view[pos:pos + FEED_SIZE]):
+            pass
+    # A message trace per message, and a socket_recv per feed
+    return MESSAGE_COUNT + feeds
+
+
+def time_feed(make_trace):
+    return min(
+        timeit.repeat(lambda: feed(make_trace()), number=1, repeat=REPEAT)
+    )
+
+
+def time_check(count):
+    """Time `count` checks for a tracer, less the time for the loop."""
+    websocket = WebSocket('ws://127.0.0.1/', proxies={})
+    check = timeit.Timer(
+        'for _ in loop:\n    if websocket.tracer is not None: pass',
+        globals={'websocket': websocket, 'loop': range(count)}
+    )
+    empty = timeit.Timer(
+        'for _ in loop:\n    pass',
+        globals={'loop': range(count)}
+    )
+    return max(
+        0.0,
+        min(check.repeat(REPEAT, 1)) - min(empty.repeat(REPEAT, 1))
+    )
+
+
+def run():
+    trace_points = feed(None)
+    disabled = time_feed(lambda: None)
+    sampled = time_feed(lambda: Tracer(_discard, sample_rate=100))
+    enabled = time_feed(lambda: Tracer(_discard))
+    print('{:<24}{:>16}{:>10}'.format('tracing', 'us / message', 'change'))
+    for name, elapsed in [
+        ('disabled', disabled),
+        ('sampled 1 in 100', sampled),
+        ('enabled', enabled),
+    ]:
+        print('{:<24}{:>16.2f}{:>+10.0%}'.format(
+            name,
+            elapsed / MESSAGE_COUNT * 1e6,
+            elapsed / disabled - 1.0
+        ))
+    overhead = time_check(trace_points) / disabled
+    print('overhead with tracing disabled: {:.3%} of feed time'.format(
+        overhead
+    ))
+    return 0 if overhead < 0.01 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(run())
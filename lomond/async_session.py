@@ -0,0 +1,284 @@
+"""
+A session that runs the websocket on an asyncio event loop.
+
+Requires Python 3.7+. This module is only imported by
+:meth:`~lomond.websocket.WebSocket.connect_async`, so that Lomond may
+be used on earlier versions of Python.
+
+"""
+
+import asyncio
+from functools import partial
+import logging
+import socket
+import sys
+
+from six.moves.urllib.parse import urlparse
+
+from . import events
+from . import happy_eyeballs
+from . import proxy
+from .session import (
+    WebsocketSession,
+    _ForceDisconnect,
+    _SocketFail
+)
+
+
+log = logging.getLogger('lomond')
+
+
+class AsyncWebsocketSession(WebsocketSession):
+    """Manages the mechanics of running the websocket with asyncio.
+
+    Data is sent via the asyncio transport, which buffers data rather
+    than blocking, so the WebSocket's send methods may be called from
+    coroutines. To wait for buffered data to be sent, call
+    :meth:`drain`.
+
+    """
+
+    def __init__(self, websocket):
+        super(AsyncWebsocketSession, self).__init__(websocket)
+        self._reader = None
+        self._writer = None
+
+    def __repr__(self):
+        return "<async-ws-session '{}'>".format(self.websocket.url)
+
+    @property
+    def buffered_amount(self):
+        """Get the number of bytes buffered by the transport."""
+        writer = self._writer
+        if writer is None:
+            return 0
+        return writer.transport.get_write_buffer_size()
+
+    async def drain(self):
+        """Wait until the transport's write buffer has drained."""
+        if self._writer is not None:
+            await self._writer.drain()
+
+    def _sendall(self, buffers):
+        """Write buffers to the transport, return the number of bytes."""
+        # Joined, as the transport may keep a reference to buffers
+        # that aren't sent immediately.
+        data = b''.join(buffers)
+        self._writer.write(data)
+        return len(data)
+
+    def _close_socket(self):
+        """Close the transport."""
+        writer = self._writer
+        self._reader = self._writer = self._sock = None
+        if writer is not None:
+            try:
+                writer.close()
+            except Exception as error:
+                log.warning('error closing transport; %s', error)
+
+    async def _open_connection(self, host, port, ssl_context=None):
+        """Open a connection, return a reader and writer."""
+        dns_cache = self.websocket.dns_cache
+        if dns_cache is None:
+            kwargs = {}
+            if sys.version_info >= (3, 8):
+                kwargs['happy_eyeballs_delay'] = self.CONNECTION_ATTEMPT_DELAY
+            return await asyncio.wait_for(
+                asyncio.open_connection(
+                    host,
+                    port,
+                    ssl=ssl_context,
+                    server_hostname=host if ssl_context else None,
+                    **kwargs
+                ),
+                self.CONNECT_TIMEOUT
+            )
+        # Lookups and connects may block, so run in the default executor
+        loop = asyncio.get_event_loop()
+        try:
+            addresses = await loop.run_in_executor(
+                None, dns_cache.resolve, host, port
+            )
+        except socket.error as error:
+            self._socket_fail('unable to connect; {}', error)
+        try:
+            sock = await loop.run_in_executor(
+                None,
+                partial(
+                    happy_eyeballs.connect,
+                    addresses,
+                    attempt_delay=self.CONNECTION_ATTEMPT_DELAY,
+                    timeout=self.CONNECT_TIMEOUT
+                )
+            )
+        except socket.error as error:
+            dns_cache.invalidate(host, port)
+            self._socket_fail('unable to connect; {}', error)
+        return await asyncio.wait_for(
+            asyncio.open_connection(
+                sock=sock,
+                ssl=ssl_context,
+                server_hostname=host if ssl_context else None
+            ),
+            self.CONNECT_TIMEOUT
+        )
+
+    async def _connect_proxy_async(self, proxy_url):
+        """Connect via a http proxy, return a reader and writer."""
+        _proxy_url = urlparse(proxy_url)
+        _port = (
+            int(_proxy_url.port)
+            if _proxy_url.port else
+            (443 if _proxy_url.scheme == 'https' else 80)
+        )
+        reader, writer = await self._open_connection(
+            _proxy_url.hostname,
+            _port,
+            self._create_ssl_context()
+            if _proxy_url.scheme == 'https' else
+            None
+        )
+        writer.write(
+            proxy.build_request(
+                self.websocket.host, self.websocket.port,
+                proxy_username=_proxy_url.username,
+                proxy_password=_proxy_url.password
+            )
+        )
+        proxy_parser = proxy.ProxyParser()
+        response = None
+        while response is None:
+            data = await reader.read(1024)
+            if not data:
+                self._socket_fail('proxy closed connection')
+            for response in proxy_parser.feed(data):
+                break
+        if self.websocket.is_secure:
+            if not hasattr(writer, 'start_tls'):
+                writer.close()
+                self._socket_fail(
+                    'secure connections via a proxy require Python 3.11+'
+                )
+            await writer.start_tls(
+                self._create_ssl_context(),
+                server_hostname=self.websocket.host
+            )
+        return reader, writer
+
+    async def _connect_async(self):
+        """Connect, return a reader, writer and proxy url."""
+        websocket = self.websocket
+        proxy_url = websocket.proxies.get(
+            'https' if websocket.is_secure else 'http'
+        )
+        if proxy_url:
+            reader, writer = await self._connect_proxy_async(proxy_url)
+        else:
+            reader, writer = await self._open_connection(
+                websocket.host,
+                websocket.port,
+                self._create_ssl_context() if websocket.is_secure else None
+            )
+            proxy_url = None
+        return reader, writer, proxy_url
+
+    async def run_async(self,
+                        poll=5,
+                        ping_rate=30,
+                        ping_timeout=None,
+                        auto_pong=True,
+                        close_timeout=None,
+                        adaptive_ping=False):
+        """Run the websocket, as an async generator of events."""
+        self._adaptive_ping = adaptive_ping
+        websocket = self.websocket
+        url = websocket.url
+        # Connecting event
+        yield events.Connecting(url)
+
+        # Open a connection to the remote server
+        try:
+            reader, writer, proxy_url = await self._connect_async()
+        except _SocketFail as error:
+            yield events.ConnectFail('{}'.format(error))
+            return
+        except asyncio.TimeoutError:
+            # The error has no message
+            log.debug('timed out connecting to %s', url)
+            yield events.ConnectFail('connect timed out')
+            return
+        except Exception as error:
+            log.error('error connecting to %s; %s', url, error)
+            yield events.ConnectFail('{}'.format(error))
+            return
+        self._reader = reader
+        self._writer = writer
+        self._sock = writer.get_extra_info('socket')
+
+        # Send the request.
+        try:
+            self._send_request()
+        except Exception as error:
+            self._close_socket()
+            yield events.ConnectFail('request failed; {}'.format(error))
+            return
+
+        # Connected to the server, but not yet upgraded to websockets
+        yield events.Connected(url, proxy=proxy_url)
+
+        def _regular():
+            """Run regular events if websocket is ready."""
+            if self._ready:
+                return self._regular(
+                    poll, ping_rate, ping_timeout, close_timeout
+                )
+            return ()
+
+        try:
+            while not websocket.is_closed:
+                # Wait no longer than the next poll, ping or timeout
+                timeout = self._get_timeout(
+                    poll, ping_rate, ping_timeout, close_timeout
+                )
+                try:
+                    data = await asyncio.wait_for(
+                        reader.read(self.BUFFER_SIZE), timeout
+                    )
+                except asyncio.TimeoutError:
+                    data = None
+                except (OSError, EOFError) as error:
+                    self._socket_fail('recv fail; {}', error)
+                for event in _regular():
+                    yield event
+                if data is None:
+                    continue
+                if not data:
+                    if websocket.is_active:
+                        self._socket_fail('connection lost')
+                    break
+                websocket.metrics.bytes_received += len(data)
+                if websocket.tracer is not None:
+                    websocket.tracer.socket_recv(websocket.url, len(data))
+                if self._adaptive_ping:
+                    self._last_received = self.session_time
+                for event in websocket.feed(data):
+                    self._on_event(event, auto_pong)
+                    yield event
+                    for event in _regular():
+                        yield event
+        except _ForceDisconnect as error:
+            self._close_socket()
+            yield events.Disconnected('disconnected; {}'.format(error))
+        except _SocketFail as error:
+            self._close_socket()
+            yield events.Disconnected('socket fail; {}'.format(error))
+        except Exception as error:  # pragma: no cover
+            log.exception('error in websocket loop')
+            self._close_socket()
+            yield events.Disconnected('error; {}'.format(error))
+        else:
+            self._close_socket()
+            yield events.Disconnected(graceful=True)
+        finally:
+            self._close_socket()
@@ -0,0 +1,67 @@
+"""
+Collects messages to be sent in a single write.
+
+"""
+
+from __future__ import unicode_literals
+
+import six
+
+
+class Batch(object):
+    """A batch of messages to send over a websocket.
+
+    Messages are sent when :meth:`send` is called, or on exiting the
+    context manager (unless there was an exception).
+
+    :param websocket: A :class:`~lomond.websocket.WebSocket` instance.
+    :param bool compress: Send messages in compressed form, if
+        compression is enabled on the server.
+
+    """
+
+    def __init__(self, websocket, compress=True):
+        self.websocket = websocket
+        self.compress = compress
+        self.messages = []
+
+    def __repr__(self):
+        return "<batch {} message(s)>".format(len(self.messages))
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.send()
+
+    def send_text(self, text):
+        """Add a text message to the batch.
+
+        :param str text: Text to send.
+        :raises TypeError: If data is not str (or unicode on Py2).
+
+        """
+        if not isinstance(text, six.text_type):
+            raise TypeError('text argument must not be bytes')
+        self.messages.append(text)
+
+    def send_binary(self, data):
+        """Add a binary message to the batch.
+
+        :param bytes data: Binary data to send.
+        :raises TypeError: If data is not bytes.
+
+        """
+        if not isinstance(data, bytes):
+            raise TypeError('data argument must be bytes')
+        self.messages.append(data)
+
+    def send(self):
+        """Send all messages in the batch."""
+        messages = self.messages
+        self.messages = []
+        self.websocket.send_many(messages, compress=self.compress)
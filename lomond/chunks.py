@@ -0,0 +1,67 @@
+"""
+Read a message in chunks, from a file object or an iterable.
+
+Chunks are generated along with a flag that indicates if the chunk is
+the last in the message, so that each chunk may be sent as a frame.
+
+"""
+
+from __future__ import unicode_literals
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+def read_chunks(source, chunk_size=CHUNK_SIZE):
+    """Read a binary file object in to two buffers, which are reused.
+
+    Yields tuples of ``(<bytearray>, <fin>)``. A buffer is read in to
+    again after the following chunk is yielded, and so must not be
+    referenced after then.
+
+    :param source: A binary file object with a ``readinto`` method.
+    :param int chunk_size: Maximum size of a chunk.
+
+    """
+    buffers = [bytearray(chunk_size), bytearray(chunk_size)]
+
+    def _read(buffer):
+        count = source.readinto(buffer) or 0
+        return buffer if count == chunk_size else buffer[:count]
+
+    index = 0
+    chunk = _read(buffers[index])
+    while chunk:
+        index ^= 1
+        next_chunk = _read(buffers[index])
+        if not next_chunk:
+            break
+        yield chunk, False
+        chunk = next_chunk
+    yield chunk, True
+
+
+def _copy_chunk(chunk):
+    """Get a chunk as bytes, which won't be masked in place."""
+    if isinstance(chunk, bytes):
+        return chunk
+    if isinstance(chunk, memoryview):
+        return chunk.tobytes()
+    return bytes(chunk)
+
+
+def iter_chunks(source):
+    """Iterate over chunks of bytes, skipping empty chunks.
+
+    Yields tuples of ``(<bytes>, <fin>)``. Chunks that aren't bytes
+    (e.g. a bytearray) are copied, as the caller may still use them.
+
+    :param source: An iterable of bytes-like objects.
+
+    """
+    chunks = (_copy_chunk(chunk) for chunk in source if len(chunk))
+    chunk = next(chunks, b'')
+    for next_chunk in chunks:
+        yield chunk, False
+        chunk = next_chunk
+    yield chunk, True
@@ -4,7 +4,7 @@ import zlib
 
 from six import PY2
 
-from .errors import CompressionParameterError
+from .errors import CompressionParameterError, MessageTooLarge
 
 
 class Deflate(object):
@@ -39,6 +39,7 @@ class Deflate(object):
     def reset_decompressor(self):
         """Reset the decompressor for the next frame."""
         self._decompressobj = zlib.decompressobj(-self.decompress_wbits)
+        self._decompressed_size = 0
 
     @classmethod
     def from_options(cls, options):
@@ -66,33 +67,81 @@ class Deflate(object):
             )
         return wbits
 
-    def decompress(self, frames):
-        """Decompress payload, returned decompressed data."""
+    def decompress(self, frames, max_size=None):
+        """Decompress payload, returned decompressed data.
+
+        :raises MessageTooLarge: If the decompressed message would be
+            larger than `max_size` bytes.
+
+        """
+        data = [
+            self.decompress_chunk(frame.payload, max_size=max_size)
+            for frame in frames
+        ]
+        data.append(self.decompress_chunk(b'', fin=True, max_size=max_size))
+        return b''.join(data)
+
+    def decompress_chunk(self, payload, fin=False, max_size=None):
+        """Decompress part of a message, return decompressed data.
+
+        Set `fin` for the last chunk of the message. If `max_size` is
+        set, the total decompressed size of the message is limited to
+        `max_size` bytes.
+
+        :raises MessageTooLarge: If the decompressed message would be
+            larger than `max_size` bytes.
+
+        """
         if PY2:
-            data = [
-                self._decompressobj.decompress(bytes(frame.payload))
-                for frame in frames
-            ]
-        else:
-            data = [
-                self._decompressobj.decompress(frame.payload)
-                for frame in frames
-            ]
-
-        data.append(self._decompressobj.decompress(b"\x00\x00\xff\xff"))
-        payload = b''.join(data)
-        if self.reset_decompress:
+            payload = bytes(payload)
+        data = self._inflate(payload, max_size)
+        if fin:
+            data += self._inflate(b"\x00\x00\xff\xff", max_size)
+            self._decompressed_size = 0
+            if self.reset_decompress:
+                self.reset_decompressor()
+        return data
+
+    def _inflate(self, payload, max_size):
+        """Decompress data, without inflating more than `max_size`
+        bytes for the message.
+
+        """
+        decompressobj = self._decompressobj
+        if max_size is None:
+            return decompressobj.decompress(payload)
+        remaining = max_size - self._decompressed_size
+        # Stop one byte past the limit, so that compressed data can't
+        # inflate to an arbitrary size in memory
+        data = decompressobj.decompress(payload, remaining + 1)
+        if len(data) > remaining or decompressobj.unconsumed_tail:
             self.reset_decompressor()
-        return payload
+            raise MessageTooLarge(
+                'message exceeds max_message_size ({} bytes)',
+                max_size
+            )
+        self._decompressed_size += len(data)
+        return data
 
     def compress(self, payload):
         """Compress payload, return compressed data."""
+        return self.compress_chunk(payload, fin=True)
+
+    def compress_chunk(self, payload, fin=False):
+        """Compress part of a message, return compressed data.
+
+        The compressed chunks of a message may be sent as frames, as
+        they are generated. Set `fin` for the last chunk.
+
+        """
         if PY2:
             payload = bytes(payload)
         data = (
             self._compressobj.compress(payload)
             + self._compressobj.flush(zlib.Z_SYNC_FLUSH)
-        )[:-4]
+        )
+        if not fin:
+            return data
         if self.reset_compress:
             self.reset_compressor()
-        return data
+        return data[:-4]
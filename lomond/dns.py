@@ -0,0 +1,233 @@
+"""
+A cache of DNS lookups, shared by websockets in a process.
+
+``socket.getaddrinfo`` blocks, and is called for every connect. When
+many websockets (re)connect to the same host at once, e.g. after a
+server restart, a :class:`DNSCache` resolves the host once, and
+returns cached addresses until they expire.
+
+"""
+
+from __future__ import unicode_literals
+
+import logging
+import socket
+import threading
+import time
+
+
+log = logging.getLogger('lomond')
+
+try:
+    from monotonic import monotonic as monotonic_time
+except Exception:  # pragma: no cover
+    monotonic_time = getattr(time, 'monotonic', time.time)
+
+
+def getaddrinfo(host, port):
+    """Look up the addresses of a TCP server."""
+    return socket.getaddrinfo(
+        host, port, socket.AF_UNSPEC, socket.SOCK_STREAM
+    )
+
+
+class _Entry(object):
+    """The addresses of a host, or the error from looking them up."""
+
+    __slots__ = ['addresses', 'error', 'expires', 'refresh_at']
+
+    def __init__(self, addresses, error, expires):
+        self.addresses = addresses
+        self.error = error
+        self.expires = expires
+        self.refresh_at = expires
+
+    def get(self):
+        """Get a copy of the addresses, or raise the error."""
+        if self.error is not None:
+            # A new exception, so tracebacks don't accumulate
+            raise self.error.__class__(*self.error.args)
+        return list(self.addresses)
+
+
+class DNSCache(object):
+    """A thread-safe cache of addresses, keyed on host and port.
+
+    :param float ttl: Seconds to cache addresses.
+    :param float negative_ttl: Seconds to cache a failed lookup, or
+        ``0`` to not cache failures.
+    :param float stale_ttl: Seconds after addresses expire that they
+        may still be used, while they are looked up again in a
+        background thread.
+    :param int max_size: Maximum number of hosts to cache.
+    :param resolver: A callable that takes a host and port, and returns
+        a list of addresses in the format of ``socket.getaddrinfo``.
+        Defaults to :func:`getaddrinfo`.
+
+    Concurrent lookups of the same host are combined, so only one
+    thread calls the resolver.
+
+    """
+
+    def __init__(self,
+                 ttl=60.0,
+                 negative_ttl=5.0,
+                 stale_ttl=300.0,
+                 max_size=1024,
+                 resolver=None):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+        self.resolver = resolver or getaddrinfo
+        self._lock = threading.Lock()
+        self._entries = {}
+        # Events for lookups in progress, set when they complete
+        self._lookups = {}
+
+    def __repr__(self):
+        return "<dns-cache {} host(s)>".format(len(self))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def resolve(self, host, port):
+        """Get a list of addresses for a host and port, in the format
+        of ``socket.getaddrinfo``.
+
+        :raises socket.error: If the lookup failed.
+
+        """
+        key = (host, port)
+        with self._lock:
+            entry = self._get_cached(key)
+            if entry is not None:
+                return entry.get()
+            lookup = self._lookups.get(key)
+            if lookup is None:
+                lookup = self._lookups[key] = threading.Event()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            # Another thread is looking up the same host
+            lookup.wait()
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None:
+                return entry.get()
+            return self.resolver(host, port)
+        try:
+            return self._lookup(key).get()
+        finally:
+            with self._lock:
+                del self._lookups[key]
+            lookup.set()
+
+    def invalidate(self, host, port):
+        """Discard the addresses for a host and port, e.g. if none of
+        them could be connected to.
+
+        """
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def clear(self):
+        """Discard all cached addresses."""
+        with self._lock:
+            self._entries.clear()
+
+    def _get_cached(self, key):
+        """Get a cache entry that may be used, refreshing stale
+        entries. Must be called with the lock held.
+
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = monotonic_time()
+        if now < entry.expires:
+            return entry
+        if entry.error is None and now < entry.expires + self.stale_ttl:
+            if now >= entry.refresh_at:
+                entry.refresh_at = float('inf')
+                self._start_refresh(key)
+            return entry
+        return None
+
+    def _start_refresh(self, key):
+        """Look up a host in a background thread."""
+        thread = threading.Thread(
+            target=self._refresh,
+            args=(key,),
+            name='lomond-dns-refresh'
+        )
+        thread.daemon = True
+        thread.start()
+
+    def _lookup(self, key):
+        """Look up a host, and cache the result."""
+        host, port = key
+        try:
+            addresses = list(self.resolver(host, port))
+        except socket.error as error:
+            log.debug('unable to resolve %s:%s; %s', host, port, error)
+            entry = _Entry(None, error, monotonic_time() + self.negative_ttl)
+            if self.negative_ttl:
+                self._store(key, entry)
+        else:
+            entry = _Entry(addresses, None, monotonic_time() + self.ttl)
+            self._store(key, entry)
+        return entry
+
+    def _refresh(self, key):
+        """Look up a host with stale addresses."""
+        host, port = key
+        try:
+            addresses = list(self.resolver(host, port))
+        except Exception as error:
+            # Keep using the stale addresses, and try again later
+            log.debug('unable to refresh %s:%s; %s', host, port, error)
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.refresh_at = monotonic_time() + self.negative_ttl
+        else:
+            self._store(
+                key, _Entry(addresses, None, monotonic_time() + self.ttl)
+            )
+
+    def _store(self, key, entry):
+        """Add an entry to the cache, evicting expired entries if the
+        cache is full.
+
+        """
+        with self._lock:
+            entries = self._entries
+            if key not in entries and len(entries) >= self.max_size:
+                now = monotonic_time()
+                for cached_key, cached in list(entries.items()):
+                    if now >= cached.expires + self.stale_ttl:
+                        del entries[cached_key]
+                if len(entries) >= self.max_size:
+                    del entries[next(iter(entries))]
+            entries[key] = entry
+
+
+#: The cache shared by websockets constructed with ``dns_cache=True``.
+default_cache = DNSCache()
+
+
+def get_dns_cache(dns_cache):
+    """Get a :class:`DNSCache` from the `dns_cache` argument to
+    :class:`~lomond.websocket.WebSocket`, or ``None`` to not cache
+    lookups.
+
+    ``True`` selects :data:`default_cache`, which is shared by every
+    websocket in the process.
+
+    """
+    # An empty cache is falsy, so check the type first
+    if isinstance(dns_cache, DNSCache):
+        return dns_cache
+    return default_cache if dns_cache else None
@@ -1,5 +1,7 @@
 from __future__ import unicode_literals
 
+from .status import Status
+
 
 class WebSocketError(Exception):
     """Base exception."""
@@ -30,6 +32,8 @@ class CompressionParameterError(HandshakeError):
 class ProtocolError(WebSocketError):
     """Raised in response to a protocol violation."""
     # Results in a a graceful disconnect.
+    # The status code sent in the close packet
+    status = Status.PROTOCOL_ERROR
 
 
 class CriticalProtocolError(WebSocketError):
@@ -50,6 +54,11 @@ class PayloadTooLarge(ProtocolError):
     """
 
 
+class MessageTooLarge(ProtocolError):
+    """A frame or message is larger than the configured maximum."""
+    status = Status.MESSAGE_TOO_LARGE
+
+
 class ConnectFail(WebSocketError):
     """An error connecting to a socket."""
 
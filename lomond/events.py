@@ -327,6 +327,81 @@ class Pong(Event):
         return "{}(data={!r})".format(self.__class__.__name__, self.data)
 
 
+class Latency(Event):
+    """Generated after a pong in response to an automatic ping, if the
+    WebSocket was constructed with ``latency_events=True``.
+
+    :param float rtt: Round trip time of the ping, in seconds.
+    :param float min: Minimum round trip time of recent pings.
+    :param float avg: Mean round trip time of recent pings.
+    :param float p99: 99th percentile round trip time of recent pings.
+
+    """
+    __slots__ = ['rtt', 'min', 'avg', 'p99']
+    name = 'latency'
+
+    def __init__(self, rtt, min, avg, p99):
+        self.rtt = rtt
+        self.min = min
+        self.avg = avg
+        self.p99 = p99
+        super(Latency, self).__init__()
+
+    def __repr__(self):
+        return (
+            "{}(rtt={:.1f}ms, min={:.1f}ms, avg={:.1f}ms, p99={:.1f}ms)"
+        ).format(
+            self.__class__.__name__,
+            self.rtt * 1000.0,
+            self.min * 1000.0,
+            self.avg * 1000.0,
+            self.p99 * 1000.0
+        )
+
+
+class BufferFull(Event):
+    """Generated when data queued to be sent reaches the high
+    watermark. Only generated if the websocket was connected with
+    ``queue_writes=True``.
+
+    :param int buffered_amount: Number of bytes waiting to be sent.
+
+    """
+    __slots__ = ['buffered_amount']
+    name = 'buffer_full'
+
+    def __init__(self, buffered_amount):
+        self.buffered_amount = buffered_amount
+        super(BufferFull, self).__init__()
+
+    def __repr__(self):
+        return "{}(buffered_amount={})".format(
+            self.__class__.__name__,
+            self.buffered_amount
+        )
+
+
+class BufferDrained(Event):
+    """Generated when data queued to be sent falls to the low watermark,
+    after a :class:`BufferFull` event.
+
+    :param int buffered_amount: Number of bytes waiting to be sent.
+
+    """
+    __slots__ = ['buffered_amount']
+    name = 'buffer_drained'
+
+    def __init__(self, buffered_amount):
+        self.buffered_amount = buffered_amount
+        super(BufferDrained, self).__init__()
+
+    def __repr__(self):
+        return "{}(buffered_amount={})".format(
+            self.__class__.__name__,
+            self.buffered_amount
+        )
+
+
 class Text(Event):
     """Generated when Lomond receives a text message from the server.
 
@@ -380,6 +455,54 @@ class Binary(Event):
         )
 
 
+class BinaryChunk(Event):
+    """Generated for each part of a binary message, when the websocket
+    was created with ``stream_messages=True``.
+
+    :param bytes data: The data in this part of the message.
+    :param bool fin: `True` if this is the last part of the message.
+
+    """
+    __slots__ = ['data', 'fin']
+    name = 'binary_chunk'
+
+    def __init__(self, data, fin):
+        self.data = data
+        self.fin = fin
+        super(BinaryChunk, self).__init__()
+
+    def __repr__(self):
+        return "{}(data={}, fin={!r})".format(
+            self.__class__.__name__,
+            self._summarize_bytes(self.data),
+            self.fin
+        )
+
+
+class TextChunk(Event):
+    """Generated for each part of a text message, when the websocket
+    was created with ``stream_messages=True``.
+
+    :param str text: The text in this part of the message.
+    :param bool fin: `True` if this is the last part of the message.
+
+    """
+    __slots__ = ['text', 'fin']
+    name = 'text_chunk'
+
+    def __init__(self, text, fin):
+        self.text = text
+        self.fin = fin
+        super(TextChunk, self).__init__()
+
+    def __repr__(self):
+        return "{}(text={}, fin={!r})".format(
+            self.__class__.__name__,
+            self._summarize_text(self.text),
+            self.fin
+        )
+
+
 class BackOff(Event):
     """Generated when a persistent connection has to wait before re-
     attempting a connection.
@@ -27,6 +27,7 @@ class Frame(object):
         'rsv3',
         'mask',
         'masking_key',
+        'text',
     ]
 
     def __init__(self, opcode, payload=b'',
@@ -40,6 +41,8 @@ class Frame(object):
         self.rsv3 = rsv3
         self.mask = mask
         self.masking_key = masking_key
+        # Text decoded from the payload, if the parser decoded it
+        self.text = None
 
     def __repr__(self):
         opcode_name = Opcode.to_str(self.opcode)
@@ -66,8 +69,32 @@ class Frame(object):
               fin=1, rsv1=0, rsv2=0, rsv3=0,
               mask=True, masking_key=None):
         """Build a WS frame."""
+        header_bytes, payload = cls.build_buffers(
+            opcode,
+            payload=payload,
+            fin=fin,
+            rsv1=rsv1,
+            rsv2=rsv2,
+            rsv3=rsv3,
+            mask=mask,
+            masking_key=masking_key
+        )
+        return header_bytes + bytes(payload)
+
+    @classmethod
+    def build_buffers(cls, opcode, payload=b'',
+                      fin=1, rsv1=0, rsv2=0, rsv3=0,
+                      mask=True, masking_key=None):
+        """Build a WS frame as a header (including the masking key) and
+        a payload, which may be sent without joining them.
+
+        A payload that is a bytearray will be masked in place, to avoid
+        a copy.
+
+        """
         # https://tools.ietf.org/html/rfc6455#section-5.2
-        payload = bytearray(payload) if isinstance(payload, bytes) else payload
+        if mask and isinstance(payload, bytes):
+            payload = bytearray(payload)
         mask_bit = 1 << 7 if mask else 0
         byte0 = fin << 7 | rsv1 << 6 | rsv2 << 5 | rsv3 << 4 | opcode
         length = len(payload)
@@ -89,14 +116,8 @@ class Frame(object):
                 else masking_key
             )
             mask_payload(masking_key, payload)
-            frame_bytes = b''.join((
-                header_bytes,
-                cls._pack_mask(masking_key),
-                bytes(payload)
-            ))
-        else:
-            frame_bytes = header_bytes + bytes(payload)
-        return frame_bytes
+            header_bytes += cls._pack_mask(masking_key)
+        return header_bytes, payload
 
     @classmethod
     def build_close_payload(cls, status, reason=''):
@@ -110,16 +131,24 @@ class Frame(object):
 
     def to_bytes(self):
         """Return binary encoding of WS frame."""
-        frame_bytes = self.build(
+        header_bytes, payload = self.to_buffers()
+        return header_bytes + bytes(payload)
+
+    def to_buffers(self):
+        """Return the binary encoding of a WS frame as a header and a
+        payload. A bytearray payload is masked in place.
+
+        """
+        return self.build_buffers(
             self.opcode,
             payload=self.payload,
+            fin=self.fin,
             rsv1=self.rsv1,
             rsv2=self.rsv2,
             rsv3=self.rsv3,
             mask=self.mask,
             masking_key=self.masking_key
         )
-        return frame_bytes
 
     def validate(self):
         """Check the frame and raise any errors."""
@@ -8,14 +8,29 @@ from __future__ import unicode_literals
 import logging
 import struct
 
+import six
+
 from . import errors
 from .frame import CompressedFrame, Frame
-from .parser import Parser
+from .parser import ParseEOF, ParseError, Parser
+from .utf8decoder import Utf8Decoder
 from .utf8validator import Utf8Validator
 
 
 log = logging.getLogger("lomond")
 
+# States of the FastFrameParser
+_HEADERS = 0
+_HEADER = 1
+_PAYLOAD = 2
+
+# Maximum size of the HTTP headers
+MAX_HEADERS_SIZE = 16 * 1024
+
+# The Py3 codec validates and decodes text in a single pass. The Py2
+# codec accepts surrogates, and so can't be used to validate.
+DECODE_TEXT = not six.PY2
+
 
 class FrameParser(Parser):
     """Parses a stream of data in to HTTP headers + WS frames."""
@@ -30,11 +45,18 @@ class FrameParser(Parser):
         """Unpack 64 bits in to an integer."""
         return _unpack64(bytes(data))[0]
 
-    def __init__(self, parse_headers=True, validate=True):
+    def __init__(self,
+                 parse_headers=True,
+                 validate=True,
+                 max_frame_size=None,
+                 max_message_size=None):
         self.parse_headers = parse_headers
         self.validate = validate
+        self.max_frame_size = max_frame_size
+        self.max_message_size = max_message_size
+        self._message_size = 0
         self._is_text = False
-        self._utf8_validator = Utf8Validator()
+        self._utf8_validator = Utf8Decoder() if DECODE_TEXT else Utf8Validator()
         self._frame_class = Frame
         self._compression = False
         super(FrameParser, self).__init__()
@@ -62,7 +84,7 @@ class FrameParser(Parser):
         # Get any WS frames
         if self.parse_headers:
             header_data = yield self.read_until(
-                b"\r\n\r\n", max_bytes=16 * 1024
+                b"\r\n\r\n", max_bytes=MAX_HEADERS_SIZE
             )
             yield header_data
 
@@ -83,9 +105,30 @@ class FrameParser(Parser):
                 payload_length = self.unpack64((yield self.read(8)))
             if payload_length > 0x7fffffffffffffff:
                 raise errors.PayloadTooLarge("payload is too large")
+            # Check limits before the payload is read
+            if (
+                self.max_frame_size is not None
+                and payload_length > self.max_frame_size
+            ):
+                raise errors.MessageTooLarge(
+                    'frame exceeds max_frame_size ({} bytes)',
+                    self.max_frame_size
+                )
+            if opcode < 8:
+                if opcode != 0:
+                    self._message_size = 0
+                self._message_size += payload_length
+                if (
+                    self.max_message_size is not None
+                    and self._message_size > self.max_message_size
+                ):
+                    raise errors.MessageTooLarge(
+                        'message exceeds max_message_size ({} bytes)',
+                        self.max_message_size
+                    )
 
             if mask_bit:
-                masking_key = yield self.read(4)
+                masking_key = bytes((yield self.read(4)))
             else:
                 masking_key = None
 
@@ -104,14 +147,20 @@ class FrameParser(Parser):
             if frame.is_text:
                 self._is_text = True
 
+            is_text = frame.is_text or (
+                frame.is_continuation and self._is_text
+            )
             if payload_length:
-                _is_text_continuation = (
-                    frame.is_continuation and self._is_text
-                )
-                if frame.is_text or _is_text_continuation:
+                if is_text:
                     frame.payload = yield self.read_text(payload_length)
                 else:
                     frame.payload = yield self.read(payload_length)
+            if is_text and DECODE_TEXT and not self._compression:
+                # Text was decoded as it was validated
+                try:
+                    frame.text = self._utf8_validator.get_text(frame.fin)
+                except UnicodeDecodeError:
+                    raise ParseError('invalid utf8')
 
             self.on_frame(frame)
             yield frame
@@ -124,7 +173,8 @@ class FrameParser(Parser):
             and (frame.is_text or frame.is_continuation)
         ):
             self._utf8_validator.reset()
-        if frame.fin:
+        if frame.fin and not frame.is_control:
+            # Control frames may be sent between fragments
             self._is_text = False
 
 
@@ -142,3 +192,293 @@ class ClientFrameParser(FrameParser):
                 'server sent masked frame'
             )
         super(ClientFrameParser, self).on_frame(frame)
+
+
+class FastFrameParser(FrameParser):
+    """Parses a stream of data in to HTTP headers + WS frames, with a
+    state machine rather than a coroutine.
+
+    Headers are unpacked directly from the fed data, and all complete
+    frames in a feed are parsed in a single loop, which is faster for
+    streams of small frames. Yields the same objects as
+    :class:`FrameParser`.
+
+    """
+
+    _unpack_bytes = struct.Struct(b'!BB').unpack_from
+    _unpack16_from = struct.Struct(b'!H').unpack_from
+    _unpack64_from = struct.Struct(b'!Q').unpack_from
+
+    def reset(self):
+        """Reset the parser, so it may be used on a fresh stream."""
+        self._state = _HEADERS if self.parse_headers else _HEADER
+        # Partial HTTP headers or frame header
+        self._pending = bytearray()
+        self._frame = None
+        self._is_text_frame = False
+        self._validate_text = False
+        self._payload = None
+        self._remaining = 0
+        self._eof = False
+        self._exhausted = False
+
+    def close(self):
+        """Close the parser."""
+
+    def _parse_header(self, data, pos):
+        """Parse a frame header at `pos`. Return a tuple of the header
+        length, the frame, and the payload length, or ``None`` if the
+        header is incomplete.
+
+        """
+        available = len(data) - pos
+        if available < 2:
+            return None
+        byte1, byte2 = self._unpack_bytes(data, pos)
+        payload_length = byte2 & 0b01111111
+        mask_bit = byte2 >> 7
+        header_length = 2
+        if payload_length == 126:
+            if available < 4:
+                return None
+            payload_length = self._unpack16_from(data, pos + 2)[0]
+            header_length = 4
+        elif payload_length == 127:
+            if available < 10:
+                return None
+            payload_length = self._unpack64_from(data, pos + 2)[0]
+            header_length = 10
+            if payload_length > 0x7fffffffffffffff:
+                raise errors.PayloadTooLarge("payload is too large")
+        if mask_bit:
+            if available < header_length + 4:
+                return None
+            key_pos = pos + header_length
+            masking_key = bytes(data[key_pos:key_pos + 4])
+            header_length += 4
+        else:
+            masking_key = None
+
+        opcode = byte1 & 0b00001111
+        # Check limits before the payload is read
+        if (
+            self.max_frame_size is not None
+            and payload_length > self.max_frame_size
+        ):
+            raise errors.MessageTooLarge(
+                'frame exceeds max_frame_size ({} bytes)',
+                self.max_frame_size
+            )
+        if opcode < 8:
+            if opcode != 0:
+                self._message_size = 0
+            self._message_size += payload_length
+            if (
+                self.max_message_size is not None
+                and self._message_size > self.max_message_size
+            ):
+                raise errors.MessageTooLarge(
+                    'message exceeds max_message_size ({} bytes)',
+                    self.max_message_size
+                )
+
+        frame = self._frame_class(
+            opcode,
+            fin=byte1 >> 7,
+            rsv1=(byte1 >> 6) & 1,
+            rsv2=(byte1 >> 5) & 1,
+            rsv3=(byte1 >> 4) & 1,
+            mask=bool(mask_bit),
+            masking_key=masking_key,
+        )
+        if self.validate:
+            frame.validate()
+        if opcode == 1:
+            self._is_text = True
+        return header_length, frame, payload_length
+
+    def _validate_chunk(self, chunk):
+        """Validate part of a text payload."""
+        valid, _, _, _ = self._utf8_validator.validate(bytes(chunk))
+        if not valid:
+            raise ParseError('invalid utf8')
+
+    def _decode_text(self, frame):
+        """Get text decoded as it was validated."""
+        try:
+            return self._utf8_validator.get_text(frame.fin)
+        except UnicodeDecodeError:
+            raise ParseError('invalid utf8')
+
+    def _complete_frame(self, payload):
+        """Return a frame with a payload that spanned several reads."""
+        frame = self._frame
+        self._frame = None
+        self._payload = None
+        self._state = _HEADER
+        frame.payload = payload
+        if self._validate_text and DECODE_TEXT:
+            frame.text = self._decode_text(frame)
+        self.on_frame(frame)
+        return frame
+
+    def feed(self, data):
+        """
+        Called with data (bytes), will yield 0 or more objects parsed
+        from the stream.
+
+        :param bytes data: Data to parse.
+
+        """
+        if self._eof:
+            raise ParseEOF(
+                'end of file reached; '
+                'feed() was previously called with empty bytes'
+            )
+        if not data:
+            self._eof = True
+            raise ParseEOF('unexpected eof of file')
+        if six.PY2 and isinstance(data, memoryview):
+            # Py2 memoryviews don't slice / iterate like bytes
+            data = data.tobytes()
+
+        pos = 0
+        size = len(data)
+        if self._state == _HEADERS:
+            pending = self._pending
+            pending.extend(data)
+            sep_index = pending.find(b'\r\n\r\n')
+            if sep_index == -1:
+                if len(pending) > MAX_HEADERS_SIZE:
+                    raise ParseError('expected {!r}'.format(b'\r\n\r\n'))
+                return
+            sep_index += 4
+            if sep_index > MAX_HEADERS_SIZE:
+                raise ParseError('expected {!r}'.format(b'\r\n\r\n'))
+            # Continue parsing from the data after the headers
+            data = pending[sep_index:]
+            size = len(data)
+            self._pending = bytearray()
+            self._state = _HEADER
+            yield pending[:sep_index]
+
+        parse_header = self._parse_header
+        on_frame = self.on_frame
+        while pos < size:
+            if self._state == _PAYLOAD:
+                # Continue a payload that spans several reads
+                remaining = self._remaining
+                chunk = data[pos:pos + remaining]
+                chunk_size = len(chunk)
+                pos += chunk_size
+                if self._validate_text:
+                    self._validate_chunk(chunk)
+                payload = self._payload
+                if payload is None and chunk_size == remaining:
+                    # All bytes are present, use without copying
+                    yield self._complete_frame(chunk)
+                    continue
+                if payload is None:
+                    # Allocate the full payload up front
+                    payload = self._payload = bytearray(remaining)
+                offset = len(payload) - remaining
+                payload[offset:offset + chunk_size] = chunk
+                remaining -= chunk_size
+                self._remaining = remaining
+                if not remaining:
+                    yield self._complete_frame(payload)
+                continue
+
+            pending = self._pending
+            if pending:
+                # Complete a header split over feeds
+                pending_size = len(pending)
+                pending.extend(data[pos:pos + 14])
+                header = parse_header(pending, 0)
+                if header is None:
+                    break
+                del pending[:]
+                pos -= pending_size
+            else:
+                header = parse_header(data, pos)
+                if header is None:
+                    pending.extend(data[pos:])
+                    break
+            header_length, frame, payload_length = header
+            pos += header_length
+            opcode = frame.opcode
+            validate_text = not self._compression and (
+                opcode == 1 or (opcode == 0 and self._is_text)
+            )
+            end = pos + payload_length
+            if end > size:
+                # Payload is read over several feeds
+                self._frame = frame
+                self._validate_text = validate_text
+                self._payload = None
+                self._remaining = payload_length
+                self._state = _PAYLOAD
+                continue
+
+            # Fast path for a frame with the payload in this feed
+            if payload_length:
+                frame.payload = payload = data[pos:end]
+                pos = end
+            else:
+                payload = b''
+            if validate_text:
+                if DECODE_TEXT and opcode == 1 and frame.fin:
+                    # A whole text message, decoded in one step
+                    try:
+                        frame.text = six.text_type(payload, 'utf-8')
+                    except UnicodeDecodeError:
+                        raise ParseError('invalid utf8')
+                else:
+                    if payload_length:
+                        self._validate_chunk(payload)
+                    if DECODE_TEXT:
+                        frame.text = self._decode_text(frame)
+            on_frame(frame)
+            yield frame
+
+    def get_buffer(self, min_size=0):
+        """
+        Get a writable buffer for the remainder of a payload.
+
+        Returns a memoryview, or `None` if the parser isn't reading at
+        least `min_size` bytes of payload. Call `buffer_updated` after
+        writing to the buffer.
+
+        :param int min_size: Minimum outstanding bytes.
+
+        """
+        if self._eof or self._state != _PAYLOAD:
+            return None
+        remaining = self._remaining
+        if not remaining or remaining < min_size:
+            return None
+        if self._payload is None:
+            self._payload = bytearray(remaining)
+        payload = self._payload
+        return memoryview(payload)[len(payload) - remaining:]
+
+    def buffer_updated(self, nbytes):
+        """
+        Called when `nbytes` have been written to the buffer returned
+        by `get_buffer`, will yield 0 or more objects parsed from the
+        stream.
+
+        :param int nbytes: Number of bytes written.
+
+        """
+        payload = self._payload
+        offset = len(payload) - self._remaining
+        if self._validate_text:
+            self._validate_chunk(payload[offset:offset + nbytes])
+        self._remaining -= nbytes
+        if not self._remaining:
+            yield self._complete_frame(payload)
+
+
+class FastClientFrameParser(FastFrameParser, ClientFrameParser):
+    """Parse frames at client end, with the state machine parser."""
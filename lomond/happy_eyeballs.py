@@ -0,0 +1,175 @@
+"""
+Connects to the first of a server's addresses to respond (RFC 8305).
+
+Connecting to each address in turn means an unreachable address (often
+IPv6 on a network that doesn't route it) delays the connection until
+the connect times out. Instead, addresses of each family are tried
+alternately, and if an attempt hasn't completed after a short delay,
+the next attempt is started in parallel. The first connection to
+complete is used, and the others are closed.
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from collections import deque
+import errno
+import logging
+import os
+import socket
+import time
+
+try:
+    import selectors
+except ImportError:  # pragma: no cover
+    # Python 2.7 and 3.3 connect to each address in turn
+    selectors = None
+
+
+log = logging.getLogger('lomond')
+
+try:
+    from monotonic import monotonic as monotonic_time
+except Exception:  # pragma: no cover
+    monotonic_time = getattr(time, 'monotonic', time.time)
+
+
+# Recommended by RFC 8305
+CONNECTION_ATTEMPT_DELAY = 0.25
+
+# Results of connect_ex for a non-blocking connect
+CONNECT_IN_PROGRESS = (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN)
+
+
+def sort_addresses(addresses):
+    """Sort addresses from ``socket.getaddrinfo`` so that address
+    families alternate, starting with the family of the first address.
+
+    """
+    families = []
+    by_family = {}
+    for address in addresses:
+        family = address[0]
+        if family not in by_family:
+            families.append(family)
+            by_family[family] = deque()
+        by_family[family].append(address)
+    sorted_addresses = []
+    while len(sorted_addresses) < len(addresses):
+        for family in families:
+            if by_family[family]:
+                sorted_addresses.append(by_family[family].popleft())
+    return sorted_addresses
+
+
+def _create_socket(family, socktype, proto):
+    sock = socket.socket(family, socktype, proto)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+def _connect_sequential(addresses, timeout):  # pragma: no cover
+    """Connect to each address in turn."""
+    error = None
+    for family, socktype, proto, _, address in addresses:
+        try:
+            sock = _create_socket(family, socktype, proto)
+        except socket.error as _error:
+            log.debug('unable to create socket; %s', _error)
+            error = _error
+            continue
+        sock.settimeout(timeout)
+        try:
+            sock.connect(address)
+        except socket.error as _error:
+            log.debug('socket error connecting to %r; %s', address, _error)
+            sock.close()
+            error = _error
+            continue
+        return sock
+    raise error or socket.error('no addresses')
+
+
+def connect(addresses,
+            attempt_delay=CONNECTION_ATTEMPT_DELAY,
+            timeout=30.0):
+    """Connect to the first address to respond, and return the
+    socket, which is non-blocking.
+
+    :param list addresses: Addresses returned by ``socket.getaddrinfo``.
+    :param float attempt_delay: Seconds to wait for a connection before
+        starting an attempt to connect to the next address.
+    :param float timeout: Seconds to wait for any connection.
+    :raises socket.error: If no connection could be made.
+
+    """
+    addresses = sort_addresses(addresses)
+    if selectors is None:  # pragma: no cover
+        sock = _connect_sequential(addresses, timeout)
+        sock.setblocking(False)
+        return sock
+
+    pending = deque(addresses)
+    attempts = {}
+    error = None
+    selector = selectors.DefaultSelector()
+    deadline = monotonic_time() + timeout
+    next_attempt = 0.0
+    try:
+        while pending or attempts:
+            now = monotonic_time()
+            if now >= deadline:
+                error = socket.timeout('timed out')
+                break
+            if pending and (not attempts or now >= next_attempt):
+                family, socktype, proto, _, address = pending.popleft()
+                try:
+                    sock = _create_socket(family, socktype, proto)
+                except socket.error as _error:
+                    log.debug('unable to create socket; %s', _error)
+                    error = _error
+                    continue
+                sock.setblocking(False)
+                result = sock.connect_ex(address)
+                if result not in CONNECT_IN_PROGRESS:
+                    log.debug(
+                        'error connecting to %r; %s',
+                        address,
+                        os.strerror(result)
+                    )
+                    sock.close()
+                    error = socket.error(result, os.strerror(result))
+                    continue
+                log.debug('connecting to %r', address)
+                selector.register(sock, selectors.EVENT_WRITE, address)
+                attempts[sock] = address
+                next_attempt = now + attempt_delay
+                continue
+
+            wait = deadline - now
+            if pending:
+                wait = min(wait, next_attempt - now)
+            for key, _mask in selector.select(max(0.0, wait)):
+                sock = key.fileobj
+                address = key.data
+                selector.unregister(sock)
+                del attempts[sock]
+                result = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if result == 0:
+                    log.debug('connected to %r', address)
+                    return sock
+                log.debug(
+                    'error connecting to %r; %s',
+                    address,
+                    os.strerror(result)
+                )
+                sock.close()
+                error = socket.error(result, os.strerror(result))
+                # Start the next attempt without waiting
+                next_attempt = 0.0
+    finally:
+        for sock in attempts:
+            sock.close()
+        selector.close()
+    raise error or socket.error('no addresses')
@@ -12,11 +12,89 @@ import six
 
 make_masking_key = partial(os.urandom, 4)
 
+# Payloads up to this size are masked as a single integer.
+INT_MASK_MAX_SIZE = 256
+# Payloads of at least this size are masked with NumPy, if available.
+NUMPY_MASK_MIN_SIZE = 4 * 1024
+# Large payloads are translated in blocks, which keeps them in cache.
+TRANSLATE_BLOCK_SIZE = 256 * 1024
 
-if six.PY2:
-    _XOR_TABLE = [b''.join(chr(a ^ b) for a in range(256)) for b in range(256)]
-else:
-    _XOR_TABLE = [bytes(a ^ b for a in range(256)) for b in range(256)]
+
+# XOR translate tables, built on first use of each byte value. There
+# are only 256 byte values, so the cache is never more than 64K.
+_XOR_TABLES = {}
+
+
+def _get_xor_table(byte):
+    """Get a translate table that XORs with `byte`."""
+    try:
+        return _XOR_TABLES[byte]
+    except KeyError:
+        if six.PY2:
+            table = b''.join(chr(a ^ byte) for a in range(256))
+        else:
+            table = bytes(a ^ byte for a in range(256))
+        _XOR_TABLES[byte] = table
+        return table
+
+
+# Set to the numpy module on first use, or False if it isn't available.
+_numpy = None
+
+
+def _get_numpy():
+    """Import NumPy on demand, return None if it isn't installed."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+
+def _mask_translate(masking_key, data):
+    """Mask with a translate table per byte of the key."""
+    a, b, c, d = (_get_xor_table(n) for n in bytearray(masking_key))
+    data[::4] = data[::4].translate(a)
+    data[1::4] = data[1::4].translate(b)
+    data[2::4] = data[2::4].translate(c)
+    data[3::4] = data[3::4].translate(d)
+
+
+def _mask_translate_blocks(masking_key, data):
+    """Mask with translate tables, a block at a time."""
+    block_size = TRANSLATE_BLOCK_SIZE
+    for start in range(0, len(data), block_size):
+        end = start + block_size
+        block = data[start:end]
+        _mask_translate(masking_key, block)
+        data[start:end] = block
+
+
+def _mask_int(masking_key, data):
+    """Mask by XORing the payload as one large integer."""
+    length = len(data)
+    words, extra = divmod(length, 4)
+    key = masking_key * words + masking_key[:extra]
+    data[:] = (
+        int.from_bytes(data, 'little') ^ int.from_bytes(key, 'little')
+    ).to_bytes(length, 'little')
+
+
+def _mask_numpy(masking_key, data):
+    """Mask with NumPy, 4 bytes at a time."""
+    numpy = _get_numpy()
+    length = len(data)
+    aligned = length - length % 4
+    # Native byte order for both, so the key lines up with the data
+    words = numpy.frombuffer(data, dtype=numpy.uint8)[:aligned]
+    words = words.view(numpy.uint32)
+    words ^= numpy.frombuffer(masking_key, dtype=numpy.uint32)
+    key = bytearray(masking_key)
+    for index in range(aligned, length):
+        data[index] ^= key[index % 4]
 
 
 def mask_payload(masking_key, data):
@@ -25,9 +103,15 @@ def mask_payload(masking_key, data):
     `masking_key` should be bytes.
     `data` should be a bytearray, and is mutated.
 
+    The fastest available method is picked for the size of the data.
+
     """
-    a, b, c, d = (_XOR_TABLE[n] for n in bytearray(masking_key))
-    data[::4] = data[::4].translate(a)
-    data[1::4] = data[1::4].translate(b)
-    data[2::4] = data[2::4].translate(c)
-    data[3::4] = data[3::4].translate(d)
+    length = len(data)
+    if length <= INT_MASK_MAX_SIZE and not six.PY2:
+        _mask_int(masking_key, data)
+    elif length >= NUMPY_MASK_MIN_SIZE and _get_numpy() is not None:
+        _mask_numpy(masking_key, data)
+    elif length > TRANSLATE_BLOCK_SIZE:
+        _mask_translate_blocks(masking_key, data)
+    else:
+        _mask_translate(masking_key, data)
@@ -9,6 +9,8 @@ from __future__ import unicode_literals
 import logging
 import struct
 
+from six import PY2
+
 from . import errors
 from .opcode import Opcode
 from .utf8validator import Utf8Validator
@@ -31,6 +33,9 @@ class Message(object):
     def __init__(self, opcode):
         self.opcode = opcode
 
+    # Set on parts of a message, generated when streaming messages
+    is_chunk = False
+
     def __repr__(self):
         return "<message {}>".format(Opcode.to_str(self.opcode))
 
@@ -39,10 +44,16 @@ class Message(object):
         """Build a message from a sequence of frames."""
         first_frame = frames[0]
         opcode = first_frame.opcode
+        if opcode == Opcode.TEXT and first_frame.text is not None:
+            # The parser has already decoded the text
+            return Text(''.join([frame.text for frame in frames]))
         if first_frame.rsv1 and decompress:
             payload = cls.decompress_frames(frames, decompress)
-        else:
+        elif PY2:
             payload = b''.join(bytes(frame.payload) for frame in frames)
+        else:
+            # Payloads may be any buffer; join copies each just once
+            payload = b''.join([frame.payload for frame in frames])
         if opcode == Opcode.BINARY:
             return Binary(payload)
         elif opcode == Opcode.TEXT:
@@ -61,6 +72,8 @@ class Message(object):
         """Decompress data and report errors."""
         try:
             return decompress(frames)
+        except errors.MessageTooLarge:
+            raise
         except Exception as error:
             log.exception('error decompressing payload')
             raise errors.CriticalProtocolError(
@@ -136,6 +149,46 @@ class Text(Message):
         return "<message TEXT {!r}>".format(self.text)
 
 
+class BinaryChunk(Binary):
+    """Part of a binary message.
+
+    :param bytes data: Data in this part of the message.
+    :param bool fin: `True` if this is the last part of the message.
+
+    """
+    __slots__ = ['fin']
+    is_chunk = True
+
+    def __init__(self, data, fin):
+        self.fin = fin
+        super(BinaryChunk, self).__init__(data)
+
+    def __repr__(self):
+        return "<message BINARY chunk {!r} fin={!r}>".format(
+            self.data, self.fin
+        )
+
+
+class TextChunk(Text):
+    """Part of a text message.
+
+    :param str text: Text in this part of the message.
+    :param bool fin: `True` if this is the last part of the message.
+
+    """
+    __slots__ = ['fin']
+    is_chunk = True
+
+    def __init__(self, text, fin):
+        self.fin = fin
+        super(TextChunk, self).__init__(text)
+
+    def __repr__(self):
+        return "<message TEXT chunk {!r} fin={!r}>".format(
+            self.text, self.fin
+        )
+
+
 class Close(Message):
     """Connection close control message.
 
@@ -0,0 +1,253 @@
+"""
+Counters and histograms for a websocket connection.
+
+Metrics are updated in place as data is sent and received, so no
+objects are allocated per packet. Call :meth:`Metrics.snapshot` to get
+a copy of the current values, e.g. to export to Prometheus or StatsD.
+
+"""
+
+from __future__ import division
+from __future__ import unicode_literals
+
+from bisect import bisect_left
+from collections import deque
+
+from .opcode import Opcode
+
+
+# Upper bounds of histogram buckets
+SIZE_BUCKETS = (
+    64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304
+)
+RTT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+    5.0, 10.0
+)
+WAIT_BUCKETS = (
+    0.00001, 0.0001, 0.001, 0.01, 0.1, 1.0
+)
+
+# Opcodes reported in snapshots
+_OPCODES = (
+    Opcode.CONTINUATION,
+    Opcode.TEXT,
+    Opcode.BINARY,
+    Opcode.CLOSE,
+    Opcode.PING,
+    Opcode.PONG,
+)
+
+
+class Histogram(object):
+    """Counts observed values in buckets with fixed upper bounds.
+
+    :param bounds: A sorted sequence of bucket upper bounds. Values
+        greater than the last bound are counted in an overflow bucket.
+
+    """
+
+    __slots__ = ['bounds', 'counts', 'count', 'sum']
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def __repr__(self):
+        return "<histogram count={} sum={!r}>".format(self.count, self.sum)
+
+    def observe(self, value):
+        """Count a value."""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def reset(self):
+        """Discard all observed values."""
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def snapshot(self):
+        """Get a dict of the count, sum, and a list of ``(<upper
+        bound>, <cumulative count>)`` tuples, as used by Prometheus.
+        The last bound is ``float('inf')``.
+
+        """
+        buckets = []
+        total = 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            total += count
+            buckets.append((bound, total))
+        return {'count': self.count, 'sum': self.sum, 'buckets': buckets}
+
+
+class Metrics(object):
+    """Counters and histograms for a websocket.
+
+    Counts of frames and messages are lists indexed by opcode. Sizes
+    are of payloads as sent over the wire, i.e. after compression.
+    Metrics are kept for the lifetime of the
+    :class:`~lomond.websocket.WebSocket`, over any number of
+    connections.
+
+    """
+
+    __slots__ = [
+        'connects',
+        'bytes_sent',
+        'bytes_received',
+        'frames_sent',
+        'frames_received',
+        'messages_sent',
+        'messages_received',
+        'raw_bytes_sent',
+        'compressed_bytes_sent',
+        'raw_bytes_received',
+        'compressed_bytes_received',
+        'message_size_sent',
+        'message_size_received',
+        'ping_rtt',
+        'send_lock_wait',
+    ]
+
+    def __init__(self):
+        self.message_size_sent = Histogram(SIZE_BUCKETS)
+        self.message_size_received = Histogram(SIZE_BUCKETS)
+        self.ping_rtt = Histogram(RTT_BUCKETS)
+        self.send_lock_wait = Histogram(WAIT_BUCKETS)
+        self.reset()
+
+    def __repr__(self):
+        return "<metrics {} byte(s) sent, {} byte(s) received>".format(
+            self.bytes_sent, self.bytes_received
+        )
+
+    def reset(self):
+        """Set all metrics to zero."""
+        self.connects = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.frames_sent = [0] * 16
+        self.frames_received = [0] * 16
+        self.messages_sent = [0] * 16
+        self.messages_received = [0] * 16
+        # Sizes of compressed messages, before and after compression
+        self.raw_bytes_sent = 0
+        self.compressed_bytes_sent = 0
+        self.raw_bytes_received = 0
+        self.compressed_bytes_received = 0
+        self.message_size_sent.reset()
+        self.message_size_received.reset()
+        self.ping_rtt.reset()
+        self.send_lock_wait.reset()
+
+    @property
+    def reconnects(self):
+        """Number of connections after the first."""
+        return max(0, self.connects - 1)
+
+    def on_message_sent(self, opcode, size):
+        """Count a message that was sent."""
+        self.messages_sent[opcode] += 1
+        if opcode == Opcode.TEXT or opcode == Opcode.BINARY:
+            self.message_size_sent.observe(size)
+
+    def on_compress(self, raw_size, compressed_size):
+        """Count data that was compressed to send."""
+        self.raw_bytes_sent += raw_size
+        self.compressed_bytes_sent += compressed_size
+
+    def on_decompress(self, compressed_size, raw_size):
+        """Count data that was received compressed."""
+        self.compressed_bytes_received += compressed_size
+        self.raw_bytes_received += raw_size
+
+    @classmethod
+    def _by_opcode(cls, counts):
+        return {
+            Opcode.to_str(opcode).lower(): counts[opcode]
+            for opcode in _OPCODES
+        }
+
+    def snapshot(self):
+        """Get a dict of the current metrics.
+
+        Counts by opcode are dicts keyed by the lower case opcode name
+        (e.g. ``'text'``), and histograms are dicts as returned by
+        :meth:`Histogram.snapshot`.
+
+        """
+        return {
+            'connects': self.connects,
+            'reconnects': self.reconnects,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'frames_sent': self._by_opcode(self.frames_sent),
+            'frames_received': self._by_opcode(self.frames_received),
+            'messages_sent': self._by_opcode(self.messages_sent),
+            'messages_received': self._by_opcode(self.messages_received),
+            'raw_bytes_sent': self.raw_bytes_sent,
+            'compressed_bytes_sent': self.compressed_bytes_sent,
+            'raw_bytes_received': self.raw_bytes_received,
+            'compressed_bytes_received': self.compressed_bytes_received,
+            'message_size_sent': self.message_size_sent.snapshot(),
+            'message_size_received': self.message_size_received.snapshot(),
+            'ping_rtt': self.ping_rtt.snapshot(),
+            'send_lock_wait': self.send_lock_wait.snapshot(),
+        }
+
+
+class RTTEstimator(object):
+    """Round trip times of the most recent pings.
+
+    :param int window: Number of round trip times to keep.
+
+    """
+
+    __slots__ = ['count', 'last', '_samples']
+
+    def __init__(self, window=100):
+        self.count = 0
+        self.last = None
+        self._samples = deque(maxlen=window)
+
+    def __repr__(self):
+        if self.last is None:
+            return "<rtt no samples>"
+        return "<rtt min={:.1f}ms avg={:.1f}ms p99={:.1f}ms>".format(
+            self.min * 1000.0, self.avg * 1000.0, self.p99 * 1000.0
+        )
+
+    def add(self, rtt):
+        """Add a round trip time (in seconds)."""
+        self.count += 1
+        self.last = rtt
+        self._samples.append(rtt)
+
+    @property
+    def min(self):
+        """Minimum round trip time, or ``None`` if there are no
+        samples.
+
+        """
+        return min(self._samples) if self._samples else None
+
+    @property
+    def avg(self):
+        """Mean round trip time, or ``None`` if there are no samples."""
+        samples = self._samples
+        return sum(samples) / len(samples) if samples else None
+
+    @property
+    def p99(self):
+        """99th percentile round trip time, or ``None`` if there are no
+        samples.
+
+        """
+        if not self._samples:
+            return None
+        samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(len(samples) * 0.99))]
@@ -9,6 +9,8 @@ a relatively pain-free exercise.
 
 from __future__ import unicode_literals
 
+from six import PY2
+
 
 class ParseError(Exception):
     """Stream failed to parse."""
@@ -33,10 +35,12 @@ class _Awaitable(object):
 
 class _ReadBytes(_Awaitable):
     """Reads a fixed number of bytes."""
-    __slots__ = ['remaining']
+    __slots__ = ['remaining', 'buffer']
 
     def __init__(self, count):
         self.remaining = count
+        # Allocated only when the read spans more than one feed
+        self.buffer = None
 
 
 class _ReadUtf8(_ReadBytes):
@@ -45,6 +49,7 @@ class _ReadUtf8(_ReadBytes):
 
     def __init__(self, count, utf8_validator):
         self.remaining = count
+        self.buffer = None
         self.utf8_validator = utf8_validator
 
     def validate(self, data):
@@ -86,6 +91,14 @@ class Parser(object):
     The coroutine magic allows parsers to be non-blocking while still
     implemented in a simple procedural manner.
 
+    Fixed size reads are zero-copy where possible; if the requested
+    bytes are contained in a single call to `feed`, the coroutine is
+    sent a slice of the data (which will be a memoryview if `feed` was
+    called with a memoryview). Reads that span several calls to `feed`
+    are assembled in a single pre-allocated bytearray. Consequently,
+    objects yielded by the parser may reference the fed data and are
+    only guaranteed valid until the next call to `feed`.
+
     """
 
     def __init__(self):
@@ -149,6 +162,10 @@ class Parser(object):
                 ParseEOF('unexpected eof of file')
             )
 
+        if PY2 and isinstance(data, memoryview):
+            # Py2 memoryviews don't slice / iterate like bytes
+            data = data.tobytes()
+
         _buffer = self._buffer
         pos = 0
         try:
@@ -167,16 +184,27 @@ class Parser(object):
                     except ParseError as error:
                         # Raises an exception in parse()
                         self._awaiting = self._gen.throw(error)
-                    # Add to buffer
-                    _buffer.extend(chunk)
-                    remaining -= chunk_size
-                    if remaining:
-                        # Await more bytes
-                        self._awaiting.remaining = remaining
+                    read_buffer = self._awaiting.buffer
+                    if (read_buffer is None and chunk_size == remaining
+                            and not PY2):
+                        # All bytes are present, send without copying
+                        # (Py2 parsers need a bytearray to index ints)
+                        self._awaiting = self._gen.send(chunk)
                     else:
-                        # Send to coroutine, get new 'awaitable'
-                        self._awaiting = self._gen.send(_buffer[:])
-                        del _buffer[:]
+                        if read_buffer is None:
+                            # Allocate the full read up front
+                            read_buffer = bytearray(remaining)
+                            self._awaiting.buffer = read_buffer
+                        # Copy in to pre-allocated buffer
+                        offset = len(read_buffer) - remaining
+                        read_buffer[offset:offset + chunk_size] = chunk
+                        remaining -= chunk_size
+                        if remaining:
+                            # Await more bytes
+                            self._awaiting.remaining = remaining
+                        else:
+                            # Send to coroutine, get new 'awaitable'
+                            self._awaiting = self._gen.send(read_buffer)
 
                 # Awaiting a read until a terminator
                 elif isinstance(self._awaiting, _ReadUntil):
@@ -213,6 +241,59 @@ class Parser(object):
                     'extra bytes in feed(); {!r}'.format(data[pos:][:100])
                 )
 
+    def get_buffer(self, min_size=0):
+        """
+        Get a writable buffer for the remainder of a fixed size read.
+
+        Allows large reads to be received directly in to their
+        destination, by-passing `feed`. Returns a memoryview, or `None`
+        if the parser isn't reading at least `min_size` bytes. Call
+        `buffer_updated` after writing to the buffer.
+
+        :param int min_size: Minimum outstanding bytes.
+
+        """
+        awaiting = self._awaiting
+        if self._eof or self._exhausted:
+            return None
+        if not isinstance(awaiting, _ReadBytes):
+            return None
+        remaining = awaiting.remaining
+        if not remaining or remaining < min_size:
+            return None
+        if awaiting.buffer is None:
+            awaiting.buffer = bytearray(remaining)
+        read_buffer = awaiting.buffer
+        return memoryview(read_buffer)[len(read_buffer) - remaining:]
+
+    def buffer_updated(self, nbytes):
+        """
+        Called when `nbytes` have been written to the buffer returned
+        by `get_buffer`, will yield 0 or more objects parsed from the
+        stream.
+
+        :param int nbytes: Number of bytes written.
+
+        """
+        awaiting = self._awaiting
+        read_buffer = awaiting.buffer
+        offset = len(read_buffer) - awaiting.remaining
+        try:
+            try:
+                awaiting.validate(read_buffer[offset:offset + nbytes])
+            except ParseError as error:
+                # Raises an exception in parse(), get new 'awaitable'
+                self._awaiting = self._gen.throw(error)
+            else:
+                awaiting.remaining -= nbytes
+                if not awaiting.remaining:
+                    self._awaiting = self._gen.send(read_buffer)
+            while not isinstance(self._awaiting, _Awaitable):
+                yield self._awaiting
+                self._awaiting = next(self._gen)
+        except StopIteration:
+            self._exhausted = True
+
     def parse(self):
         """
         A generator to parse incoming stream.
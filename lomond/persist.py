@@ -11,6 +11,7 @@ import threading
 import time
 
 from . import events
+from .dns import get_dns_cache
 
 
 def _parse_retry_after(value):
@@ -36,7 +37,9 @@ def persist(websocket, poll=5,
             min_wait=5, max_wait=30,
             ping_rate=30, ping_timeout=None,
             exit_event=None,
-            respect_retry_after=True):
+            respect_retry_after=True,
+            adaptive_ping=False,
+            dns_cache=None):
     """Run a websocket, with a retry mechanism and exponential back-off.
 
     :param websocket: A :class:`~lomond.websocket.Websocket` instance.
@@ -56,8 +59,22 @@ def persist(websocket, poll=5,
         internal event object.
     :param bool respect_retry_after: If ``True`` (default), respect
         ``Retry-After`` headers on rejected upgrade responses.
+    :param bool adaptive_ping: Only ping when no data has been received
+        for `ping_rate` seconds (see
+        :meth:`~lomond.websocket.WebSocket.connect`).
+    :param dns_cache: A :class:`~lomond.dns.DNSCache`, or ``True`` for
+        the cache shared by the process, so that reconnects don't wait
+        on DNS lookups. Replaces the websocket's ``dns_cache`` if not
+        ``None``.
 
     """
+    if dns_cache is not None:
+        websocket.dns_cache = get_dns_cache(dns_cache)
+    # Only passed if set, so websockets with an older connect signature
+    # still work
+    connect_kwargs = {}
+    if adaptive_ping:
+        connect_kwargs['adaptive_ping'] = adaptive_ping
     if exit_event is None:
         exit_event = threading.Event()
     retries = 0
@@ -66,7 +83,10 @@ def persist(websocket, poll=5,
         retries += 1
         retry_after = None
         for event in websocket.connect(
-                poll=poll, ping_rate=ping_rate, ping_timeout=ping_timeout):
+                poll=poll,
+                ping_rate=ping_rate,
+                ping_timeout=ping_timeout,
+                **connect_kwargs):
             if event.name == 'ready':
                 # The server accepted the WS upgrade.
                 retries = 0
@@ -0,0 +1,725 @@
+"""
+Runs many websockets on a single thread, with one selector.
+
+Requires Python 3.4+, for the standard library ``selectors`` module.
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from collections import deque
+import logging
+import os
+import selectors
+import socket
+import ssl
+import threading
+
+from . import errors
+from . import events
+from . import happy_eyeballs
+from .happy_eyeballs import CONNECT_IN_PROGRESS, sort_addresses
+from .scheduler import Scheduler
+from .selectors import Waker
+from .send_queue import SendQueue
+from .session import (
+    WebsocketSession,
+    _ForceDisconnect,
+    _SocketFail,
+    monotonic_time
+)
+
+
+log = logging.getLogger('lomond')
+
+
+class _SessionWaker(object):
+    """Wakes the reactor on behalf of a session."""
+
+    __slots__ = ['_reactor', '_session']
+
+    def __init__(self, reactor, session):
+        self._reactor = reactor
+        self._session = session
+
+    def wake(self):
+        self._reactor._wake_session(self._session)
+
+
+class _ConnectAttempt(object):
+    """A connect to one of a session's addresses, registered with the
+    reactor's selector.
+
+    """
+
+    __slots__ = ['session', 'sock', 'address']
+
+    def __init__(self, session, sock, address):
+        self.session = session
+        self.sock = sock
+        self.address = address
+
+    def on_io(self, mask):
+        self.session.on_connect_attempt(self)
+
+
+class ReactorSession(WebsocketSession):
+    """A session that is run by a :class:`Reactor`.
+
+    Writes are queued and sent by the reactor thread, so the send
+    methods never block. Only the reactor thread touches the selector,
+    so closing from another thread is passed to the reactor.
+
+    """
+
+    def __init__(self,
+                 websocket,
+                 reactor,
+                 callback=None,
+                 event_queue=None,
+                 poll=5.0,
+                 ping_rate=30.0,
+                 ping_timeout=None,
+                 auto_pong=True,
+                 close_timeout=30.0,
+                 adaptive_ping=False):
+        super(ReactorSession, self).__init__(websocket)
+        self.reactor = reactor
+        self.callback = callback
+        self.event_queue = event_queue
+        self.poll = poll
+        self.ping_rate = ping_rate
+        self.ping_timeout = ping_timeout
+        self.auto_pong = auto_pong
+        self.close_timeout = close_timeout
+        self._adaptive_ping = adaptive_ping
+        self._send_queue = SendQueue()
+        self._waker = _SessionWaker(reactor, self)
+        self._addresses = []
+        self._resolve_error = None
+        self._attempts = []
+        self._attempt_timer = None
+        self._connecting_sock = None
+        self._connect_timer = None
+        self._timer = None
+        self._io_sock = None
+        self._io_events = 0
+        self._finished = False
+
+    def __repr__(self):
+        return "<reactor-session '{}'>".format(self.websocket.url)
+
+    @property
+    def is_finished(self):
+        """Check if the session has disconnected."""
+        return self._finished
+
+    def close(self):
+        """Close the websocket. May be called from any thread.
+
+        A websocket that is ready is closed gracefully, subject to the
+        close timeout. Otherwise the socket is closed, once the reactor
+        has finished handling the current event.
+
+        """
+        self.reactor.call(self._close)
+
+    def force_disconnect(self):
+        """Force the socket to disconnect. May be called from any
+        thread.
+
+        """
+        reason = 'disconnected; force disconnect'
+        if self.reactor._in_reactor_thread():
+            self.abort(reason)
+        else:
+            self.reactor.call(self.abort, reason)
+
+    def resolve(self):
+        """Look up the server's addresses."""
+        try:
+            self._addresses = sort_addresses(
+                self._resolve(self.websocket.host, self.websocket.port)
+            )
+        except socket.error as error:
+            self._resolve_error = error
+
+    def _dispatch(self, event):
+        """Send an event to the callback or queue."""
+        # Queued first, so events dispatched by the callback (e.g. if
+        # it disconnects) are queued after this one
+        if self.event_queue is not None:
+            self.event_queue.put(event)
+        if self.callback is not None:
+            try:
+                self.callback(event)
+            except Exception:
+                log.exception('error in callback for %r', event)
+
+    def _dispatch_all(self, _events):
+        """Dispatch an iterable of events, until the session
+        finishes.
+
+        """
+        for event in _events:
+            if not self._finished:
+                self._dispatch(event)
+
+    def _set_io(self, sock, io_events):
+        """Register (or unregister) the socket with the reactor."""
+        if sock is self._io_sock and io_events == self._io_events:
+            return
+        selector = self.reactor._selector
+        if self._io_sock is not None:
+            selector.unregister(self._io_sock)
+        self._io_sock = None
+        self._io_events = 0
+        if sock is not None and io_events:
+            selector.register(sock, io_events, self)
+            self._io_sock = sock
+            self._io_events = io_events
+
+    def _update_io(self):
+        """Wait for the socket to be writable if data is queued."""
+        if self._sock is not None:
+            self._set_io(
+                self._sock,
+                selectors.EVENT_READ | (
+                    selectors.EVENT_WRITE if self._send_queue else 0
+                )
+            )
+
+    def _close_socket(self):
+        """Unregister and close the socket."""
+        self._set_io(None, 0)
+        self._close_attempts()
+        if self._connecting_sock is not None:
+            self._connecting_sock.close()
+            self._connecting_sock = None
+        super(ReactorSession, self)._close_socket()
+
+    def _flush_send_queue(self):
+        """Send what queued data the socket will accept without
+        blocking.
+
+        """
+        if self._send_queue and self._sock is not None:
+            with self._lock:
+                try:
+                    sent = self._send_queue.send(self._sock)
+                except socket.error as error:
+                    log.debug('unable to send queued data; %s', error)
+                else:
+                    self._on_sent(sent)
+
+    def _finish(self, event, graceful=False):
+        """Close the socket, and dispatch a final event."""
+        if self._finished:
+            return
+        self._finished = True
+        self._cancel_timers()
+        if graceful:
+            self._flush_send_queue()
+        self._close_socket()
+        self._send_queue.clear()
+        self.reactor._remove(self)
+        self._dispatch(event)
+
+    def _cancel_timers(self):
+        scheduler = self.reactor._scheduler
+        scheduler.cancel(self._connect_timer)
+        scheduler.cancel(self._attempt_timer)
+        scheduler.cancel(self._timer)
+        self._connect_timer = self._attempt_timer = self._timer = None
+
+    def _handle(self, method, *args):
+        """Call a method, and disconnect if it fails."""
+        try:
+            method(*args)
+        except _ForceDisconnect as error:
+            self._finish(events.Disconnected('disconnected; {}'.format(error)))
+        except _SocketFail as error:
+            self._finish(events.Disconnected('socket fail; {}'.format(error)))
+        except Exception as error:
+            log.exception('error in reactor session')
+            self._finish(events.Disconnected('error; {}'.format(error)))
+
+    # Handlers called on the reactor thread
+
+    def start(self):
+        """Start connecting."""
+        self._dispatch(events.Connecting(self.websocket.url))
+        if self._finished:
+            return
+        if self._resolve_error is not None:
+            self._connect_fail(
+                'unable to connect; {}'.format(self._resolve_error)
+            )
+        elif not self._connect_next():
+            self._connect_fail_all()
+
+    def on_io(self, mask):
+        """Called when the socket is ready."""
+        self._handle(self._on_io, mask)
+
+    def on_wake(self):
+        """Called when data was queued from another thread."""
+        self._handle(self._on_wake)
+
+    def on_timer(self):
+        """Called when regular events are due."""
+        self._timer = None
+        self._handle(self._on_timer)
+
+    def on_connect_attempt(self, attempt):
+        """Called when a connect attempt completes or fails."""
+        self._handle(self._on_connect_attempt, attempt)
+
+    def on_attempt_timer(self):
+        """Called if connect attempts haven't completed in time to
+        start the next attempt.
+
+        """
+        self._attempt_timer = None
+        if self._attempts and not self._finished:
+            self._handle(self._connect_next)
+
+    def on_connect_timeout(self):
+        """Called if the connection takes too long."""
+        self._connect_timer = None
+        connecting = self._attempts or self._connecting_sock is not None
+        if connecting and not self._finished:
+            self._invalidate_address(
+                self.websocket.host, self.websocket.port
+            )
+            self._connect_fail('connect timed out')
+
+    def abort(self, reason):
+        """Disconnect immediately."""
+        self._finish(events.Disconnected(reason))
+
+    def abort_connect(self, reason):
+        """Fail to connect, before the session has started."""
+        if not self._finished:
+            self._connect_fail(reason)
+
+    def _close(self):
+        if self._finished:
+            return
+        websocket = self.websocket
+        if self._ready and websocket.is_active:
+            # Sends a close packet, and waits for the server's
+            self._handle(websocket.close)
+        elif not websocket.is_closing:
+            self.abort('session closed')
+
+    # Connecting
+
+    def _connect_fail(self, reason):
+        self._finished = True
+        self._cancel_timers()
+        self._close_socket()
+        self.reactor._remove(self)
+        self._dispatch(events.ConnectFail(reason))
+
+    def _connect_fail_all(self):
+        """Called when none of the addresses could be connected to."""
+        self._invalidate_address(self.websocket.host, self.websocket.port)
+        self._connect_fail('unable to connect')
+
+    def _connect_next(self):
+        """Start a non-blocking connect to the next address, return
+        `False` if there are none left.
+
+        Attempts race (RFC 8305); if an attempt hasn't completed after
+        ``CONNECTION_ATTEMPT_DELAY``, the next one is started.
+
+        """
+        scheduler = self.reactor._scheduler
+        while self._addresses:
+            family, socktype, proto, _, address = self._addresses.pop(0)
+            try:
+                sock = happy_eyeballs._create_socket(family, socktype, proto)
+            except socket.error as error:
+                log.debug('unable to create socket; %s', error)
+                continue
+            sock.setblocking(False)
+            error = sock.connect_ex(address)
+            if error not in CONNECT_IN_PROGRESS:
+                log.debug(
+                    'error connecting to %r; %s', address, os.strerror(error)
+                )
+                sock.close()
+                continue
+            log.debug('connecting to %r', address)
+            attempt = _ConnectAttempt(self, sock, address)
+            self.reactor._selector.register(
+                sock, selectors.EVENT_WRITE, attempt
+            )
+            self._attempts.append(attempt)
+            now = monotonic_time()
+            if self._connect_timer is None:
+                self._connect_timer = scheduler.call_at(
+                    now + self.CONNECT_TIMEOUT, self.on_connect_timeout
+                )
+            scheduler.cancel(self._attempt_timer)
+            self._attempt_timer = None
+            if self._addresses:
+                self._attempt_timer = scheduler.call_at(
+                    now + self.CONNECTION_ATTEMPT_DELAY,
+                    self.on_attempt_timer
+                )
+            return True
+        return False
+
+    def _close_attempts(self):
+        """Unregister and close connect attempts in progress."""
+        selector = self.reactor._selector
+        for attempt in self._attempts:
+            selector.unregister(attempt.sock)
+            attempt.sock.close()
+        del self._attempts[:]
+
+    def _on_connect_attempt(self, attempt):
+        """Called when an attempt's socket is writable."""
+        if self._finished or attempt not in self._attempts:
+            return
+        self._attempts.remove(attempt)
+        sock = attempt.sock
+        self.reactor._selector.unregister(sock)
+        error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if error:
+            log.debug(
+                'error connecting to %r; %s',
+                attempt.address,
+                os.strerror(error)
+            )
+            sock.close()
+            # Start the next attempt without waiting
+            if not self._connect_next() and not self._attempts:
+                self._connect_fail_all()
+            return
+        log.debug('connected to %r', attempt.address)
+        self.reactor._scheduler.cancel(self._attempt_timer)
+        self._attempt_timer = None
+        self._close_attempts()
+        if self.websocket.is_secure:
+            ssl_context = self._create_ssl_context()
+            self._connecting_sock = ssl_context.wrap_socket(
+                sock,
+                server_hostname=self.websocket.host,
+                do_handshake_on_connect=False
+            )
+            self._on_tls_handshake()
+        else:
+            self._connecting_sock = sock
+            self._on_connected()
+
+    def _on_tls_handshake(self):
+        """Continue the TLS handshake."""
+        sock = self._connecting_sock
+        try:
+            sock.do_handshake()
+        except ssl.SSLWantReadError:
+            self._set_io(sock, selectors.EVENT_READ)
+        except ssl.SSLWantWriteError:
+            self._set_io(sock, selectors.EVENT_WRITE)
+        except (ssl.SSLError, socket.error) as error:
+            self._connect_fail('TLS handshake failed; {}'.format(error))
+        else:
+            self._on_connected()
+
+    def _on_connected(self):
+        """Called when the socket is connected, send the request."""
+        self._sock = self._connecting_sock
+        self._connecting_sock = None
+        self.reactor._scheduler.cancel(self._connect_timer)
+        self._connect_timer = None
+        try:
+            self._send_request()
+        except errors.WebSocketError as error:
+            self._connect_fail('request failed; {}'.format(error))
+            return
+        self._dispatch(events.Connected(self.websocket.url))
+        self._update_io()
+
+    # Connected
+
+    def _on_io(self, mask):
+        if self._finished:
+            return
+        if self._connecting_sock is not None:
+            self._on_tls_handshake()
+            return
+        if mask & selectors.EVENT_WRITE:
+            self._dispatch_all(self._send_queued())
+        if mask & selectors.EVENT_READ:
+            self._on_readable()
+        if not self._finished:
+            self._update_io()
+            self._schedule()
+
+    def _on_readable(self):
+        websocket = self.websocket
+        while True:
+            received_events = self._read(self.BUFFER_SIZE)
+            if received_events is None:
+                if websocket.is_active:
+                    self._socket_fail('connection lost')
+                self._finish(events.Disconnected(graceful=True), True)
+                return
+            for event in received_events:
+                # A callback may have disconnected
+                if not self._finished:
+                    self._on_event(event, self.auto_pong)
+                    self._dispatch(event)
+            if self._finished:
+                return
+            if websocket.is_closed:
+                self._finish(events.Disconnected(graceful=True), True)
+                return
+            # SSL sockets may have decrypted data that won't wake the
+            # selector.
+            pending = getattr(self._sock, 'pending', None)
+            if not (pending and pending()):
+                break
+
+    def _on_wake(self):
+        if self._sock is not None and not self._finished:
+            self._dispatch_all(self._send_queued())
+            self._update_io()
+            self._schedule()
+
+    def _regular_events(self):
+        if self._ready:
+            return self._regular(
+                self.poll,
+                self.ping_rate,
+                self.ping_timeout,
+                self.close_timeout
+            )
+        return ()
+
+    def _schedule(self):
+        """Schedule a timer for the next regular event, unless one is
+        scheduled sooner.
+
+        """
+        if not self._ready or self._finished:
+            return
+        deadline = self._start_time + self._get_deadline(
+            self.poll, self.ping_rate, self.ping_timeout, self.close_timeout
+        )
+        timer = self._timer
+        if timer is not None:
+            if timer.deadline <= deadline:
+                return
+            self.reactor._scheduler.cancel(timer)
+        self._timer = self.reactor._scheduler.call_at(deadline, self.on_timer)
+
+    def _on_timer(self):
+        if self._finished:
+            return
+        self._dispatch_all(self._regular_events())
+        if self.websocket.is_closed:
+            self._finish(events.Disconnected(graceful=True), True)
+        else:
+            self._schedule()
+
+
+class Reactor(object):
+    """Runs many websockets on a single thread.
+
+    Rather than iterate over events from each websocket (which requires
+    a thread per websocket), add websockets to a reactor with a
+    callback or a queue for events, and call :meth:`run` (or
+    :meth:`start` to run in a thread).
+
+    Deadlines for polls, pings and timeouts are kept in a
+    :class:`~lomond.scheduler.Scheduler`, so the reactor sleeps until
+    the next deadline, and only visits websockets with expired timers.
+
+    """
+
+    def __init__(self):
+        self._scheduler = Scheduler()
+        self._selector = selectors.DefaultSelector()
+        self._waker = Waker()
+        self._selector.register(
+            self._waker.fileno(), selectors.EVENT_READ, None
+        )
+        self._lock = threading.Lock()
+        self._calls = deque()
+        self._woken = set()
+        self._sessions = set()
+        # Sessions added, but not yet started by the reactor thread
+        self._pending = set()
+        self._exit = False
+        self._thread = None
+        self._running_thread = None
+
+    def __repr__(self):
+        return "<reactor {} websocket(s)>".format(len(self._sessions))
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def add(self,
+            websocket,
+            callback=None,
+            event_queue=None,
+            poll=5.0,
+            ping_rate=30.0,
+            ping_timeout=None,
+            auto_pong=True,
+            close_timeout=30.0,
+            adaptive_ping=False):
+        """Connect a websocket. May be called from any thread.
+
+        Events are passed to `callback` and / or put on `event_queue`,
+        from the reactor thread. Callbacks should not block.
+
+        :param websocket: A :class:`~lomond.websocket.WebSocket`.
+        :param callback: A callable that takes an event.
+        :param event_queue: A queue (e.g. :class:`queue.Queue`) for
+            events.
+
+        Other parameters are as :meth:`~lomond.websocket.WebSocket.connect`.
+        Proxies are not supported.
+
+        :returns: A :class:`ReactorSession`.
+
+        """
+        session = ReactorSession(
+            websocket,
+            self,
+            callback=callback,
+            event_queue=event_queue,
+            poll=poll,
+            ping_rate=ping_rate,
+            ping_timeout=ping_timeout,
+            auto_pong=auto_pong,
+            close_timeout=close_timeout,
+            adaptive_ping=adaptive_ping
+        )
+        websocket.reset()
+        websocket.state.session = session
+        websocket._emit_trace(
+            'connect_start',
+            poll=poll,
+            ping_rate=ping_rate,
+            ping_timeout=ping_timeout,
+            auto_pong=auto_pong,
+            close_timeout=close_timeout,
+            adaptive_ping=adaptive_ping
+        )
+        with self._lock:
+            self._pending.add(session)
+        # The DNS lookup blocks, so neither this thread nor the reactor
+        # thread does it
+        thread = threading.Thread(
+            target=self._resolve_session,
+            args=(session,),
+            name='lomond-resolve'
+        )
+        thread.daemon = True
+        thread.start()
+        return session
+
+    def call(self, function, *args):
+        """Call a function from the reactor thread."""
+        with self._lock:
+            self._calls.append((function, args))
+        self._waker.wake()
+
+    def stop(self):
+        """Stop the reactor, disconnecting websockets."""
+        self.call(self._stop)
+
+    def start(self):
+        """Run the reactor in a daemon thread, and return the thread."""
+        self._thread = thread = threading.Thread(
+            target=self.run, name='lomond-reactor'
+        )
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def run(self):
+        """Run the reactor until :meth:`stop` is called."""
+        select = self._selector.select
+        scheduler = self._scheduler
+        self._running_thread = threading.current_thread()
+        try:
+            while not self._exit:
+                # Waits indefinitely if there are no timers
+                timeout = scheduler.get_timeout(monotonic_time())
+                for key, mask in select(timeout):
+                    # A session, or one of its connect attempts
+                    handler = key.data
+                    if handler is None:
+                        self._waker.clear()
+                    else:
+                        handler.on_io(mask)
+                self._run_calls()
+                scheduler.run(monotonic_time())
+        finally:
+            for session in list(self._sessions):
+                session.abort('reactor stopped')
+            with self._lock:
+                pending = self._pending
+                self._pending = set()
+            for session in pending:
+                session.abort_connect('reactor stopped')
+            self._exit = False
+            self._running_thread = None
+
+    def close(self):
+        """Close the reactor (call when it is no longer running)."""
+        self._selector.close()
+        self._waker.close()
+
+    def _run_calls(self):
+        """Run functions from other threads, and wake sessions."""
+        with self._lock:
+            calls = self._calls
+            self._calls = deque()
+            woken = self._woken
+            self._woken = set()
+        for function, args in calls:
+            function(*args)
+        for session in woken:
+            session.on_wake()
+
+    def _in_reactor_thread(self):
+        """Check if called from the thread running the reactor."""
+        return threading.current_thread() is self._running_thread
+
+    def _resolve_session(self, session):
+        """Look up a session's addresses, then start it from the
+        reactor thread.
+
+        """
+        session.resolve()
+        self.call(self._start_session, session)
+
+    def _wake_session(self, session):
+        with self._lock:
+            self._woken.add(session)
+        self._waker.wake()
+
+    def _start_session(self, session):
+        with self._lock:
+            self._pending.discard(session)
+        if session.is_finished:
+            # Closed while resolving
+            return
+        self._sessions.add(session)
+        session.start()
+
+    def _remove(self, session):
+        self._sessions.discard(session)
+
+    def _stop(self):
+        self._exit = True
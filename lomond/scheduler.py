@@ -0,0 +1,139 @@
+"""
+A heap of timers, so that many deadlines may be waited on at once.
+
+Only timers that have expired are visited, and the time until the
+next deadline may be used as a selector timeout.
+
+"""
+
+from __future__ import unicode_literals
+
+import heapq
+import itertools
+
+
+class Timer(object):
+    """A callback scheduled to run at a deadline.
+
+    :param float deadline: Monotonic time to run the callback.
+
+    """
+
+    __slots__ = ['deadline', 'callback', 'args', 'active']
+
+    def __init__(self, deadline, callback, args):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        # False when the timer has run or was cancelled
+        self.active = True
+
+    def __repr__(self):
+        return "<timer {:.3f}{}>".format(
+            self.deadline, '' if self.active else ' inactive'
+        )
+
+
+class Scheduler(object):
+    """Runs callbacks at deadlines.
+
+    Cancelled timers are left in the heap, and discarded when they
+    reach the top, or when they make up the majority of the heap.
+
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+        self._cancelled = 0
+        # Timers are popped from the heap while running callbacks
+        self._running = False
+
+    def __repr__(self):
+        return "<scheduler {} timer(s)>".format(len(self))
+
+    def __len__(self):
+        return len(self._heap) - self._cancelled
+
+    def call_at(self, deadline, callback, *args):
+        """Schedule a callback at a monotonic time, return a
+        :class:`Timer`.
+
+        """
+        timer = Timer(deadline, callback, args)
+        # The counter orders timers with equal deadlines
+        heapq.heappush(self._heap, (deadline, next(self._counter), timer))
+        return timer
+
+    def cancel(self, timer):
+        """Cancel a timer, if it hasn't run."""
+        if timer is not None and timer.active:
+            timer.active = False
+            self._cancelled += 1
+            if not self._running:
+                self._check_compact()
+
+    def _check_compact(self):
+        """Compact the heap if it is mostly cancelled timers."""
+        if self._cancelled > 64 and self._cancelled > len(self._heap) // 2:
+            self._compact()
+
+    def _compact(self):
+        """Remove cancelled timers from the heap."""
+        self._heap = [entry for entry in self._heap if entry[2].active]
+        heapq.heapify(self._heap)
+        self._cancelled = 0
+
+    def get_deadline(self):
+        """Get the earliest deadline, or `None` if there are no
+        timers.
+
+        """
+        heap = self._heap
+        while heap and not heap[0][2].active:
+            heapq.heappop(heap)
+            self._cancelled -= 1
+        return heap[0][0] if heap else None
+
+    def get_timeout(self, now, default=None):
+        """Get the time until the earliest deadline, or `default` if
+        there are no timers.
+
+        """
+        deadline = self.get_deadline()
+        if deadline is None:
+            return default
+        return max(0.0, deadline - now)
+
+    def run(self, now):
+        """Run callbacks with deadlines at or before `now`, and return
+        the number of callbacks that were run.
+
+        Timers scheduled by the callbacks are left for the next call.
+
+        """
+        last = next(self._counter)
+        deferred = []
+        run_count = 0
+        heap = self._heap
+        # Callbacks that cancel timers don't compact the heap until
+        # deferred timers are back in it, so the count stays correct
+        self._running = True
+        try:
+            while heap and heap[0][0] <= now:
+                entry = heapq.heappop(heap)
+                timer = entry[2]
+                if not timer.active:
+                    self._cancelled -= 1
+                elif entry[1] > last:
+                    deferred.append(entry)
+                else:
+                    timer.active = False
+                    timer.callback(*timer.args)
+                    run_count += 1
+        finally:
+            self._running = False
+            for entry in deferred:
+                heapq.heappush(heap, entry)
+        self._check_compact()
+        return run_count
@@ -1,14 +1,56 @@
 from __future__ import unicode_literals
 
 import select
+import socket
+
+
+class Waker(object):
+    """Wakes a selector from another thread, with a socket pair."""
+
+    def __init__(self):
+        self._reader, self._writer = socket.socketpair()
+        self._reader.setblocking(False)
+        self._writer.setblocking(False)
+
+    def __repr__(self):
+        return '<Waker>'
+
+    def fileno(self):
+        """Get the file descriptor the selector should wait on."""
+        return self._reader.fileno()
+
+    def wake(self):
+        """Wake the selector."""
+        try:
+            self._writer.send(b'\x00')
+        except socket.error:
+            # The socket buffer is full, so a wake is already pending
+            pass
+
+    def clear(self):
+        """Clear pending wakes."""
+        try:
+            while self._reader.recv(1024):
+                pass
+        except socket.error:
+            pass
+
+    def close(self):
+        """Close the socket pair."""
+        self._reader.close()
+        self._writer.close()
 
 
 class SelectorBase(object):
     """Abstraction for a kernel object that waits for socket data."""
 
-    def __init__(self, socket):
-        """Construct with an open socket."""
+    def __init__(self, socket, waker=None):
+        """Construct with an open socket, and an optional
+        :class:`Waker`.
+
+        """
         self._socket = socket
+        self._waker = waker
 
     def wait(self, max_bytes, timeout=0.0):
         """Block until socket is readable or a timeout occurs. Return
@@ -20,12 +62,37 @@ class SelectorBase(object):
         readable = self.wait_readable(timeout=timeout)
         return readable, max_bytes
 
+    def wait_io(self, max_bytes, timeout=0.0, write=False):
+        """Block until socket is readable, writable (if `write` is
+        set), the waker is woken, or a timeout occurs. Return a tuple
+        of <readable>, <writable>, <max bytes>.
+
+        """
+        if hasattr(self._socket, 'pending') and self._socket.pending():
+            return True, False, self._socket.pending()
+        readable, writable = self.wait_readwrite(timeout=timeout, write=write)
+        return readable, writable, max_bytes
+
     def wait_readable(self, timeout=0.0):
         """Block until socket is readable or a timeout occurs, return
         `True` if the socket is readable, or `False` if the timeout
         occurred.
 
         """
+        readable, _writable = self.wait_readwrite(timeout=timeout)
+        return readable
+
+    def wait_readwrite(self, timeout=0.0, write=False):
+        """Block until socket is readable, writable (if `write` is
+        set), the waker is woken, or a timeout occurs. Return a tuple
+        of <readable>, <writable>.
+
+        """
+
+    def _clear_waker(self):
+        """Clear the waker, if it was woken."""
+        if self._waker is not None:
+            self._waker.clear()
 
     def close(self):
         """Close the selector (not the socket)."""
@@ -37,17 +104,23 @@ class SelectSelector(SelectorBase):  # pragma: no cover
     def __repr__(self):
         return '<SelectSelector>'
 
-    def wait_readable(self, timeout=0.0):
-        rlist, _wlist, _xlist = (
-            select.select([self._socket.fileno()], [], [], timeout)
+    def wait_readwrite(self, timeout=0.0, write=False):
+        fileno = self._socket.fileno()
+        rlist = [fileno]
+        if self._waker is not None:
+            rlist.append(self._waker.fileno())
+        rlist, wlist, _xlist = select.select(
+            rlist, [fileno] if write else [], [], timeout
         )
-        return bool(rlist)
+        if self._waker is not None and self._waker.fileno() in rlist:
+            self._clear_waker()
+        return fileno in rlist, bool(wlist)
 
 
 class KQueueSelector(SelectorBase):  # pragma: no cover
     """KQueue selector for MacOS & BSD"""
-    def __init__(self, socket):
-        super(KQueueSelector, self).__init__(socket)
+    def __init__(self, socket, waker=None):
+        super(KQueueSelector, self).__init__(socket, waker=waker)
         self._queue = select.kqueue()
         self._events = [
             select.kevent(
@@ -55,15 +128,35 @@ class KQueueSelector(SelectorBase):  # pragma: no cover
                 filter=select.KQ_FILTER_READ
             )
         ]
+        if waker is not None:
+            self._events.append(
+                select.kevent(waker.fileno(), filter=select.KQ_FILTER_READ)
+            )
 
     def __repr__(self):
         return '<KQueueSelector>'
 
-    def wait_readable(self, timeout=0.0):
-        events = self._queue.control(
-            self._events, 1, timeout
-        )
-        return bool(events)
+    def wait_readwrite(self, timeout=0.0, write=False):
+        changes = list(self._events)
+        if write:
+            changes.append(
+                select.kevent(
+                    self._socket.fileno(),
+                    filter=select.KQ_FILTER_WRITE,
+                    flags=select.KQ_EV_ADD | select.KQ_EV_ONESHOT
+                )
+            )
+        events = self._queue.control(changes, 3, timeout)
+        readable = writable = False
+        for event in events:
+            if event.ident == self._socket.fileno():
+                if event.filter == select.KQ_FILTER_WRITE:
+                    writable = True
+                else:
+                    readable = True
+            else:
+                self._clear_waker()
+        return readable, writable
 
     def close(self):
         self._queue.close()
@@ -71,23 +164,42 @@ class KQueueSelector(SelectorBase):  # pragma: no cover
 
 class PollSelector(SelectorBase):
     """Poll selector for *nix"""
-    def __init__(self, socket):
-        super(PollSelector, self).__init__(socket)
+    _read_events = (
+        select.POLLIN |
+        select.POLLPRI |
+        select.POLLERR |
+        select.POLLHUP
+    ) if hasattr(select, 'poll') else 0
+
+    def __init__(self, socket, waker=None):
+        super(PollSelector, self).__init__(socket, waker=waker)
         self._poll = select.poll()
-        events = (
-            select.POLLIN |
-            select.POLLPRI |
-            select.POLLERR |
-            select.POLLHUP
-        )
-        self._poll.register(socket.fileno(), events)
+        self._write = False
+        self._poll.register(socket.fileno(), self._read_events)
+        if waker is not None:
+            self._poll.register(waker.fileno(), select.POLLIN)
 
     def __repr__(self):
         return '<PollSelector>'
 
-    def wait_readable(self, timeout=0.0):
-        events = self._poll.poll(timeout * 1000.0)
-        return bool(events)
+    def wait_readwrite(self, timeout=0.0, write=False):
+        fileno = self._socket.fileno()
+        if write != self._write:
+            self._write = write
+            self._poll.modify(
+                fileno,
+                self._read_events | select.POLLOUT
+                if write else
+                self._read_events
+            )
+        readable = writable = False
+        for event_fileno, event in self._poll.poll(timeout * 1000.0):
+            if event_fileno == fileno:
+                readable = readable or bool(event & self._read_events)
+                writable = writable or bool(event & select.POLLOUT)
+            else:
+                self._clear_waker()
+        return readable, writable
 
 
 # Pick the appropriate selector for the given platform
@@ -0,0 +1,146 @@
+"""
+A queue of outgoing data, for writing to a non-blocking socket.
+
+"""
+
+from __future__ import unicode_literals
+
+from collections import deque
+import errno
+import socket
+import ssl
+
+
+# Errors that indicate a non-blocking socket isn't ready
+_WOULD_BLOCK_ERRNOS = (errno.EAGAIN, errno.EWOULDBLOCK)
+_SSL_WANT_ERRORS = tuple(
+    getattr(ssl, name)
+    for name in ('SSLWantReadError', 'SSLWantWriteError')
+    if hasattr(ssl, name)
+)
+
+# Maximum number of buffers to pass to a single sendmsg call
+MAX_SENDMSG_BUFFERS = 64
+
+
+def would_block(error):
+    """Check if a socket error means the operation would block."""
+    if isinstance(error, _SSL_WANT_ERRORS):
+        return True
+    return getattr(error, 'errno', None) in _WOULD_BLOCK_ERRNOS
+
+
+def can_sendmsg(sock):
+    """Check if the socket supports scatter / gather writes."""
+    # SSL sockets have a sendmsg method, which raises an error
+    return (
+        hasattr(sock, 'sendmsg')
+        and not isinstance(sock, ssl.SSLSocket)
+    )
+
+
+class SendQueue(object):
+    """Buffers data waiting to be written to a non-blocking socket.
+
+    :param int high_watermark: Number of buffered bytes at which the
+        queue is considered *full*.
+    :param int low_watermark: Number of buffered bytes at which a full
+        queue is considered *drained*.
+
+    """
+
+    __slots__ = [
+        '_buffers',
+        'buffered_amount',
+        'high_watermark',
+        'low_watermark'
+    ]
+
+    def __init__(self, high_watermark=64 * 1024, low_watermark=16 * 1024):
+        if low_watermark > high_watermark:
+            raise ValueError(
+                'low_watermark must not be greater than high_watermark'
+            )
+        self._buffers = deque()
+        self.buffered_amount = 0
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+
+    def __repr__(self):
+        return "<send-queue {} bytes>".format(self.buffered_amount)
+
+    def __len__(self):
+        return len(self._buffers)
+
+    @property
+    def is_full(self):
+        """Check if the buffered data has reached the high watermark."""
+        return self.buffered_amount >= self.high_watermark
+
+    @property
+    def is_drained(self):
+        """Check if the buffered data is at or below the low watermark."""
+        return self.buffered_amount <= self.low_watermark
+
+    def push(self, buffers):
+        """Add buffers to the end of the queue."""
+        for buffer in buffers:
+            if len(buffer):
+                self._buffers.append(memoryview(buffer))
+                self.buffered_amount += len(buffer)
+
+    def clear(self):
+        """Discard any buffered data."""
+        self._buffers.clear()
+        self.buffered_amount = 0
+
+    def send(self, sock):
+        """Send as much data as the socket will accept, and return the
+        number of bytes sent.
+
+        Returns `0` if the socket isn't ready for writing.
+
+        :raises socket.error: If the socket fails.
+
+        """
+        buffers = self._buffers
+        if not buffers:
+            return 0
+        try:
+            if len(buffers) > 1 and can_sendmsg(sock):
+                sent = sock.sendmsg(
+                    [buffers[index] for index in range(
+                        min(len(buffers), MAX_SENDMSG_BUFFERS)
+                    )]
+                )
+            else:
+                sent = sock.send(buffers[0])
+        except socket.error as error:
+            if would_block(error):
+                return 0
+            raise
+        self._consume(sent)
+        return sent
+
+    def send_all(self, sock):
+        """Send all buffered data to a blocking socket.
+
+        :raises socket.error: If the socket fails.
+
+        """
+        while self._buffers:
+            if not self.send(sock):
+                break
+
+    def _consume(self, sent):
+        """Discard sent data, which may end part way through a buffer."""
+        buffers = self._buffers
+        self.buffered_amount -= sent
+        while sent:
+            buffer_size = len(buffers[0])
+            if sent >= buffer_size:
+                buffers.popleft()
+                sent -= buffer_size
+            else:
+                buffers[0] = buffers[0][sent:]
+                sent = 0
@@ -12,16 +12,21 @@ import logging
 import math
 import socket
 import ssl
+import struct
 import threading
 import time
 
 from six.moves.urllib.parse import urlparse
 
 from .frame import Frame
+from . import happy_eyeballs
+from .metrics import RTTEstimator
+from .opcode import Opcode
 from . import errors
 from . import events
 from . import proxy
 from . import selectors
+from .send_queue import SendQueue, can_sendmsg, would_block
 
 
 HAS_SNI = hasattr(ssl, 'SSLContext') and getattr(ssl, 'HAS_SNI', False)
@@ -33,6 +38,22 @@ except Exception:  # pragma: no cover
     monotonic_time = getattr(time, 'monotonic', time.time)
 
 
+def _remove_peer(addresses, sock):
+    """Get the addresses from ``getaddrinfo``, without the one `sock`
+    is connected to.
+
+    """
+    try:
+        peer = sock.getpeername()
+    except socket.error:
+        return []
+    remaining = [
+        address for address in addresses if address[4][:2] != peer[:2]
+    ]
+    # Don't retry forever if the peer isn't recognized
+    return remaining if len(remaining) < len(addresses) else []
+
+
 class _SocketFail(Exception):
     """Used internally to respond to socket fails."""
 
@@ -41,23 +62,53 @@ class _ForceDisconnect(Exception):
     """Used internally when the close timeout is tripped."""
 
 
+class _WouldBlock(Exception):
+    """Used internally when a non-blocking socket has no data."""
+
+
 class WebsocketSession(object):
     """Manages the mechanics of running the websocket."""
     _selector_cls = selectors.PlatformSelector
 
     BUFFER_SIZE = 64 * 1024
+    # Buffers to send are joined if they total no more than this
+    JOIN_SIZE = 16 * 1024
+    # Seconds to wait for queued data to send when the session ends
+    FLUSH_TIMEOUT = 5.0
+    # Seconds to wait for a connection, and before trying the next
+    # address in parallel
+    CONNECT_TIMEOUT = 30.0
+    CONNECTION_ATTEMPT_DELAY = happy_eyeballs.CONNECTION_ATTEMPT_DELAY
+    # Payload of automatic pings; a sequence number and monotonic time
+    _ping_struct = struct.Struct(b'!Id')
 
     def __init__(self, websocket):
         self.websocket = websocket
         self._address = (websocket.host, websocket.port)
         self._lock = threading.Lock()
+        # Held while compressing and sending a message, so that
+        # fragments of different messages aren't interleaved, and
+        # messages are sent in the order the compressor saw them.
+        # Control frames only need _lock.
+        self._message_lock = threading.RLock()
         self._sock = None
         self._poll_start = None
         self._next_ping = None
         self._last_pong = None
+        self._ping_sequence = 0
+        self._pong_sequence = 0
+        # With adaptive pings, any data received shows the server is
+        # alive, and pings are only sent when the connection is idle
+        self._adaptive_ping = False
+        self._last_received = None
+        self._last_ping = None
+        self.rtt = RTTEstimator()
         self._start_time = None
         self._ready = False
         self._buffer = bytearray(self.BUFFER_SIZE)
+        self._send_queue = None
+        self._waker = None
+        self._write_paused = False
 
     def __repr__(self):
         return "<ws-session '{}'>".format(self.websocket.url)
@@ -71,6 +122,17 @@ class WebsocketSession(object):
             monotonic_time() - self._start_time
         )
 
+    @property
+    def metrics(self):
+        """Get the :class:`~lomond.metrics.Metrics` for the websocket."""
+        return self.websocket.metrics
+
+    @property
+    def buffered_amount(self):
+        """Get the number of bytes queued to be sent."""
+        send_queue = self._send_queue
+        return 0 if send_queue is None else send_queue.buffered_amount
+
     def close(self):
         """Close the websocket, if it is open."""
         self._close_socket()
@@ -82,7 +144,20 @@ class WebsocketSession(object):
 
     def write(self, data):
         """Send raw data."""
-        with self._lock:
+        self.write_buffers((data,))
+
+    def write_buffers(self, buffers):
+        """Send a sequence of buffers, without joining large buffers."""
+        metrics = self.websocket.metrics
+        lock = self._lock
+        if lock.acquire(False):
+            metrics.send_lock_wait.observe(0.0)
+        else:
+            # Only time the wait if another thread holds the lock
+            start = monotonic_time()
+            lock.acquire()
+            metrics.send_lock_wait.observe(monotonic_time() - start)
+        try:
             if self._sock is None:
                 log.debug('WebSocket unavailable; data not sent')
                 raise errors.WebSocketUnavailable('not connected')
@@ -93,8 +168,14 @@ class WebsocketSession(object):
                 log.debug('WebSocket closing; data not sent')
                 raise errors.WebSocketClosing('data not sent')
             try:
-                self._sock.sendall(data)
-                self.websocket._emit_trace('socket_send', length=len(data))
+                if self._send_queue is None:
+                    length = self._sendall(buffers)
+                    metrics.bytes_sent += length
+                    tracer = self.websocket.tracer
+                    if tracer is not None:
+                        tracer.socket_send(self.websocket.url, length)
+                else:
+                    self._queue_buffers(buffers)
             except socket.error as error:
                 log.debug('WebSocket send error; %s', error)
                 raise errors.TransportFail(
@@ -105,18 +186,244 @@ class WebsocketSession(object):
                 raise errors.TransportFail(
                     'socket error; {}', error
                 )
+        finally:
+            lock.release()
+
+    def _sendall(self, buffers):
+        """Send all buffers, return the number of bytes sent."""
+        sock = self._sock
+        length = sum(len(buffer) for buffer in buffers)
+        if len(buffers) == 1:
+            sock.sendall(buffers[0])
+        elif length <= self.JOIN_SIZE:
+            # Cheaper to join small buffers than make several calls
+            data = bytearray()
+            for buffer in buffers:
+                data += buffer
+            sock.sendall(data)
+        elif self._can_sendmsg(sock):
+            self._sendmsg_all(sock, buffers)
+        else:
+            for buffer in buffers:
+                sock.sendall(buffer)
+        return length
+
+    def _queue_buffers(self, buffers):
+        """Add buffers to the send queue, and send what the socket will
+        accept without blocking. The session loop sends the remainder.
+
+        """
+        send_queue = self._send_queue
+        was_empty = not send_queue
+        was_full = send_queue.is_full
+        send_queue.push(buffers)
+        if was_empty:
+            sent = send_queue.send(self._sock)
+            if sent:
+                self._on_sent(sent)
+        # Wake the loop if it needs to wait for the socket to be
+        # writable, or to report a full queue.
+        if (was_empty and send_queue) or (send_queue.is_full and not was_full):
+            self._waker.wake()
+
+    def _on_sent(self, sent):
+        """Count (and trace) queued data written to the socket."""
+        websocket = self.websocket
+        websocket.metrics.bytes_sent += sent
+        if websocket.tracer is not None:
+            websocket.tracer.socket_send(websocket.url, sent)
+
+    def _send_queued(self):
+        """Send queued data, and generate events if the queue is full or
+        has drained.
+
+        """
+        send_queue = self._send_queue
+        with self._lock:
+            if send_queue and self._sock is not None:
+                try:
+                    sent = send_queue.send(self._sock)
+                except socket.error as error:
+                    self._socket_fail('send fail; {}', error)
+                if sent:
+                    self._on_sent(sent)
+            buffered_amount = send_queue.buffered_amount
+            if not self._write_paused and send_queue.is_full:
+                self._write_paused = True
+                full = True
+            elif self._write_paused and send_queue.is_drained:
+                self._write_paused = False
+                full = False
+            else:
+                return
+        if full:
+            yield events.BufferFull(buffered_amount)
+        else:
+            yield events.BufferDrained(buffered_amount)
+
+    def _flush_send_queue(self):
+        """Send any queued data before the socket is closed."""
+        if not self._send_queue or self._sock is None:
+            return
+        send_queue = self._send_queue
+        with self._lock:
+            buffered_amount = send_queue.buffered_amount
+            try:
+                self._sock.settimeout(self.FLUSH_TIMEOUT)
+                send_queue.send_all(self._sock)
+            except socket.error as error:
+                log.debug('unable to send queued data; %s', error)
+            self.websocket.metrics.bytes_sent += (
+                buffered_amount - send_queue.buffered_amount
+            )
+
+    @classmethod
+    def _can_sendmsg(cls, sock):
+        """Check if the socket supports scatter / gather writes."""
+        return can_sendmsg(sock)
+
+    @classmethod
+    def _sendmsg_all(cls, sock, buffers):
+        """Send all buffers with sendmsg."""
+        buffers = [memoryview(buffer) for buffer in buffers if len(buffer)]
+        while buffers:
+            sent = sock.sendmsg(buffers)
+            # Discard what was sent, which may be part way through a
+            # buffer.
+            while sent:
+                buffer_size = len(buffers[0])
+                if sent >= buffer_size:
+                    del buffers[0]
+                    sent -= buffer_size
+                else:
+                    buffers[0] = buffers[0][sent:]
+                    sent = 0
 
     def send(self, opcode, data):
         """Send a WS Frame."""
         frame = Frame(opcode, payload=bytearray(data))
-        self.write(frame.to_bytes())
-        log.debug(' SRV <- CLI : %r', frame)
-
-    def send_compressed(self, opcode, data):
-        """Send a compressed WS Frame."""
-        frame = Frame(opcode, payload=bytearray(data), rsv1=1)
-        self.write(frame.to_bytes())
+        self._send_frame(frame)
+
+    def send_compressed(self, opcode, data, compression=None,
+                        fragment_size=None):
+        """Send a compressed message.
+
+        If `compression` is set, `data` is compressed with it while the
+        message lock is held, otherwise `data` must already be
+        compressed. The message is sent in fragments if it is larger
+        than `fragment_size`.
+
+        """
+        with self._message_lock:
+            if compression:
+                data = self._compress(compression, data)
+            if fragment_size and len(data) > fragment_size:
+                self.send_fragments(opcode, data, fragment_size, rsv1=1)
+            else:
+                frame = Frame(opcode, payload=bytearray(data), rsv1=1)
+                self._send_frame(frame)
+
+    def _compress(self, compression, data):
+        """Compress a message, must be called with the message lock
+        held.
+
+        """
+        compressed = compression.compress(data)
+        self.websocket.metrics.on_compress(len(data), len(compressed))
+        return compressed
+
+    def _send_frame(self, frame):
+        """Send a single WS Frame."""
+        if frame.is_control:
+            # Control frames may be sent between fragments
+            self.write_buffers(frame.to_buffers())
+        else:
+            with self._message_lock:
+                self.write_buffers(frame.to_buffers())
         log.debug(' SRV <- CLI : %r', frame)
+        metrics = self.websocket.metrics
+        metrics.frames_sent[frame.opcode] += 1
+        metrics.on_message_sent(frame.opcode, len(frame.payload))
+
+    def send_fragments(self, opcode, data, fragment_size, rsv1=0):
+        """Send a message as several WS Frames of no more than
+        `fragment_size` bytes.
+
+        Each fragment is copied and masked as it is sent, and control
+        frames (e.g. pongs) may be sent between fragments.
+
+        """
+        metrics = self.websocket.metrics
+        data_view = memoryview(data)
+        length = len(data)
+        with self._message_lock:
+            for start in range(0, length, fragment_size):
+                end = start + fragment_size
+                frame = Frame(
+                    opcode if start == 0 else Opcode.CONTINUATION,
+                    payload=bytearray(data_view[start:end]),
+                    fin=1 if end >= length else 0,
+                    rsv1=rsv1 if start == 0 else 0
+                )
+                self.write_buffers(frame.to_buffers())
+                log.debug(' SRV <- CLI : %r', frame)
+                metrics.frames_sent[frame.opcode] += 1
+        metrics.on_message_sent(opcode, length)
+
+    def send_chunks(self, opcode, chunks, compression=None):
+        """Send a message as a WS Frame per chunk.
+
+        `chunks` is an iterable of ``(<bytes>, <fin>)`` tuples. A
+        bytearray chunk is masked in place, and is no longer referenced
+        when the next chunk is requested, so buffers may be reused.
+
+        """
+        metrics = self.websocket.metrics
+        frame_opcode = opcode
+        rsv1 = 1 if compression else 0
+        length = 0
+        with self._message_lock:
+            for chunk, fin in chunks:
+                if compression:
+                    raw_size = len(chunk)
+                    chunk = compression.compress_chunk(chunk, fin=fin)
+                    metrics.on_compress(raw_size, len(chunk))
+                elif self._send_queue is not None:
+                    # Queued data must not reference a reused buffer
+                    chunk = bytes(chunk)
+                frame = Frame(frame_opcode, payload=chunk, fin=fin, rsv1=rsv1)
+                self.write_buffers(frame.to_buffers())
+                log.debug(' SRV <- CLI : %r', frame)
+                metrics.frames_sent[frame_opcode] += 1
+                length += len(chunk)
+                frame_opcode = Opcode.CONTINUATION
+                rsv1 = 0
+        metrics.on_message_sent(opcode, length)
+
+    def send_frames(self, frames, compression=None):
+        """Send several WS Frames in a single write.
+
+        If `compression` is set, the frame payloads are compressed with
+        it while the message lock is held.
+
+        """
+        with self._message_lock:
+            data = bytearray()
+            for frame in frames:
+                if compression:
+                    frame.payload = bytearray(
+                        self._compress(compression, frame.payload)
+                    )
+                    frame.rsv1 = 1
+                header_bytes, payload = frame.to_buffers()
+                data += header_bytes
+                data += payload
+            self.write(data)
+        metrics = self.websocket.metrics
+        for frame in frames:
+            log.debug(' SRV <- CLI : %r', frame)
+            metrics.frames_sent[frame.opcode] += 1
+            metrics.on_message_sent(frame.opcode, len(frame.payload))
 
     @classmethod
     def _socket_fail(cls, msg, *args, **kwargs):
@@ -125,38 +432,53 @@ class WebsocketSession(object):
         log.debug(_msg)
         raise _SocketFail(_msg)
 
-    def _connect_sock(self, host, port, ssl=False):
-        sock = None
-        try:
-            addr_info = socket.getaddrinfo(
+    def _resolve(self, host, port):
+        """Look up the addresses of a host, from the websocket's DNS
+        cache if it has one.
+
+        """
+        dns_cache = self.websocket.dns_cache
+        if dns_cache is None:
+            return socket.getaddrinfo(
                 host, port, socket.AF_UNSPEC, socket.SOCK_STREAM
             )
+        return dns_cache.resolve(host, port)
+
+    def _invalidate_address(self, host, port):
+        """Discard cached addresses that couldn't be connected to."""
+        dns_cache = self.websocket.dns_cache
+        if dns_cache is not None:
+            dns_cache.invalidate(host, port)
+
+    def _connect_sock(self, host, port, ssl=False):
+        try:
+            addr_info = self._resolve(host, port)
         except socket.error as error:
             self._socket_fail('unable to connect; {}', error)
-        for res in addr_info:
-            af, socktype, proto, canonname, sa = res
+        addresses = list(addr_info)
+        while True:
             try:
-                sock = socket.socket(af, socktype, proto)
+                sock = happy_eyeballs.connect(
+                    addresses,
+                    attempt_delay=self.CONNECTION_ATTEMPT_DELAY,
+                    timeout=self.CONNECT_TIMEOUT
+                )
             except socket.error as error:
-                log.debug('unable to create socket; %s', error)
-                sock = None
-                continue
-            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-            sock.settimeout(30)  # TODO: make a parameter for this?
-            if ssl:
-                log.debug('wrapping socket')
-                sock = self._wrap_socket(sock, host)
+                self._invalidate_address(host, port)
+                self._socket_fail('unable to connect; {}', error)
+            sock.settimeout(self.CONNECT_TIMEOUT)
+            if not ssl:
+                return sock
+            log.debug('wrapping socket')
             try:
-                sock.connect(sa)
+                return self._wrap_socket(sock, host)
             except socket.error as error:
-                log.debug('socket error connecting to %r; %s', sa, error)
+                log.debug('unable to wrap socket; %s', error)
+                addresses = _remove_peer(addresses, sock)
                 sock.close()
-                sock = None
-                continue
-            break
-        if sock is None:
-            self._socket_fail('unable to connect')
-        return sock
+                if not addresses:
+                    self._socket_fail('unable to connect; {}', error)
+                # Try the remaining addresses
 
     def _connect_proxy(self, proxy_url):
         """Connect to a http proxy, return socket."""
@@ -211,21 +533,26 @@ class WebsocketSession(object):
         sock.settimeout(None)
         return sock, proxy_url
 
-    def _wrap_socket(self, sock, host):
-        """Wrap the socket with an SSL proxy."""
+    @classmethod
+    def _select_ssl_protocol(cls):
+        """Get the most secure SSL protocol available."""
+        if hasattr(ssl, 'PROTOCOL_TLS_CLIENT'):
+            return ssl.PROTOCOL_TLS_CLIENT
+        if hasattr(ssl, 'PROTOCOL_TLSv1_2'):
+            return ssl.PROTOCOL_TLSv1_2
+        if hasattr(ssl, 'PROTOCOL_TLS'):
+            return ssl.PROTOCOL_TLS
+        return ssl.PROTOCOL_SSLv23
+
+    def _create_ssl_context(self):
+        """Get an SSL context from the websocket's SSL options, or
+        `None` if this Python has no SSLContext.
+
+        """
         verify = self.websocket.ssl_verify
         cafile = self.websocket.ssl_cafile
         ssl_context = self.websocket.ssl_context
 
-        def _select_ssl_protocol():
-            if hasattr(ssl, 'PROTOCOL_TLS_CLIENT'):
-                return ssl.PROTOCOL_TLS_CLIENT
-            if hasattr(ssl, 'PROTOCOL_TLSv1_2'):
-                return ssl.PROTOCOL_TLSv1_2
-            if hasattr(ssl, 'PROTOCOL_TLS'):
-                return ssl.PROTOCOL_TLS
-            return ssl.PROTOCOL_SSLv23
-
         if ssl_context is None:
             if verify and hasattr(ssl, 'create_default_context'):
                 kwargs = {}
@@ -235,7 +562,7 @@ class WebsocketSession(object):
             elif not verify and hasattr(ssl, '_create_unverified_context'):
                 ssl_context = ssl._create_unverified_context()
             elif hasattr(ssl, 'SSLContext'):
-                ssl_context = ssl.SSLContext(_select_ssl_protocol())
+                ssl_context = ssl.SSLContext(self._select_ssl_protocol())
                 if verify:
                     if hasattr(ssl_context, 'check_hostname'):
                         ssl_context.check_hostname = True
@@ -266,7 +593,13 @@ class WebsocketSession(object):
                 ssl_context.options |= ssl.OP_NO_TLSv1_1
             except Exception:
                 pass
+        return ssl_context
 
+    def _wrap_socket(self, sock, host):
+        """Wrap the socket with an SSL proxy."""
+        verify = self.websocket.ssl_verify
+        cafile = self.websocket.ssl_cafile
+        ssl_context = self._create_ssl_context()
         if ssl_context is not None:
             if HAS_SNI:
                 ssl_sock = ssl_context.wrap_socket(
@@ -275,7 +608,7 @@ class WebsocketSession(object):
             else:
                 ssl_sock = ssl_context.wrap_socket(sock)
         else:
-            ssl_version = _select_ssl_protocol()
+            ssl_version = self._select_ssl_protocol()
             cert_reqs = ssl.CERT_REQUIRED if verify else ssl.CERT_NONE
             if cafile is None:
                 ssl_sock = ssl.wrap_socket(
@@ -330,22 +663,42 @@ class WebsocketSession(object):
         else:
             return False
 
+    def _get_next_ping(self, ping_rate):
+        """Get the session time when the next ping is due."""
+        if self._adaptive_ping:
+            # After ping_rate seconds without data, and every ping_rate
+            # seconds after that until data is received.
+            return max(self._last_received, self._last_ping) + ping_rate
+        return self._next_ping
+
+    def _get_last_alive(self):
+        """Get the session time the server was last known to be
+        responsive.
+
+        """
+        if self._adaptive_ping:
+            return self._last_received
+        return self._last_pong
+
     def _check_auto_ping(self, ping_rate, session_time):
         """Check if a ping is required."""
-        if ping_rate and session_time > self._next_ping:
-            # Calculate next ping time that is in the future.
-            self._next_ping = (
-                math.ceil(session_time / ping_rate) * ping_rate
-            )
+        if ping_rate and session_time > self._get_next_ping(ping_rate):
+            if self._adaptive_ping:
+                self._last_ping = session_time
+            else:
+                # Calculate next ping time that is in the future.
+                self._next_ping = (
+                    math.ceil(session_time / ping_rate) * ping_rate
+                )
             try:
-                self.websocket.send_ping()
+                self.websocket.send_ping(self._make_ping_payload())
             except errors.WebSocketError:
                 pass  # If the websocket has gone away
 
     def _check_ping_timeout(self, ping_timeout, session_time):
         """Check if the server is not responding to pings."""
         if ping_timeout:
-            time_since_last_pong = session_time - self._last_pong
+            time_since_last_pong = session_time - self._get_last_alive()
             if time_since_last_pong > ping_timeout:
                 log.debug('ping_timeout time exceeded')
                 return True
@@ -363,18 +716,53 @@ class WebsocketSession(object):
                     "within {}s".format(close_timeout)
                 )
 
-    def _recv(self, count):
-        """Receive and return pending data from the socket."""
+    def _recv_into(self, buffer, count=0):
+        """Receive data in to a buffer, return number of bytes."""
         if self._sock is None:
-            return bytearray(b'')
+            return 0
         try:
-            _recv_count = self._sock.recv_into(self._buffer, count)
-            self.websocket._emit_trace('socket_recv', length=_recv_count)
-            return memoryview(self._buffer)[:_recv_count]
+            _recv_count = self._sock.recv_into(buffer, count)
+            if self._adaptive_ping and _recv_count:
+                self._last_received = self.session_time
+            websocket = self.websocket
+            websocket.metrics.bytes_received += _recv_count
+            if websocket.tracer is not None:
+                websocket.tracer.socket_recv(websocket.url, _recv_count)
+            return _recv_count
         except socket.error as error:
+            if would_block(error):
+                raise _WouldBlock()
             log.debug('error in _recv', exc_info=True)
             self._socket_fail('recv fail; {}', error)
 
+    def _recv(self, count):
+        """Receive and return pending data from the socket."""
+        _recv_count = self._recv_into(self._buffer, count)
+        return memoryview(self._buffer)[:_recv_count]
+
+    def _read(self, max_bytes):
+        """Read from the socket, and return an iterable of events, or
+        `None` if the socket was closed.
+
+        """
+        # Large payloads are received directly in to their destination
+        # buffer, rather than copied 64K at a time through self._buffer
+        read_buffer = self.websocket.get_buffer(self.BUFFER_SIZE)
+        try:
+            if read_buffer is not None:
+                recv_count = self._recv_into(read_buffer)
+                if not recv_count:
+                    return None
+                return self.websocket.buffer_updated(recv_count)
+            data = self._recv(max_bytes)
+        except _WouldBlock:
+            # Non-blocking sockets may be readable with nothing to read
+            # (e.g. part of a TLS record).
+            return ()
+        if not data:
+            return None
+        return self.websocket.feed(data)
+
     def _regular(self, poll, ping_rate, ping_timeout, close_timeout):
         """Run regularly to do polling / pings."""
         # Check for regularly running actions.
@@ -388,6 +776,35 @@ class WebsocketSession(object):
             )
         self._check_close_timeout(close_timeout, self.session_time)
 
+    def _get_deadline(self, poll, ping_rate, ping_timeout, close_timeout):
+        """Get the session time at which :meth:`_regular` next has
+        something to do.
+
+        """
+        deadline = (
+            0.0 if self._poll_start is None else self._poll_start + poll
+        )
+        if ping_rate:
+            deadline = min(deadline, self._get_next_ping(ping_rate))
+        if ping_timeout:
+            deadline = min(deadline, self._get_last_alive() + ping_timeout)
+        sent_close_time = self.websocket.sent_close_time
+        if close_timeout and sent_close_time is not None:
+            deadline = min(deadline, sent_close_time + close_timeout)
+        return deadline
+
+    def _get_timeout(self, poll, ping_rate, ping_timeout, close_timeout):
+        """Get the time to wait for data, before regular events are
+        due.
+
+        """
+        if not self._ready:
+            return poll
+        deadline = self._get_deadline(
+            poll, ping_rate, ping_timeout, close_timeout
+        )
+        return max(0.0, deadline - self.session_time)
+
     def _send_pong(self, event):
         """Send a pong message in response to ping event."""
         try:
@@ -396,14 +813,43 @@ class WebsocketSession(object):
             # In case the websocket has gone away
             pass
 
+    def _make_ping_payload(self):
+        """Get a payload for an automatic ping, with a sequence number
+        and the time it was sent.
+
+        """
+        self._ping_sequence += 1
+        return self._ping_struct.pack(self._ping_sequence, monotonic_time())
+
+    def _match_pong(self, data):
+        """Record the round trip time if `data` is the payload of an
+        automatic ping. Return the round trip time, or ``None`` if the
+        pong wasn't in response to an automatic ping.
+
+        """
+        if len(data) != self._ping_struct.size:
+            return None
+        sequence, ping_time = self._ping_struct.unpack(data)
+        # Ignore pongs we have already seen, or pings we didn't send
+        if not self._pong_sequence < sequence <= self._ping_sequence:
+            return None
+        self._pong_sequence = sequence
+        rtt = monotonic_time() - ping_time
+        self.rtt.add(rtt)
+        self.websocket.metrics.ping_rtt.observe(rtt)
+        return rtt
+
     def _on_pong(self, event):
         """Record last pong time."""
         self._last_pong = self.session_time
 
     def _on_ready(self):
         """Called when a ready event is received."""
+        self.websocket.metrics.connects += 1
         self._last_pong = 0.0
         self._next_ping = 0.0
+        self._last_received = 0.0
+        self._last_ping = 0.0
         self._start_time = monotonic_time()
 
     def _on_event(self, event, auto_pong=True):
@@ -422,8 +868,13 @@ class WebsocketSession(object):
             ping_rate=30,
             ping_timeout=None,
             auto_pong=True,
-            close_timeout=None):
+            close_timeout=None,
+            queue_writes=False,
+            high_watermark=64 * 1024,
+            low_watermark=16 * 1024,
+            adaptive_ping=False):
         """Run the websocket."""
+        self._adaptive_ping = adaptive_ping
         websocket = self.websocket
         url = websocket.url
         # Connecting event
@@ -441,19 +892,31 @@ class WebsocketSession(object):
             yield events.ConnectFail('{}'.format(error))
             return
 
+        # Writes are queued and sent by the loop below, so that
+        # writing never blocks.
+        if queue_writes:
+            self._send_queue = SendQueue(high_watermark, low_watermark)
+            self._waker = selectors.Waker()
+            self._write_paused = False
+            sock.setblocking(False)
+
         # We now have a socket.
         # Send the request.
         try:
             self._send_request()
         except errors.WebSocketError as error:
             self._close_socket()
+            self._close_send_queue()
             yield events.ConnectFail('request failed; {}'.format(error))
             return
 
         # Connected to the server, but not yet upgraded to websockets
         yield events.Connected(url, proxy=proxy)
 
-        selector = self._selector_cls(sock)
+        if self._waker is None:
+            selector = self._selector_cls(sock)
+        else:
+            selector = self._selector_cls(sock, waker=self._waker)
         log.debug('%r created', selector)
 
         def _regular():
@@ -466,21 +929,34 @@ class WebsocketSession(object):
 
         try:
             while not websocket.is_closed:
-                readable, max_bytes = selector.wait(self.BUFFER_SIZE, poll)
+                timeout = self._get_timeout(
+                    poll, ping_rate, ping_timeout, close_timeout
+                )
+                if self._send_queue is None:
+                    readable, max_bytes = selector.wait(
+                        self.BUFFER_SIZE, timeout
+                    )
+                else:
+                    readable, _writable, max_bytes = selector.wait_io(
+                        self.BUFFER_SIZE,
+                        timeout,
+                        write=bool(self._send_queue)
+                    )
+                    for event in self._send_queued():
+                        yield event
                 for event in _regular():
                     yield event
                 if readable:
-                    data = self._recv(max_bytes)
-                    if data:
-                        for event in self.websocket.feed(data):
-                            self._on_event(event, auto_pong)
-                            yield event
-                            for event in _regular():
-                                yield event
-                    else:
+                    received_events = self._read(max_bytes)
+                    if received_events is None:
                         if websocket.is_active:
                             self._socket_fail('connection lost')
                         break
+                    for event in received_events:
+                        self._on_event(event, auto_pong)
+                        yield event
+                        for event in _regular():
+                            yield event
         except _ForceDisconnect as error:
             self._close_socket()
             yield events.Disconnected('disconnected; {}'.format(error))
@@ -497,7 +973,17 @@ class WebsocketSession(object):
         else:
             # The websocket instance terminated the loop, which means
             # it was a graceful exit.
+            self._flush_send_queue()
             self._close_socket()
             yield events.Disconnected(graceful=True)
         finally:
             selector.close()
+            self._close_send_queue()
+
+    def _close_send_queue(self):
+        """Discard the send queue, if there is one."""
+        with self._lock:
+            if self._waker is not None:
+                self._waker.close()
+            self._send_queue = None
+            self._waker = None
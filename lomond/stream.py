@@ -7,47 +7,160 @@ Yields a response object followed by 0 or more Websocket messages.
 
 from __future__ import unicode_literals
 
+import codecs
 import logging
 
 from six import text_type
 
 from . import errors
-from .frame_parser import ClientFrameParser
-from .message import Message
+from .frame_parser import ClientFrameParser, FastClientFrameParser
+from .message import BinaryChunk, Message, TextChunk
+from .metrics import Metrics
+from .opcode import Opcode
 from .parser import ParseError
 from .response import Response
 
 
 log = logging.getLogger('lomond')
 
+_Utf8IncrementalDecoder = codecs.getincrementaldecoder('utf-8')
+
 
 class WebsocketStream(object):
     """
     Parses a stream of data in to Headers and logical Websocket
     frames.
 
+    :param bool stream_messages: Yield a chunk of the message for each
+        text or binary frame, rather than whole messages.
+    :param int max_frame_size: Maximum size of a frame payload, or
+        ``None`` for no limit.
+    :param int max_message_size: Maximum size of a message, both
+        before and after decompression, or ``None`` for no limit.
+    :param bool fast_parser: Parse frames with the state machine
+        :class:`~lomond.frame_parser.FastFrameParser`.
+    :param metrics: A :class:`~lomond.metrics.Metrics` object to count
+        frames and messages received, or ``None`` to create one.
+
     """
 
-    def __init__(self):
-        self.frame_parser = ClientFrameParser()
+    def __init__(self,
+                 stream_messages=False,
+                 max_frame_size=None,
+                 max_message_size=None,
+                 fast_parser=False,
+                 metrics=None):
+        parser_class = (
+            FastClientFrameParser if fast_parser else ClientFrameParser
+        )
+        self.frame_parser = parser_class(
+            max_frame_size=max_frame_size,
+            max_message_size=max_message_size
+        )
+        self.stream_messages = stream_messages
+        self.metrics = Metrics() if metrics is None else metrics
         self._parsed_response = False
         self._frames = []
         self._decompress = None
+        self._compression = None
+        # State of the message being streamed
+        self._chunk_opcode = None
+        self._chunk_compressed = False
+        self._text_decoder = _Utf8IncrementalDecoder('strict')
+        # Size of the payloads received for the current message
+        self._message_size = 0
 
     def set_compression(self, compression):
         """Set a compression object for decompressing messages."""
         self.frame_parser.enable_compression()
-        self._decompress = compression.decompress if compression else None
+        self._compression = compression
+        self._decompress = self._decompress_frames if compression else None
+
+    def _decompress_frames(self, frames):
+        """Decompress the payloads of a message."""
+        payload = self._compression.decompress(
+            frames, max_size=self.frame_parser.max_message_size
+        )
+        self.metrics.on_decompress(
+            sum(len(frame.payload) for frame in frames),
+            len(payload)
+        )
+        return payload
 
     def build_message(self, frames):
         """Return a message, built from a list of frames."""
         return Message.build(frames, self._decompress)
 
+    def build_chunk(self, frame):
+        """Return part of a message, built from a single frame."""
+        if frame.is_continuation:
+            if self._chunk_opcode is None:
+                raise errors.ProtocolError(
+                    'continuation frame has nothing to continue'
+                )
+        else:
+            if self._chunk_opcode is not None:
+                raise errors.ProtocolError(
+                    'continuation frame expected'
+                )
+            self._chunk_opcode = frame.opcode
+            self._chunk_compressed = bool(frame.rsv1 and self._compression)
+        opcode = self._chunk_opcode
+        fin = bool(frame.fin)
+        if fin:
+            self._chunk_opcode = None
+        payload = frame.payload
+        if self._chunk_compressed:
+            compressed_size = len(payload)
+            try:
+                payload = self._compression.decompress_chunk(
+                    payload,
+                    fin=fin,
+                    max_size=self.frame_parser.max_message_size
+                )
+            except errors.MessageTooLarge:
+                raise
+            except Exception:
+                log.exception('error decompressing payload')
+                raise errors.CriticalProtocolError(
+                    'unable to decompress payload'
+                )
+            self.metrics.on_decompress(compressed_size, len(payload))
+        if opcode != Opcode.TEXT:
+            return BinaryChunk(bytes(payload), fin)
+        if frame.text is not None:
+            # The parser has already decoded the text
+            return TextChunk(frame.text, fin)
+        try:
+            text = self._text_decoder.decode(bytes(payload), fin)
+        except UnicodeDecodeError as error:
+            self._text_decoder.reset()
+            raise errors.CriticalProtocolError(
+                'payload contains invalid utf-8; {}',
+                error
+            )
+        return TextChunk(text, fin)
+
     def feed(self, data):
         """Feed in data from a socket to yield 0 or more frames."""
+        return self._build_messages(self.frame_parser.feed(data))
+
+    def get_buffer(self, min_size=0):
+        """Get a buffer to receive the remainder of a large payload."""
+        return self.frame_parser.get_buffer(min_size)
+
+    def buffer_updated(self, nbytes):
+        """Yield 0 or more frames after data was received in to the
+        buffer returned from `get_buffer`.
+
+        """
+        return self._build_messages(self.frame_parser.buffer_updated(nbytes))
+
+    def _build_messages(self, parsed):
+        """Yield messages from parsed objects."""
         # This combines fragmented frames in to a single frame
 
-        iter_frames = iter(self.frame_parser.feed(data))
+        iter_frames = iter(parsed)
 
         if not self._parsed_response:
             try:
@@ -61,6 +174,7 @@ class WebsocketStream(object):
             yield Response(header_data)
             self._parsed_response = True
 
+        metrics = self.metrics
         # Process incoming frames
         while True:
             try:
@@ -79,10 +193,19 @@ class WebsocketStream(object):
                     'unknown error; {}'.format(error)
                 )
             log.debug(" SRV -> CLI : %r", frame)
+            metrics.frames_received[frame.opcode] += 1
             if frame.is_control:
                 # Control messages are never fragmented
                 # And may be sent in the middle of a multi-part message
+                metrics.messages_received[frame.opcode] += 1
                 yield self.build_message([frame])
+                continue
+            self._message_size += len(frame.payload)
+            if self.stream_messages:
+                chunk = self.build_chunk(frame)
+                if frame.fin:
+                    self._count_message(chunk.opcode)
+                yield chunk
             else:
                 # May be fragmented
                 if frame.is_continuation and not self._frames:
@@ -93,7 +216,20 @@ class WebsocketStream(object):
                     raise errors.ProtocolError(
                         'continuation frame expected'
                     )
+                if not frame.fin and isinstance(frame.payload, memoryview):
+                    # The payload may reference the socket buffer, which
+                    # will be overwritten before the message is complete
+                    frame.payload = frame.payload.tobytes()
                 self._frames.append(frame)
                 if frame.fin:
-                    yield self.build_message(self._frames)
+                    message = self.build_message(self._frames)
                     del self._frames[:]
+                    self._count_message(message.opcode)
+                    yield message
+
+    def _count_message(self, opcode):
+        """Count a complete text or binary message."""
+        metrics = self.metrics
+        metrics.messages_received[opcode] += 1
+        metrics.message_size_received.observe(self._message_size)
+        self._message_size = 0
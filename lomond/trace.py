@@ -0,0 +1,143 @@
+"""
+Structured trace records, for in-depth debugging.
+
+A :class:`Tracer` receives a call for each packet and message sent or
+received, and for changes in the state of the connection. When no
+tracer is attached, each trace point costs a single attribute check.
+
+"""
+
+from __future__ import unicode_literals
+
+import logging
+
+from .opcode import Opcode
+
+
+log = logging.getLogger('lomond')
+
+
+_SEND_STAGES = {
+    Opcode.TEXT: 'send_text',
+    Opcode.BINARY: 'send_binary',
+    Opcode.PING: 'send_ping',
+    Opcode.PONG: 'send_pong',
+}
+
+
+class Tracer(object):
+    """Builds trace records, and passes them to a callback.
+
+    Records are dicts with a ``'stage'`` and the ``'url'`` of the
+    websocket, and fields specific to the stage. Override
+    :meth:`emit` to handle records, or the typed methods to avoid
+    building records at all.
+
+    :param callback: A callable that is passed each record, or
+        ``None`` to log records at debug level.
+    :param int sample_rate: Trace 1 in `sample_rate` packets and
+        messages. Changes to the state of the connection are always
+        traced.
+
+    """
+
+    def __init__(self, callback=None, sample_rate=1):
+        self.callback = callback
+        self.sample_rate = sample_rate
+        self._sample_count = 0
+
+    def __repr__(self):
+        return "Tracer({!r}, sample_rate={})".format(
+            self.callback, self.sample_rate
+        )
+
+    def emit(self, record):
+        """Handle a trace record."""
+        if self.callback is None:
+            log.debug('TRACE %r', record)
+        else:
+            self.callback(record)
+
+    def sample(self):
+        """Check if the next packet or message should be traced."""
+        if self.sample_rate <= 1:
+            return True
+        self._sample_count += 1
+        if self._sample_count >= self.sample_rate:
+            self._sample_count = 0
+            return True
+        return False
+
+    def trace(self, url, stage, **fields):
+        """Emit a record for a change in the state of the connection."""
+        record = {'stage': stage, 'url': url}
+        record.update(fields)
+        self.emit(record)
+
+    def socket_send(self, url, length):
+        """Called when data was written to the socket."""
+        if self.sample():
+            self.trace(url, 'socket_send', length=length)
+
+    def socket_recv(self, url, length):
+        """Called when data was read from the socket."""
+        if self.sample():
+            self.trace(url, 'socket_recv', length=length)
+
+    def message_sent(self, url, opcode, length, compressed=None):
+        """Called when a text, binary, ping or pong message is sent."""
+        if not self.sample():
+            return
+        if compressed is None:
+            self.trace(url, _SEND_STAGES[opcode], length=length)
+        else:
+            self.trace(
+                url,
+                _SEND_STAGES[opcode],
+                length=length,
+                compressed=compressed
+            )
+
+    def message_received(self, url, message):
+        """Called with a message (other than close) as it is
+        received.
+
+        """
+        if not self.sample():
+            return
+        if message.is_ping:
+            self.trace(url, 'message_ping', length=len(message.data))
+        elif message.is_pong:
+            self.trace(url, 'message_pong', length=len(message.data))
+        elif message.is_chunk:
+            if message.is_binary:
+                self.trace(
+                    url,
+                    'message_binary_chunk',
+                    length=len(message.data),
+                    fin=message.fin
+                )
+            else:
+                self.trace(
+                    url,
+                    'message_text_chunk',
+                    length=len(message.text),
+                    fin=message.fin
+                )
+        elif message.is_binary:
+            self.trace(url, 'message_binary', length=len(message.data))
+        elif message.is_text:
+            self.trace(url, 'message_text', length=len(message.text))
+
+
+def get_tracer(trace):
+    """Get a :class:`Tracer` from the `trace` argument to
+    :class:`~lomond.websocket.WebSocket`, or ``None`` if tracing is
+    disabled.
+
+    """
+    if not trace:
+        return None
+    if isinstance(trace, Tracer):
+        return trace
+    return Tracer(trace if callable(trace) else None)
@@ -0,0 +1,102 @@
+"""
+Incremental UTF-8 validation with the built-in codec.
+
+Validates at C speed, without the optional `wsaccel` extension, and
+keeps the decoded text so that it needn't be decoded again.
+
+"""
+
+from __future__ import unicode_literals
+
+import codecs
+
+
+_Utf8IncrementalDecoder = codecs.getincrementaldecoder('utf-8')
+
+
+class Utf8Decoder(object):
+    """Incremental UTF-8 validator, using the built-in codec.
+
+    A drop-in replacement for
+    :class:`~lomond.utf8validator.Utf8Validator`. Text decoded by
+    `validate` may be retrieved with `get_text`.
+
+    """
+
+    __slots__ = ['_decoder', '_index', '_text']
+
+    def __init__(self):
+        self._decoder = _Utf8IncrementalDecoder('strict')
+        self._index = 0
+        self._text = []
+
+    def reset(self):
+        """Reset to validate a new sequence."""
+        self._decoder.reset()
+        self._index = 0
+        del self._text[:]
+
+    def get_text(self, final=False):
+        """Get the text decoded since the last call.
+
+        :param bool final: Set if this is the end of the sequence.
+        :raises UnicodeDecodeError: If `final` is set and the sequence
+            ends part way through a code point.
+
+        """
+        if final:
+            # Raises if there are bytes left over
+            self._decoder.decode(b'', True)
+        text = ''.join(self._text)
+        del self._text[:]
+        return text
+
+    def _fail(self, index):
+        """Record a failure at `index` in the current chunk."""
+        self._index += index
+        return False, False, index, self._index
+
+    def validate(self, ba):
+        """Incrementally validate a chunk of bytes.
+
+        Returns a tuple of ``(valid, ends_on_codepoint, current_index,
+        total_index)``. As with the DFA validator, the indexes are of
+        the first invalid byte when ``valid`` is ``False``, otherwise
+        ``current_index`` is the length of the chunk and
+        ``total_index`` is the total bytes validated.
+
+        """
+        pending = self._decoder.getstate()[0]
+        try:
+            text = self._decoder.decode(ba, False)
+        except UnicodeDecodeError as error:
+            # The codec reports the start of the invalid sequence
+            data = bytearray(pending + bytes(ba))
+            index = _find_invalid_byte(data, error.start)
+            return self._fail(max(0, index - len(pending)))
+        tail = bytearray(self._decoder.getstate()[0])
+        # The codec defers rejecting an incomplete surrogate (U+D800 to
+        # U+DFFF) until it is complete; reject it now, to fail fast.
+        if len(tail) >= 2 and tail[0] == 0xed and tail[1] >= 0xa0:
+            return self._fail(max(0, len(ba) - len(tail) + 1))
+        self._text.append(text)
+        length = len(ba)
+        self._index += length
+        return True, not tail, length, self._index
+
+
+def _find_invalid_byte(data, start):
+    """Get the index of the byte that invalidates a UTF-8 sequence
+    starting at `start`.
+
+    """
+    # Imported here, as utf8validator may import this module
+    from .utf8validator import UTF8VALIDATOR_DFA, UTF8_ACCEPT, UTF8_REJECT
+    state = UTF8_ACCEPT
+    for index in range(start, min(start + 4, len(data))):
+        state = UTF8VALIDATOR_DFA[
+            256 + (state << 4) + UTF8VALIDATOR_DFA[data[index]]
+        ]
+        if state == UTF8_REJECT:
+            return index
+    return start
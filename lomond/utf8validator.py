@@ -235,3 +235,9 @@ except ImportError:
                 self._state = state
                 self._index += l
                 return True, state == UTF8_ACCEPT, l, self._index
+
+    if six.PY3:
+        # The built-in codec validates at C speed, and is preferred to
+        # the pure Python DFA (which remains as PyUtf8Validator).
+        PyUtf8Validator = Utf8Validator
+        from .utf8decoder import Utf8Decoder as Utf8Validator  # noqa: F811
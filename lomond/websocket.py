@@ -19,14 +19,19 @@ from six.moves.urllib.parse import urlparse
 from . import constants
 from . import errors
 from . import events
+from .batch import Batch
+from .chunks import CHUNK_SIZE, iter_chunks, read_chunks
 from .compression import Deflate
+from .dns import get_dns_cache
 from .frame import Frame
+from .metrics import Metrics
 from .opcode import Opcode
 from .extension import parse_extension
 from .response import Response
 from .stream import WebsocketStream
 from .session import WebsocketSession
 from .status import Status
+from .trace import get_tracer
 
 
 log = logging.getLogger('lomond')
@@ -50,13 +55,53 @@ class WebSocket(object):
     :param str ssl_cafile: Optional path to a CA bundle file used for
         TLS verification.
     :param ssl.SSLContext ssl_context: Optional custom SSL context.
-    :param trace: Optional callable for structured debug trace records.
+    :param trace: Optional callable for structured debug trace records,
+        or a :class:`~lomond.trace.Tracer` (e.g. to sample records).
+    :param int fragment_size: Send messages larger than this many bytes
+        as several frames, or ``None`` (default) to send every message
+        as a single frame.
+    :param bool stream_messages: Generate a
+        :class:`~lomond.events.BinaryChunk` or
+        :class:`~lomond.events.TextChunk` event for each frame received,
+        rather than a single event when a message is complete.
+    :param int max_frame_size: Maximum size (in bytes) of a frame
+        received from the server, or ``None`` for no limit.
+    :param int max_message_size: Maximum size (in bytes) of a message
+        received from the server, or ``None`` for no limit. Compressed
+        messages are limited both before and after decompression.
+    :param bool fast_parser: Parse frames with a state machine, which
+        is faster for streams of small frames, rather than a coroutine.
+    :param bool latency_events: Generate a
+        :class:`~lomond.events.Latency` event with the round trip time
+        of each automatic ping.
+    :param dns_cache: A :class:`~lomond.dns.DNSCache` for looking up the
+        server's address, ``True`` to use the cache shared by the process
+        (:data:`lomond.dns.default_cache`), or ``None`` (default) to look
+        up the address on every connect.
+
+    If a frame or message exceeds the maximum size, the websocket is
+    closed (with status 1009) before the payload is read.
+
+    Counts of data sent and received, over every connection, are kept
+    in the :attr:`metrics` attribute, a :class:`~lomond.metrics.Metrics`
+    object.
 
     """
 
     class State(object):
-        def __init__(self):
-            self.stream = WebsocketStream()
+        def __init__(self,
+                     stream_messages=False,
+                     max_frame_size=None,
+                     max_message_size=None,
+                     fast_parser=False,
+                     metrics=None):
+            self.stream = WebsocketStream(
+                stream_messages=stream_messages,
+                max_frame_size=max_frame_size,
+                max_message_size=max_message_size,
+                fast_parser=fast_parser,
+                metrics=metrics
+            )
             self.session = None
             self.key = b64encode(os.urandom(16))
             self.sent_request = False
@@ -74,7 +119,14 @@ class WebSocket(object):
                  ssl_verify=True,
                  ssl_cafile=None,
                  ssl_context=None,
-                 trace=None):
+                 trace=None,
+                 fragment_size=None,
+                 stream_messages=False,
+                 max_frame_size=None,
+                 max_message_size=None,
+                 fast_parser=False,
+                 latency_events=False,
+                 dns_cache=None):
         self.url = url
         self.proxies = self._detect_proxies() if proxies is None else proxies
         self.protocols = protocols or []
@@ -84,6 +136,14 @@ class WebSocket(object):
         self.ssl_cafile = ssl_cafile
         self.ssl_context = ssl_context
         self.trace = trace
+        self.fragment_size = fragment_size
+        self.stream_messages = stream_messages
+        self.max_frame_size = max_frame_size
+        self.max_message_size = max_message_size
+        self.fast_parser = fast_parser
+        self.latency_events = latency_events
+        self.dns_cache = get_dns_cache(dns_cache)
+        self.metrics = Metrics()
 
         self._headers = []
         _url = urlparse(url)
@@ -99,7 +159,7 @@ class WebSocket(object):
         if _url.query:
             self.resource = "{}?{}".format(self.resource, _url.query)
 
-        self.state = self.State()
+        self.reset()
 
     @classmethod
     def _detect_proxies(cls):
@@ -114,16 +174,23 @@ class WebSocket(object):
     def __repr__(self):
         return "WebSocket('{}')".format(self.url)
 
+    @property
+    def trace(self):
+        """The `trace` argument. Setting it replaces :attr:`tracer`,
+        so tracing may be enabled or disabled at any time.
+
+        """
+        return self._trace
+
+    @trace.setter
+    def trace(self, trace):
+        self._trace = trace
+        self.tracer = get_tracer(trace)
+
     def _emit_trace(self, stage, **fields):
         """Emit an optional trace record for in-depth debugging."""
-        if not self.trace:
-            return
-        record = {'stage': stage, 'url': self.url}
-        record.update(fields)
-        if callable(self.trace):
-            self.trace(record)
-        else:
-            log.debug('TRACE %r', record)
+        if self.tracer is not None:
+            self.tracer.trace(self.url, stage, **fields)
 
     @property
     def is_secure(self):
@@ -169,6 +236,15 @@ class WebSocket(object):
         enabled."""
         return bool(self.state.compression)
 
+    @property
+    def buffered_amount(self):
+        """Number of bytes queued to be sent, if the websocket was
+        connected with ``queue_writes=True``.
+
+        """
+        session = self.state.session
+        return 0 if session is None else session.buffered_amount
+
     @property
     def stream(self):
         return self.state.stream
@@ -208,7 +284,11 @@ class WebSocket(object):
                 ping_rate=30.0,
                 ping_timeout=None,
                 auto_pong=True,
-                close_timeout=30.0):
+                close_timeout=30.0,
+                queue_writes=False,
+                high_watermark=64 * 1024,
+                low_watermark=16 * 1024,
+                adaptive_ping=False):
         """Connect the websocket to a session.
 
         :param session_class: An object to manage the *session*. This
@@ -229,6 +309,20 @@ class WebSocket(object):
         :param float close_timeout: Seconds to wait for server to
             respond to a close packet, before closing the socket. Set to
             `None` or `0` to disable the timeout.
+        :param bool queue_writes: Queue data to be sent, rather than
+            block until the socket accepts it. Queued data is sent by
+            the session loop.
+        :param int high_watermark: If writes are queued, a
+            :class:`~lomond.events.BufferFull` event is generated when
+            this many bytes are waiting to be sent.
+        :param int low_watermark: If writes are queued, a
+            :class:`~lomond.events.BufferDrained` event is generated
+            when the queued data falls to this many bytes, after a
+            :class:`~lomond.events.BufferFull` event.
+        :param bool adaptive_ping: Only send pings after `ping_rate`
+            seconds without receiving data, and disconnect if no data
+            (rather than no pong) is received for `ping_timeout`
+            seconds.
         :returns: An iterable of :class:`~lomond.event.Event` instances.
 
         """
@@ -240,20 +334,77 @@ class WebSocket(object):
             ping_rate=ping_rate,
             ping_timeout=ping_timeout,
             auto_pong=auto_pong,
-            close_timeout=close_timeout
+            close_timeout=close_timeout,
+            adaptive_ping=adaptive_ping
         )
         run_generator = session.run(
             poll=poll,
             ping_rate=ping_rate,
             ping_timeout=ping_timeout,
             auto_pong=auto_pong,
-            close_timeout=close_timeout
+            close_timeout=close_timeout,
+            queue_writes=queue_writes,
+            high_watermark=high_watermark,
+            low_watermark=low_watermark,
+            adaptive_ping=adaptive_ping
         )
         return run_generator
 
+    def connect_async(self,
+                      session_class=None,
+                      poll=5.0,
+                      ping_rate=30.0,
+                      ping_timeout=None,
+                      auto_pong=True,
+                      close_timeout=30.0,
+                      adaptive_ping=False):
+        """Connect the websocket with an asyncio session, and return an
+        async iterable of events. Requires Python 3.7+::
+
+            async for event in websocket.connect_async():
+                print(event)
+
+        Parameters are the same as :meth:`connect`, but `session_class`
+        defaults to
+        :class:`~lomond.async_session.AsyncWebsocketSession`.
+
+        :returns: An async iterable of :class:`~lomond.event.Event`
+            instances.
+
+        """
+        if session_class is None:
+            # Imported here, as the module requires Python 3.7+
+            from .async_session import AsyncWebsocketSession
+            session_class = AsyncWebsocketSession
+        self.reset()
+        self.state.session = session = session_class(self)
+        self._emit_trace(
+            'connect_start',
+            poll=poll,
+            ping_rate=ping_rate,
+            ping_timeout=ping_timeout,
+            auto_pong=auto_pong,
+            close_timeout=close_timeout,
+            adaptive_ping=adaptive_ping
+        )
+        return session.run_async(
+            poll=poll,
+            ping_rate=ping_rate,
+            ping_timeout=ping_timeout,
+            auto_pong=auto_pong,
+            close_timeout=close_timeout,
+            adaptive_ping=adaptive_ping
+        )
+
     def reset(self):
         """Reset the state."""
-        self.state = self.State()
+        self.state = self.State(
+            stream_messages=self.stream_messages,
+            max_frame_size=self.max_frame_size,
+            max_message_size=self.max_message_size,
+            fast_parser=self.fast_parser,
+            metrics=self.metrics
+        )
 
     __iter__ = connect
 
@@ -327,8 +478,44 @@ class WebSocket(object):
         """
         if self.is_closed:
             return
+        for event in self._on_messages(self.stream.feed(data)):
+            yield event
+
+    def get_buffer(self, min_size=0):
+        """Get a writable buffer, so that the remainder of a large
+        payload may be received directly in to its destination. Returns
+        `None` if there is no read of at least `min_size` in progress.
+
+        This method is called by the Session object, and is not needed
+        for normal use.
+
+        :param int min_size: Minimum number of bytes outstanding.
+
+        """
+        if self.is_closed:
+            return None
+        return self.stream.get_buffer(min_size)
+
+    def buffer_updated(self, nbytes):
+        """Yield any events after data was received in to the buffer
+        returned by :meth:`get_buffer`.
+
+        This method is called by the Session object, and is not needed
+        for normal use.
+
+        :param int nbytes: Number of bytes received.
+
+        """
+        if self.is_closed:
+            return
+        for event in self._on_messages(self.stream.buffer_updated(nbytes)):
+            yield event
+
+    def _on_messages(self, messages):
+        """Yield events for messages from the stream."""
+        tracer = self.tracer
         try:
-            for message in self.stream.feed(data):
+            for message in messages:
                 if isinstance(message, Response):
                     response = message
                     try:
@@ -350,6 +537,8 @@ class WebSocket(object):
                         )
                         yield events.Ready(response, protocol, extensions)
                 else:
+                    if tracer is not None and not message.is_close:
+                        tracer.message_received(self.url, message)
                     if message.is_close:
                         for event in self._on_close(message):
                             self._emit_trace(
@@ -359,16 +548,30 @@ class WebSocket(object):
                             )
                             yield event
                     elif message.is_ping:
-                        self._emit_trace('message_ping', length=len(message.data))
                         yield events.Ping(message.data)
                     elif message.is_pong:
-                        self._emit_trace('message_pong', length=len(message.data))
+                        session = self.session
+                        rtt = (
+                            None if session is None
+                            else session._match_pong(message.data)
+                        )
                         yield events.Pong(message.data)
+                        if rtt is not None and self.latency_events:
+                            estimator = session.rtt
+                            yield events.Latency(
+                                rtt,
+                                estimator.min,
+                                estimator.avg,
+                                estimator.p99
+                            )
+                    elif message.is_chunk:
+                        if message.is_binary:
+                            yield events.BinaryChunk(message.data, message.fin)
+                        else:
+                            yield events.TextChunk(message.text, message.fin)
                     elif message.is_binary:
-                        self._emit_trace('message_binary', length=len(message.data))
                         yield events.Binary(message.data)
                     elif message.is_text:
-                        self._emit_trace('message_text', length=len(message.text))
                         yield events.Text(message.text)
                 if self.is_closed:
                     break
@@ -385,7 +588,7 @@ class WebSocket(object):
             # disconnect.
             log.debug('protocol error; %s', error)
             yield events.ProtocolError(six.text_type(error), False)
-            self.close(Status.PROTOCOL_ERROR, six.text_type(error))
+            self.close(error.status, six.text_type(error))
             self.force_disconnect()
 
         except GeneratorExit:
@@ -496,7 +699,8 @@ class WebSocket(object):
             raise TypeError('data argument must be bytes')
         if len(data) > 125:
             raise ValueError('ping data should be <= 125 bytes')
-        self._emit_trace('send_ping', length=len(data))
+        if self.tracer is not None:
+            self.tracer.message_sent(self.url, Opcode.PING, len(data))
         self.session.send(Opcode.PING, data)
 
     def send_pong(self, data):
@@ -516,7 +720,8 @@ class WebSocket(object):
             raise TypeError('data argument must be bytes')
         if len(data) > 125:
             raise ValueError('pong data should be <= 125 bytes')
-        self._emit_trace('send_pong', length=len(data))
+        if self.tracer is not None:
+            self.tracer.message_sent(self.url, Opcode.PONG, len(data))
         self.session.send(Opcode.PONG, data)
 
     def send_binary(self, data, compress=True):
@@ -530,12 +735,11 @@ class WebSocket(object):
         """
         if not isinstance(data, bytes):
             raise TypeError('data argument must be bytes')
-        self._emit_trace('send_binary', length=len(data), compressed=bool(compress))
-        if compress and self.state.compression:
-            _payload = self.state.compression.compress(data)
-            self.session.send_compressed(Opcode.BINARY, _payload)
-        else:
-            self.session.send(Opcode.BINARY, data)
+        if self.tracer is not None:
+            self.tracer.message_sent(
+                self.url, Opcode.BINARY, len(data), bool(compress)
+            )
+        self._send_message(Opcode.BINARY, data, compress)
 
     def send_json(self, _obj=Ellipsis, **kwargs):
         """Encode an object as JSON and send a text message.
@@ -575,12 +779,138 @@ class WebSocket(object):
         if not isinstance(text, six.text_type):
             raise TypeError('text argument must not be bytes')
         payload = text.encode('utf-8')
-        self._emit_trace('send_text', length=len(payload), compressed=bool(compress))
+        if self.tracer is not None:
+            self.tracer.message_sent(
+                self.url, Opcode.TEXT, len(payload), bool(compress)
+            )
+        self._send_message(Opcode.TEXT, payload, compress)
+
+    def _send_message(self, opcode, payload, compress):
+        """Send a text or binary message, in fragments if it is larger
+        than `fragment_size`.
+
+        """
+        fragment_size = self.fragment_size
         if compress and self.state.compression:
-            _payload = self.state.compression.compress(payload)
-            self.session.send_compressed(Opcode.TEXT, _payload)
+            # Compressed by the session, so that messages are sent in
+            # the order they were compressed
+            self.session.send_compressed(
+                opcode,
+                payload,
+                compression=self.state.compression,
+                fragment_size=fragment_size
+            )
+        elif fragment_size and len(payload) > fragment_size:
+            self.session.send_fragments(opcode, payload, fragment_size)
         else:
-            self.session.send(Opcode.TEXT, payload)
+            self.session.send(opcode, payload)
+
+    def send_stream(self,
+                    source,
+                    opcode=Opcode.BINARY,
+                    chunk_size=None,
+                    compress=True):
+        """Send a message read from a file object or an iterable, as a
+        frame per chunk.
+
+        A file object is read in chunks of `chunk_size` bytes with
+        ``readinto``, so the message needn't fit in memory::
+
+            with open('logs.tar.gz', 'rb') as logs_file:
+                websocket.send_stream(logs_file)
+
+        :param source: A binary file object, or an iterable of bytes
+            (or str for text messages).
+        :param int opcode: Either ``Opcode.BINARY`` (default) or
+            ``Opcode.TEXT``.
+        :param int chunk_size: Size of chunks read from a file object.
+            Defaults to ``fragment_size`` if set, otherwise 64K.
+        :param bool compress: Send the message in compressed form, if
+            compression is enabled on the server.
+        :raises ValueError: If `opcode` isn't text or binary.
+
+        """
+        if opcode not in (Opcode.TEXT, Opcode.BINARY):
+            raise ValueError('opcode must be TEXT or BINARY')
+        if hasattr(source, 'readinto'):
+            chunks = read_chunks(
+                source,
+                chunk_size or self.fragment_size or CHUNK_SIZE
+            )
+        else:
+            chunks = iter_chunks(
+                chunk.encode('utf-8')
+                if isinstance(chunk, six.text_type)
+                else chunk
+                for chunk in source
+            )
+        compression = self.state.compression if compress else None
+        self._emit_trace(
+            'send_stream',
+            opcode=opcode,
+            compressed=bool(compression)
+        )
+        self.session.send_chunks(opcode, chunks, compression=compression)
+
+    def send_many(self, messages, compress=True):
+        """Send several messages with a single write to the socket.
+
+        This is more efficient than sending many small messages
+        individually. Messages larger than `fragment_size` are sent in
+        fragments, as with :meth:`send_binary`, with a write for the
+        messages before and after.
+
+        :param messages: An iterable of messages; str (unicode on Py2)
+            is sent as text, and bytes are sent as binary.
+        :param bool compress: Send messages in compressed form, if
+            compression is enabled on the server.
+        :raises TypeError: If a message is not str or bytes.
+
+        """
+        compression = self.state.compression if compress else None
+        payloads = []
+        for message in messages:
+            if isinstance(message, six.text_type):
+                payloads.append((Opcode.TEXT, message.encode('utf-8')))
+            elif isinstance(message, bytes):
+                payloads.append((Opcode.BINARY, message))
+            else:
+                raise TypeError('messages must be text or bytes')
+        if not payloads:
+            return
+        self._emit_trace(
+            'send_many',
+            count=len(payloads),
+            compressed=bool(compression)
+        )
+        fragment_size = self.fragment_size
+        frames = []
+        for opcode, payload in payloads:
+            if fragment_size and len(payload) > fragment_size:
+                if frames:
+                    self.session.send_frames(frames, compression=compression)
+                    frames = []
+                self._send_message(opcode, payload, compress)
+            else:
+                frames.append(Frame(opcode, payload=bytearray(payload)))
+        if frames:
+            self.session.send_frames(frames, compression=compression)
+
+    def batch(self, compress=True):
+        """Get a :class:`~lomond.batch.Batch` object, which collects
+        messages to be sent with a single write.
+
+        Use as a context manager, which sends the messages on exit::
+
+            with websocket.batch() as batch:
+                for tick in ticks:
+                    batch.send_text(tick)
+
+        :param bool compress: Send messages in compressed form, if
+            compression is enabled on the server.
+
+        """
+        return Batch(self, compress=compress)
 
     def _send_close(self, code, reason):
         """Send a close frame."""
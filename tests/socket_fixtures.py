@@ -8,6 +8,8 @@ import threading
 
 from lomond import constants
 from lomond.frame import Frame
+from lomond.frame_parser import FastFrameParser
+from lomond.mask import mask_payload
 from lomond.opcode import Opcode
 
 
@@ -176,6 +178,109 @@ class LocalWebSocketServer(object):
                 pass
 
 
+class LocalEchoServer(object):
+    """Echoes each frame back to the client, unmasked.
+
+    Negotiates permessage-deflate if the client requests it. Compressed
+    frames are echoed as received, which the client may decompress as
+    its compressor and decompressor see the same sequence of messages.
+
+    """
+
+    def __init__(self, port):
+        self.port = port
+        self._server = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(('127.0.0.1', self.port))
+        self._server.listen(16)
+        self._server.settimeout(0.2)
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._server is not None:
+            try:
+                self._server.close()
+            except Exception:
+                pass
+        if self._thread is not None:
+            self._thread.join(1.0)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                conn, _addr = self._server.accept()
+            except socket.timeout:
+                continue
+            except Exception:
+                return
+            thread = threading.Thread(
+                target=self._handle_connection, args=(conn,)
+            )
+            thread.daemon = True
+            thread.start()
+
+    def _handle_connection(self, conn):
+        try:
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            request_headers = _recv_until(conn, b'\r\n\r\n')
+            response = _handshake_response(request_headers)
+            if response is None:
+                return
+            parser = FastFrameParser(parse_headers=False, validate=False)
+            # Payloads are masked, so text can't be validated
+            parser.enable_compression()
+            if b'permessage-deflate' in request_headers.lower():
+                response = (
+                    response[:-2] +
+                    b'Sec-WebSocket-Extensions: permessage-deflate\r\n\r\n'
+                )
+            conn.sendall(response)
+            while not self._stopped.is_set():
+                data = conn.recv(256 * 1024)
+                if not data:
+                    return
+                output = []
+                closed = False
+                for frame in parser.feed(data):
+                    payload = bytearray(frame.payload)
+                    if frame.mask:
+                        mask_payload(frame.masking_key, payload)
+                    opcode = frame.opcode
+                    if opcode == Opcode.PONG:
+                        continue
+                    if opcode == Opcode.PING:
+                        opcode = Opcode.PONG
+                    output.append(Frame.build(
+                        opcode,
+                        payload,
+                        fin=frame.fin,
+                        rsv1=frame.rsv1,
+                        mask=False
+                    ))
+                    if opcode == Opcode.CLOSE:
+                        closed = True
+                        break
+                if output:
+                    conn.sendall(b''.join(output))
+                if closed:
+                    return
+        except socket.error:
+            pass
+        finally:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
 class LocalHTTPServer(object):
     def __init__(self, port):
         self.port = port
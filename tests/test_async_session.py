@@ -0,0 +1,212 @@
+from __future__ import unicode_literals
+
+from base64 import b64encode
+from hashlib import sha1
+import re
+import sys
+import time
+
+import pytest
+
+from lomond import constants
+from lomond.dns import DNSCache
+from lomond.websocket import WebSocket
+
+
+pytestmark = pytest.mark.skipif(
+    sys.version_info < (3, 7), reason='requires Python 3.7+'
+)
+
+
+def _make_server_protocol(asyncio, frames):
+    """A server protocol that sends `frames` after the handshake, and
+    disconnects when the client sends a close frame.
+
+    """
+
+    class ServerProtocol(asyncio.Protocol):
+        def connection_made(self, transport):
+            self.transport = transport
+            self.data = b''
+            self.upgraded = False
+
+        def data_received(self, data):
+            self.data += data
+            if not self.upgraded and b'\r\n\r\n' in self.data:
+                self.upgraded = True
+                key = re.search(
+                    br'Sec-WebSocket-Key: (\S+)', self.data
+                ).group(1)
+                accept = b64encode(sha1(key + constants.WS_KEY).digest())
+                self.data = self.data.split(b'\r\n\r\n', 1)[1]
+                self.transport.write(
+                    b'HTTP/1.1 101 Switching Protocols\r\n'
+                    b'Upgrade: websocket\r\n'
+                    b'Connection: Upgrade\r\n'
+                    b'Sec-WebSocket-Accept: ' + accept + b'\r\n'
+                    b'\r\n' + b''.join(frames)
+                )
+            # Small masked frames from the client
+            while self.upgraded and len(self.data) >= 2:
+                header = bytearray(self.data[:2])
+                if header[0] & 0x0f == 8:
+                    self.transport.close()
+                self.data = self.data[6 + (header[1] & 0x7f):]
+
+    return ServerProtocol
+
+
+def _run_events(loop, websocket, **kwargs):
+    """Get events from connect_async."""
+    run = websocket.connect_async(**kwargs)
+    _events = []
+    while True:
+        try:
+            _events.append(loop.run_until_complete(run.__anext__()))
+        except StopAsyncIteration:
+            return _events
+
+
+@pytest.fixture
+def loop():
+    import asyncio
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def _start_server(loop, frames):
+    import asyncio
+    server = loop.run_until_complete(
+        loop.create_server(
+            _make_server_protocol(asyncio, frames), '127.0.0.1', 0
+        )
+    )
+    return server, server.sockets[0].getsockname()[1]
+
+
+def test_run_async(loop):
+    server, port = _start_server(loop, [b'\x81\x05hello', b'\x88\x02\x03\xe8'])
+    websocket = WebSocket('ws://127.0.0.1:{}/'.format(port), proxies={})
+    _events = [
+        event for event in _run_events(loop, websocket, ping_rate=0)
+        if event.name != 'poll'
+    ]
+    assert [event.name for event in _events] == [
+        'connecting',
+        'connected',
+        'ready',
+        'text',
+        'closing',
+        'disconnected'
+    ]
+    assert _events[3].text == 'hello'
+    assert _events[-1].graceful
+    assert websocket.session.buffered_amount == 0
+    server.close()
+
+
+def test_run_async_connect_fail(loop):
+    server, port = _start_server(loop, [])
+    server.close()
+    loop.run_until_complete(server.wait_closed())
+    websocket = WebSocket('ws://127.0.0.1:{}/'.format(port), proxies={})
+    _events = _run_events(loop, websocket)
+    assert [event.name for event in _events] == [
+        'connecting',
+        'connect_fail'
+    ]
+
+
+def test_run_async_dns_cache(loop):
+    server, port = _start_server(loop, [b'\x88\x02\x03\xe8'])
+    dns_cache = DNSCache()
+    websocket = WebSocket(
+        'ws://localhost:{}/'.format(port), proxies={}, dns_cache=dns_cache
+    )
+    _events = _run_events(loop, websocket, ping_rate=0)
+    assert _events[-1].name == 'disconnected'
+    assert len(dns_cache) == 1
+    server.close()
+
+
+def test_run_async_dns_cache_connect_fail(loop):
+    server, port = _start_server(loop, [])
+    server.close()
+    loop.run_until_complete(server.wait_closed())
+    dns_cache = DNSCache()
+    websocket = WebSocket(
+        'ws://127.0.0.1:{}/'.format(port), proxies={}, dns_cache=dns_cache
+    )
+    _events = _run_events(loop, websocket)
+    assert [event.name for event in _events] == [
+        'connecting',
+        'connect_fail'
+    ]
+    # Addresses that couldn't be connected to aren't kept
+    assert len(dns_cache) == 0
+
+
+def test_send_async(loop):
+    server, port = _start_server(loop, [])
+    websocket = WebSocket('ws://127.0.0.1:{}/'.format(port), proxies={})
+    run = websocket.connect_async(ping_rate=0)
+    event = None
+    while event is None or event.name != 'ready':
+        event = loop.run_until_complete(run.__anext__())
+    websocket.send_text('foo')
+    loop.run_until_complete(websocket.session.drain())
+    websocket.close()
+    _events = []
+    while True:
+        try:
+            _events.append(loop.run_until_complete(run.__anext__()))
+        except StopAsyncIteration:
+            break
+    assert _events[-1].name == 'disconnected'
+    server.close()
+
+
+def test_run_async_ping_timeout(loop):
+    # The server never responds to pings
+    server, port = _start_server(loop, [])
+    websocket = WebSocket('ws://127.0.0.1:{}/'.format(port), proxies={})
+    start = time.time()
+    _events = _run_events(
+        loop, websocket, poll=60, ping_rate=0.05, ping_timeout=0.2
+    )
+    # Waits end at the ping timeout, rather than the next poll
+    assert time.time() - start < 30
+    assert 'unresponsive' in [event.name for event in _events]
+    assert _events[-1].name == 'disconnected'
+    server.close()
+
+
+def test_run_async_trace(loop):
+    server, port = _start_server(loop, [b'\x88\x02\x03\xe8'])
+    records = []
+    websocket = WebSocket(
+        'ws://127.0.0.1:{}/'.format(port), proxies={}, trace=records.append
+    )
+    _run_events(loop, websocket, ping_rate=0)
+    assert 'socket_recv' in [record['stage'] for record in records]
+    server.close()
+
+
+def test_run_async_connect_timeout(loop, monkeypatch):
+    import asyncio
+    from lomond.async_session import AsyncWebsocketSession
+
+    def _connect_async(self):
+        # A future rather than a coroutine, so this module parses on Py2
+        future = loop.create_future()
+        future.set_exception(asyncio.TimeoutError())
+        return future
+
+    monkeypatch.setattr(
+        AsyncWebsocketSession, '_connect_async', _connect_async
+    )
+    websocket = WebSocket('ws://127.0.0.1:1/', proxies={})
+    _events = _run_events(loop, websocket)
+    assert [event.name for event in _events] == ['connecting', 'connect_fail']
+    assert _events[-1].reason == 'connect timed out'
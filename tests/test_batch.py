@@ -0,0 +1,50 @@
+from __future__ import unicode_literals
+
+import pytest
+
+from lomond.batch import Batch
+from lomond.websocket import WebSocket
+
+
+class FakeWebSocket(object):
+    def __init__(self):
+        self.sent = []
+
+    def send_many(self, messages, compress=True):
+        self.sent.append((messages, compress))
+
+
+def test_batch():
+    ws = FakeWebSocket()
+    with Batch(ws) as batch:
+        batch.send_text('foo')
+        batch.send_binary(b'bar')
+        assert len(batch) == 2
+        assert repr(batch) == '<batch 2 message(s)>'
+    assert ws.sent == [(['foo', b'bar'], True)]
+    assert len(batch) == 0
+
+
+def test_batch_not_sent_on_error():
+    ws = FakeWebSocket()
+    with pytest.raises(ValueError):
+        with Batch(ws, compress=False) as batch:
+            batch.send_text('foo')
+            raise ValueError('fail')
+    assert ws.sent == []
+
+
+def test_batch_type_errors():
+    batch = Batch(FakeWebSocket())
+    with pytest.raises(TypeError):
+        batch.send_text(b'foo')
+    with pytest.raises(TypeError):
+        batch.send_binary('foo')
+
+
+def test_websocket_batch():
+    ws = WebSocket('ws://example.com')
+    batch = ws.batch(compress=False)
+    assert isinstance(batch, Batch)
+    assert batch.websocket is ws
+    assert not batch.compress
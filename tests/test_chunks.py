@@ -0,0 +1,34 @@
+from __future__ import unicode_literals
+
+import io
+
+from lomond.chunks import iter_chunks, read_chunks
+
+
+def test_read_chunks():
+    chunks = read_chunks(io.BytesIO(b'foobarbaz'), 4)
+    chunk, fin = next(chunks)
+    assert (chunk, fin) == (b'foob', False)
+    buffer = chunk
+    assert next(chunks) == (b'arba', False)
+    # The first buffer is reused
+    assert next(chunks) == (b'z', True)
+    assert buffer == b'zoob'
+    assert list(chunks) == []
+
+
+def test_read_chunks_exact():
+    chunks = list(read_chunks(io.BytesIO(b'foobar'), 3))
+    assert chunks == [(b'foo', False), (b'bar', True)]
+
+
+def test_read_chunks_empty():
+    assert list(read_chunks(io.BytesIO(b''), 4)) == [(b'', True)]
+
+
+def test_iter_chunks():
+    assert list(iter_chunks([b'foo', b'', b'bar', b''])) == [
+        (b'foo', False),
+        (b'bar', True)
+    ]
+    assert list(iter_chunks([])) == [(b'', True)]
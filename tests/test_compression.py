@@ -3,6 +3,7 @@ from __future__ import unicode_literals
 import pytest
 
 from lomond.compression import CompressionParameterError, Deflate
+from lomond.errors import MessageTooLarge
 from lomond.frame import Frame
 
 
@@ -36,3 +37,37 @@ def test_compression():
         compressed_data = deflate.compress(raw)
         frames = [Frame(1, compressed_data, fin=1)]
         assert deflate.decompress(frames) == raw
+
+
+def test_compress_chunks():
+    deflate = Deflate(15, 15, True, True)
+    chunks = [b'Hello ', b'World!', b'']
+    frames = [
+        Frame(1, deflate.compress_chunk(chunk, fin=index == 2))
+        for index, chunk in enumerate(chunks)
+    ]
+    assert deflate.decompress(frames) == b'Hello World!'
+
+
+def test_decompress_max_size():
+    deflate = Deflate(15, 15, False, False)
+    raw = b'\x00' * 1000000
+    compressed = deflate.compress(raw)
+    assert len(compressed) < 2000
+    frames = [Frame(1, compressed, fin=1)]
+    with pytest.raises(MessageTooLarge) as e:
+        deflate.decompress(frames, max_size=100000)
+    assert e.value.status == 1009
+    # Exactly at the limit is allowed
+    assert deflate.decompress(frames, max_size=len(raw)) == raw
+
+
+def test_decompress_chunk_max_size():
+    deflate = Deflate(15, 15, False, False)
+    chunks = [deflate.compress_chunk(b'a' * 600) for _ in range(2)]
+    chunks.append(deflate.compress_chunk(b'', fin=True))
+    decompressor = Deflate(15, 15, False, False)
+    # The limit is for the whole message, not each chunk
+    assert len(decompressor.decompress_chunk(chunks[0], max_size=1000)) == 600
+    with pytest.raises(MessageTooLarge):
+        decompressor.decompress_chunk(chunks[1], max_size=1000)
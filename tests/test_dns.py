@@ -0,0 +1,198 @@
+from __future__ import unicode_literals
+
+import socket
+import threading
+
+import pytest
+
+from lomond import dns
+from lomond.dns import DNSCache, get_dns_cache
+
+
+ADDRESSES = [
+    (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('10.0.0.1', 80))
+]
+
+
+class FakeResolver(object):
+    """Returns addresses, or raises errors, and counts lookups."""
+
+    def __init__(self, *results):
+        self.results = list(results) or [ADDRESSES]
+        self.lookups = []
+        self.looked_up = threading.Event()
+
+    def __call__(self, host, port):
+        self.lookups.append((host, port))
+        result = (
+            self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        )
+        self.looked_up.set()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(dns, 'monotonic_time', lambda: now[0])
+    return now
+
+
+def test_get_dns_cache():
+    assert get_dns_cache(None) is None
+    assert get_dns_cache(False) is None
+    assert get_dns_cache(True) is dns.default_cache
+    cache = DNSCache()
+    # An empty cache is still a cache
+    assert get_dns_cache(cache) is cache
+
+
+def test_repr():
+    cache = DNSCache(resolver=FakeResolver())
+    cache.resolve('example.com', 80)
+    assert repr(cache) == '<dns-cache 1 host(s)>'
+
+
+def test_resolve_cached(clock):
+    resolver = FakeResolver()
+    cache = DNSCache(ttl=60, resolver=resolver)
+    assert cache.resolve('example.com', 80) == ADDRESSES
+    clock[0] += 59
+    assert cache.resolve('example.com', 80) == ADDRESSES
+    assert resolver.lookups == [('example.com', 80)]
+    # Keyed on host and port
+    cache.resolve('example.com', 443)
+    assert len(resolver.lookups) == 2
+
+
+def test_resolve_copies(clock):
+    cache = DNSCache(resolver=FakeResolver())
+    cache.resolve('example.com', 80).pop()
+    assert cache.resolve('example.com', 80) == ADDRESSES
+
+
+def test_expired(clock):
+    resolver = FakeResolver()
+    cache = DNSCache(ttl=60, stale_ttl=0, resolver=resolver)
+    cache.resolve('example.com', 80)
+    clock[0] += 61
+    cache.resolve('example.com', 80)
+    assert len(resolver.lookups) == 2
+
+
+def test_negative_cache(clock):
+    error = socket.gaierror(-2, 'Name or service not known')
+    resolver = FakeResolver(error, ADDRESSES)
+    cache = DNSCache(negative_ttl=5, resolver=resolver)
+    for _ in range(2):
+        with pytest.raises(socket.gaierror) as excinfo:
+            cache.resolve('example.com', 80)
+        assert excinfo.value.args == error.args
+    assert len(resolver.lookups) == 1
+    clock[0] += 6
+    assert cache.resolve('example.com', 80) == ADDRESSES
+    assert len(resolver.lookups) == 2
+
+
+def test_no_negative_cache(clock):
+    resolver = FakeResolver(socket.gaierror(-2, 'fail'), ADDRESSES)
+    cache = DNSCache(negative_ttl=0, resolver=resolver)
+    with pytest.raises(socket.gaierror):
+        cache.resolve('example.com', 80)
+    assert cache.resolve('example.com', 80) == ADDRESSES
+
+
+def test_stale_while_revalidate(clock):
+    new_addresses = [
+        (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('10.0.0.2', 80))
+    ]
+    resolver = FakeResolver(ADDRESSES, new_addresses)
+    cache = DNSCache(ttl=60, stale_ttl=300, resolver=resolver)
+    cache.resolve('example.com', 80)
+    resolver.looked_up.clear()
+    clock[0] += 100
+    # Stale addresses are returned, and refreshed in the background
+    assert cache.resolve('example.com', 80) == ADDRESSES
+    assert resolver.looked_up.wait(5)
+    for _ in range(100):
+        if cache.resolve('example.com', 80) == new_addresses:
+            break
+        threading.Event().wait(0.01)
+    assert cache.resolve('example.com', 80) == new_addresses
+    assert len(resolver.lookups) == 2
+
+
+def test_stale_refresh_fails(clock):
+    resolver = FakeResolver(ADDRESSES, socket.gaierror(-3, 'fail'))
+    cache = DNSCache(ttl=60, negative_ttl=5, stale_ttl=300, resolver=resolver)
+    cache.resolve('example.com', 80)
+    clock[0] += 100
+    resolver.looked_up.clear()
+    cache.resolve('example.com', 80)
+    assert resolver.looked_up.wait(5)
+    # The stale addresses are still used, and not refreshed again until
+    # negative_ttl has elapsed
+    for _ in range(100):
+        if cache._entries[('example.com', 80)].refresh_at < float('inf'):
+            break
+        threading.Event().wait(0.01)
+    assert cache.resolve('example.com', 80) == ADDRESSES
+    assert len(resolver.lookups) == 2
+    # Once too stale, lookups are no longer from the cache
+    clock[0] += 300
+    with pytest.raises(socket.gaierror):
+        cache.resolve('example.com', 80)
+
+
+def test_concurrent_lookups(clock):
+    release = threading.Event()
+    lookups = []
+
+    def resolver(host, port):
+        lookups.append((host, port))
+        release.wait(5)
+        return ADDRESSES
+
+    cache = DNSCache(resolver=resolver)
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(cache.resolve('example.com', 80))
+        )
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == [ADDRESSES] * 4
+    assert lookups == [('example.com', 80)]
+
+
+def test_invalidate(clock):
+    resolver = FakeResolver()
+    cache = DNSCache(resolver=resolver)
+    cache.resolve('example.com', 80)
+    cache.invalidate('example.com', 80)
+    cache.invalidate('example.org', 80)
+    cache.resolve('example.com', 80)
+    assert len(resolver.lookups) == 2
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_max_size(clock):
+    cache = DNSCache(ttl=60, stale_ttl=0, max_size=2, resolver=FakeResolver())
+    cache.resolve('a.example.com', 80)
+    clock[0] += 61
+    cache.resolve('b.example.com', 80)
+    # Expired entries are evicted first
+    cache.resolve('c.example.com', 80)
+    assert sorted(host for host, _ in cache._entries) == [
+        'b.example.com', 'c.example.com'
+    ]
+    cache.resolve('d.example.com', 80)
+    assert len(cache) == 2
@@ -36,6 +36,13 @@ test_cases = [
     (events.Ping('o |'), "Ping(data='o |')"),
     (events.Pong('  | o'), "Pong(data='  | o')"),
     (events.BackOff(0.1), "BackOff(delay=0.1)"),
+    (
+        events.Latency(0.01, 0.005, 0.0075, 0.01),
+        "Latency(rtt=10.0ms, min=5.0ms, avg=7.5ms, p99=10.0ms)"
+    ),
+    (events.BufferFull(1024), "BufferFull(buffered_amount=1024)"),
+    (events.BufferDrained(0), "BufferDrained(buffered_amount=0)"),
+    (events.TextChunk('A', False), "TextChunk(text='A', fin=False)"),
     (events.ProtocolError('error', critical=False), "ProtocolError(error='error', critical=False)")
 ]
 
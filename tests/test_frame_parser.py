@@ -3,20 +3,37 @@
 import pytest
 
 from lomond.frame import Frame
-from lomond.frame_parser import ClientFrameParser, FrameParser
+from lomond.frame_parser import (
+    ClientFrameParser,
+    DECODE_TEXT,
+    FastClientFrameParser,
+    FastFrameParser,
+    FrameParser
+)
 from lomond.opcode import Opcode
-from lomond.parser import ParseError
-from lomond.errors import PayloadTooLarge, ProtocolError
+from lomond.parser import ParseEOF, ParseError
+from lomond.errors import MessageTooLarge, PayloadTooLarge, ProtocolError
 
 
-def test_default_constructor():
+# Tests are run against both parser implementations
+@pytest.fixture(params=[FrameParser, FastFrameParser])
+def parser_class(request):
+    return request.param
+
+
+@pytest.fixture(params=[ClientFrameParser, FastClientFrameParser])
+def client_parser_class(request):
+    return request.param
+
+
+def test_default_constructor(parser_class):
     # not really profound, but nevertheless .
-    parser = FrameParser()
+    parser = parser_class()
     str(parser)
     assert isinstance(parser, FrameParser)
 
 
-def test_parse_valid_frames():
+def test_parse_valid_frames(parser_class):
     # let's construct a very simple frame, with Opcode.TEXT, of length=1
     # so:
     # 1   0 0 0   0001 | 1 000001 |
@@ -34,7 +51,7 @@ def test_parse_valid_frames():
     # the above frame yields 7 bytes:
 
     data = b'\x81\x81\x00\x00\x00\x00A'
-    parser = FrameParser(parse_headers=False, validate=False)
+    parser = parser_class(parse_headers=False, validate=False)
     parsed = list(parser.feed(data))
 
     assert len(parsed) == 1
@@ -43,7 +60,7 @@ def test_parse_valid_frames():
     assert parsed[0].payload == b'A'
 
 
-def test_frame_with_length_gt_125():
+def test_frame_with_length_gt_125(parser_class):
     # the frame will start exactly the same
     data = b'\x81\xfe\x00\x7e\x00\x00\x00\x00'
     #              ^   ^^^^^
@@ -52,7 +69,7 @@ def test_frame_with_length_gt_125():
     # we also append the actual payload
     data += b'\x41' * 126
 
-    parser = FrameParser(parse_headers=False, validate=False)
+    parser = parser_class(parse_headers=False, validate=False)
     parsed = list(parser.feed(data))
 
     assert len(parsed) == 1
@@ -61,7 +78,7 @@ def test_frame_with_length_gt_125():
     assert parsed[0].payload == b'A' * 126
 
 
-def test_frame_with_length_gt_2__16():
+def test_frame_with_length_gt_2__16(parser_class):
     # please note that we don't actually *have to* construct a payload with
     # length greater than 2**16, we simply need to encode the length as
     # uint64_t for the code to work.
@@ -71,7 +88,7 @@ def test_frame_with_length_gt_2__16():
     #              +----------------------  1 << 7 | 127, then turned into hex
     # we also append the actual payload
     data += b'\x41' * 126
-    parser = FrameParser(parse_headers=False, validate=False)
+    parser = parser_class(parse_headers=False, validate=False)
     parsed = list(parser.feed(data))
     assert len(parsed) == 1
     assert parsed[0].opcode == Opcode.TEXT
@@ -79,7 +96,7 @@ def test_frame_with_length_gt_2__16():
     assert parsed[0].payload == b'A' * 126
 
 
-def test_too_large_payload():
+def test_too_large_payload(parser_class):
     # here we construct the header with 2**63 which is above the limit allowed
     # by the spec.
     data = b'\x81\xff\x80\x00\x00\x00\x00\x00\x00\x00'
@@ -89,13 +106,13 @@ def test_too_large_payload():
     # the payload above is missing the mas bytes, but we don't have to worry
     # about that because the parser will discard the length anyway
     with pytest.raises(PayloadTooLarge):
-        parser = FrameParser(parse_headers=False, validate=False)
+        parser = parser_class(parse_headers=False, validate=False)
         list(parser.feed(data))
 
 
-def test_payload_with_headers():
+def test_payload_with_headers(parser_class):
     data = b'Connection:Keep-Alive\r\nUser-Agent:Test\r\n\r\n\x81\x81\x00\x00\x00\x00A'  # noqa
-    parser = FrameParser(validate=False)
+    parser = parser_class(validate=False)
     parsed = list(parser.feed(data))
 
     assert len(parsed) == 2
@@ -105,9 +122,9 @@ def test_payload_with_headers():
     assert parsed[1].payload == b'A'
 
 
-def test_payload_without_masking_key_set():
+def test_payload_without_masking_key_set(parser_class):
     data = b'\x81\x01A'
-    parser = FrameParser(parse_headers=False, validate=False)
+    parser = parser_class(parse_headers=False, validate=False)
     parsed = list(parser.feed(data))
 
     assert len(parsed) == 1
@@ -115,8 +132,143 @@ def test_payload_without_masking_key_set():
     assert parsed[0].payload == b'A'
 
 
-def test_prohibit_masked_frames():
-    parser = ClientFrameParser()
+def test_prohibit_masked_frames(client_parser_class):
+    parser = client_parser_class()
     frame = Frame(1, b'hello')
     with pytest.raises(ProtocolError):
         parser.on_frame(frame)
+
+
+@pytest.mark.skipif(not DECODE_TEXT, reason='requires text decoding')
+def test_text_is_decoded(parser_class):
+    # 'κό' split across two frames, part way through a code point
+    data = b'\x01\x03\xce\xba\xcf\x80\x01\x8c'
+    parser = parser_class(parse_headers=False)
+    frames = list(parser.feed(data))
+    assert [frame.text for frame in frames] == [u'κ', u'ό']
+
+
+@pytest.mark.skipif(not DECODE_TEXT, reason='requires text decoding')
+def test_text_ending_part_way_through_code_point(parser_class):
+    data = b'\x81\x03ab\xce'
+    parser = parser_class(parse_headers=False)
+    with pytest.raises(ParseError):
+        list(parser.feed(data))
+
+
+def test_max_frame_size(parser_class):
+    parser = parser_class(parse_headers=False, max_frame_size=3)
+    assert len(list(parser.feed(b'\x82\x03foo'))) == 1
+    # Rejected on the header, before the payload is received
+    with pytest.raises(MessageTooLarge) as e:
+        list(parser.feed(b'\x82\x7f\x00\x00\x00\x01\x00\x00\x00\x00'))
+    assert str(e.value) == 'frame exceeds max_frame_size (3 bytes)'
+    assert e.value.status == 1009
+
+
+def test_max_message_size(parser_class):
+    parser = parser_class(parse_headers=False, max_message_size=5)
+    # Control frames don't count towards the message size
+    data = b'\x02\x03foo\x89\x03bar\x80\x02ba\x82\x05hello'
+    assert len(list(parser.feed(data))) == 4
+    with pytest.raises(MessageTooLarge) as e:
+        list(parser.feed(b'\x02\x03foo\x80\x03bar'))
+    assert str(e.value) == 'message exceeds max_message_size (5 bytes)'
+
+
+def _frame_data():
+    """Frames of various sizes, with HTTP headers."""
+    return b''.join([
+        b'HTTP/1.1 101 Switching Protocols\r\n\r\n',
+        Frame(Opcode.TEXT, b'hello', mask=False).to_bytes(),
+        Frame(Opcode.BINARY, b'\x00' * 200, mask=False).to_bytes(),
+        Frame(Opcode.PING, b'', mask=False).to_bytes(),
+        Frame(Opcode.TEXT, u'κό'.encode('utf-8'), fin=0, mask=False).to_bytes(),
+        Frame(Opcode.CONTINUATION, b'!', mask=False).to_bytes(),
+        Frame(Opcode.BINARY, b'\xff' * 70000, mask=False).to_bytes(),
+    ])
+
+
+def _parse(parser, data, step):
+    parsed = []
+    for pos in range(0, len(data), step):
+        for obj in parser.feed(data[pos:pos + step]):
+            if isinstance(obj, Frame):
+                parsed.append(
+                    (obj.opcode, obj.fin, bytes(obj.payload), obj.text)
+                )
+            else:
+                parsed.append(bytes(obj))
+    return parsed
+
+
+@pytest.mark.parametrize('step', [1, 3, 7, 100, 100000])
+def test_fast_parser_matches_parser(step):
+    data = _frame_data()
+    expected = _parse(FrameParser(), data, len(data))
+    assert len(expected) == 7
+    assert _parse(FastFrameParser(), data, step) == expected
+
+
+def test_many_small_frames(parser_class):
+    data = Frame(Opcode.BINARY, b'x', mask=False).to_bytes() * 1000
+    parser = parser_class(parse_headers=False)
+    frames = list(parser.feed(data))
+    assert len(frames) == 1000
+    assert all(frame.payload == b'x' for frame in frames)
+
+
+def test_masked_frame(parser_class):
+    data = Frame(Opcode.BINARY, b'foo', masking_key=b'abcd').to_bytes()
+    parser = parser_class(parse_headers=False)
+    frame, = list(parser.feed(data[:3])) + list(parser.feed(data[3:]))
+    assert frame.mask
+    assert frame.masking_key == b'abcd'
+
+
+def test_get_buffer(parser_class):
+    parser = parser_class(parse_headers=False)
+    data = Frame(Opcode.BINARY, b'\x01' * 1000, mask=False).to_bytes()
+    assert parser.get_buffer(min_size=100) is None
+    assert list(parser.feed(data[:104])) == []
+    assert parser.get_buffer(min_size=1000) is None
+    buffer = parser.get_buffer(min_size=100)
+    assert len(buffer) == 900
+    buffer[:800] = data[104:904]
+    assert list(parser.buffer_updated(800)) == []
+    buffer = parser.get_buffer()
+    assert len(buffer) == 100
+    buffer[:] = data[904:]
+    frame, = list(parser.buffer_updated(100))
+    assert frame.payload == b'\x01' * 1000
+    assert parser.get_buffer(min_size=100) is None
+
+
+def test_invalid_utf8(parser_class):
+    parser = parser_class(parse_headers=False)
+    with pytest.raises(ParseError):
+        list(parser.feed(b'\x81\x02\xff\xff'))
+
+
+def test_headers_too_large(parser_class):
+    parser = parser_class()
+    with pytest.raises(ParseError):
+        for _ in range(20):
+            list(parser.feed(b'x' * 1024))
+
+
+def test_eof(parser_class):
+    parser = parser_class(parse_headers=False)
+    with pytest.raises(ParseEOF):
+        list(parser.feed(b''))
+    assert parser.is_eof
+    with pytest.raises(ParseEOF):
+        list(parser.feed(b'\x81'))
+
+
+def test_reset(parser_class):
+    parser = parser_class(parse_headers=False)
+    assert list(parser.feed(b'\x81\x05he')) == []
+    parser.reset()
+    frame, = parser.feed(b'\x81\x02hi')
+    assert frame.payload == b'hi'
@@ -0,0 +1,136 @@
+from __future__ import unicode_literals
+
+import errno
+import socket
+import sys
+import time
+
+import pytest
+
+from lomond import happy_eyeballs
+from lomond.happy_eyeballs import connect, sort_addresses
+
+
+pytestmark = pytest.mark.skipif(
+    sys.version_info < (3, 4), reason='requires Python 3.4+'
+)
+
+# An address that is never connected to (from TEST-NET-1)
+STALLED = (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('192.0.2.1', 80))
+
+
+class StalledSocket(object):
+    """A socket that never finishes connecting."""
+
+    def __init__(self):
+        # A socket with a full send buffer is never writable
+        self._sock, self._remote = socket.socketpair()
+        self._sock.setblocking(False)
+        try:
+            while True:
+                self._sock.send(b'\x00' * 65536)
+        except socket.error:
+            pass
+        self.closed = False
+
+    def fileno(self):
+        return self._sock.fileno()
+
+    def setblocking(self, flag):
+        pass
+
+    def connect_ex(self, address):
+        return errno.EINPROGRESS
+
+    def close(self):
+        self.closed = True
+        self._sock.close()
+        self._remote.close()
+
+
+@pytest.fixture
+def server():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(5)
+    yield sock
+    sock.close()
+
+
+@pytest.fixture
+def stalled(monkeypatch):
+    stalled_sockets = []
+    create_socket = happy_eyeballs._create_socket
+
+    def _create_socket(family, socktype, proto):
+        # Only the STALLED address has a protocol number here
+        if proto == STALLED[2]:
+            stalled_socket = StalledSocket()
+            stalled_sockets.append(stalled_socket)
+            return stalled_socket
+        return create_socket(family, socktype, proto)
+
+    monkeypatch.setattr(happy_eyeballs, '_create_socket', _create_socket)
+    return stalled_sockets
+
+
+def _address(sock):
+    return (
+        socket.AF_INET, socket.SOCK_STREAM, 0, '', sock.getsockname()
+    )
+
+
+def test_sort_addresses():
+    addresses = [
+        (socket.AF_INET6, 1), (socket.AF_INET6, 2), (socket.AF_INET6, 3),
+        (socket.AF_INET, 4), (socket.AF_INET, 5)
+    ]
+    assert [address[1] for address in sort_addresses(addresses)] == [
+        1, 4, 2, 5, 3
+    ]
+    assert sort_addresses([]) == []
+
+
+def test_connect(server):
+    sock = connect([_address(server)])
+    assert sock.getpeername() == server.getsockname()
+    sock.close()
+
+
+def test_connect_refused(server):
+    # A port that refuses connections
+    refused = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    refused.bind(('127.0.0.1', 0))
+    refused_address = _address(refused)
+    refused.close()
+    with pytest.raises(socket.error):
+        connect([refused_address])
+    # Failed attempts start the next attempt immediately
+    start = time.time()
+    sock = connect([refused_address, _address(server)], attempt_delay=10)
+    assert time.time() - start < 5
+    assert sock.getpeername() == server.getsockname()
+    sock.close()
+
+
+def test_connect_stalled(server, stalled):
+    start = time.time()
+    sock = connect([STALLED, _address(server)], attempt_delay=0.05)
+    # The second attempt is started after the attempt delay, while the
+    # first is still in progress
+    assert time.time() - start < 5
+    assert sock.getpeername() == server.getsockname()
+    assert stalled[0].closed
+    sock.close()
+
+
+def test_connect_timeout(stalled):
+    with pytest.raises(socket.timeout):
+        connect([STALLED, STALLED], attempt_delay=0.01, timeout=0.1)
+    assert len(stalled) == 2
+    assert all(stalled_socket.closed for stalled_socket in stalled)
+
+
+def test_no_addresses():
+    with pytest.raises(socket.error):
+        connect([])
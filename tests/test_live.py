@@ -2,9 +2,16 @@ import lomond
 import pytest
 
 from lomond import events
+from lomond.dns import DNSCache, getaddrinfo
+from lomond.opcode import Opcode
 from lomond.session import WebsocketSession
 from lomond import selectors
-from socket_fixtures import get_free_port, LocalWebSocketServer, LocalHTTPServer
+from socket_fixtures import (
+    get_free_port,
+    LocalEchoServer,
+    LocalHTTPServer,
+    LocalWebSocketServer
+)
 
 
 @pytest.fixture(scope='module')
@@ -29,6 +36,15 @@ def local_idle_ws_url():
     server.stop()
 
 
+@pytest.fixture(scope='module')
+def local_echo_url():
+    port = get_free_port()
+    server = LocalEchoServer(port)
+    server.start()
+    yield 'ws://127.0.0.1:{}/echo'.format(port)
+    server.stop()
+
+
 @pytest.fixture(scope='module')
 def local_http_url():
     port = get_free_port()
@@ -73,6 +89,72 @@ def test_echo_poll(local_idle_ws_url):
     assert polls >= 2
 
 
+@pytest.mark.parametrize('compress', [False, True])
+def test_echo_server(local_echo_url, compress):
+    ws = lomond.WebSocket(
+        local_echo_url, compress=compress, fragment_size=1000
+    )
+    received = []
+    for event in ws.connect(poll=60, ping_rate=0):
+        if event.name == 'ready':
+            assert ws.is_secure is False
+            assert ws.supports_compression == compress
+            ws.send_text(u'hello' * 1000)
+            ws.send_binary(b'world')
+        elif event.name in ('text', 'binary'):
+            received.append(event)
+            if len(received) == 2:
+                ws.close()
+    assert received[0].text == u'hello' * 1000
+    assert received[1].data == b'world'
+    assert event.name == 'disconnected'
+    assert event.graceful
+
+
+def test_echo_server_latency(local_echo_url):
+    ws = lomond.WebSocket(local_echo_url, latency_events=True)
+    latencies = []
+    for event in ws.connect(poll=60, ping_rate=0.05):
+        if event.name == 'latency':
+            latencies.append(event)
+            if len(latencies) == 2:
+                ws.close()
+    assert 0 < latencies[-1].rtt < 1.0
+    assert ws.session.rtt.count == 2
+    assert ws.metrics.ping_rtt.count == 2
+
+
+def test_echo_server_adaptive_ping(local_echo_url):
+    ws = lomond.WebSocket(local_echo_url)
+    names = []
+    for event in ws.connect(
+        poll=60, ping_rate=0.05, ping_timeout=1.0, adaptive_ping=True
+    ):
+        names.append(event.name)
+        if names.count('pong') == 2:
+            ws.close()
+    assert 'unresponsive' not in names
+    assert ws.metrics.messages_sent[Opcode.PING] == 2
+
+
+def test_echo_server_dns_cache(local_echo_url):
+    lookups = []
+
+    def resolver(host, port):
+        lookups.append((host, port))
+        return getaddrinfo(host, port)
+
+    ws = lomond.WebSocket(
+        local_echo_url, dns_cache=DNSCache(resolver=resolver)
+    )
+    for _ in range(2):
+        for event in ws.connect(poll=60):
+            if event.name == 'ready':
+                ws.close()
+        assert event.name == 'disconnected'
+    assert len(lookups) == 1
+
+
 def test_not_ws(local_http_url):
     ws = lomond.WebSocket(local_http_url.replace('http://', 'ws://'))
     _events = list(ws.connect())
@@ -1,3 +1,8 @@
+import os
+
+import pytest
+import six
+
 import lomond.mask
 
 
@@ -19,3 +24,31 @@ def test_masking():
     lomond.mask.mask_payload(key, data)
     # Result should be plain text
     assert data == test
+
+
+@pytest.mark.parametrize('size', [0, 1, 3, 4, 255, 256, 257, 4099, 300001])
+@pytest.mark.parametrize('method_name', [
+    '_mask_int',
+    '_mask_translate_blocks',
+    '_mask_numpy',
+    'mask_payload',
+])
+def test_masking_methods(method_name, size):
+    if method_name == '_mask_int' and six.PY2:
+        pytest.skip('requires int.from_bytes')
+    if method_name == '_mask_numpy' and lomond.mask._get_numpy() is None:
+        pytest.skip('requires numpy')
+    key = b'\xaa\xff\x7f\xf7'
+    test = bytearray(os.urandom(size))
+    expected = bytearray(test)
+    lomond.mask._mask_translate(key, expected)
+    data = bytearray(test)
+    getattr(lomond.mask, method_name)(key, data)
+    assert data == expected
+
+
+def test_xor_tables_are_cached():
+    table = lomond.mask._get_xor_table(0x55)
+    assert bytearray(table) == bytearray(a ^ 0x55 for a in range(256))
+    assert lomond.mask._get_xor_table(0x55) is table
+    assert len(lomond.mask._XOR_TABLES) <= 256
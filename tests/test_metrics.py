@@ -0,0 +1,227 @@
+from __future__ import unicode_literals
+
+import pytest
+
+from lomond.compression import Deflate
+from lomond.frame import Frame
+from lomond.message import Pong
+from lomond.metrics import Histogram, Metrics, RTTEstimator
+from lomond.opcode import Opcode
+from lomond.session import WebsocketSession
+from lomond.stream import WebsocketStream
+from lomond.websocket import WebSocket
+
+
+RESPONSE = b'HTTP/1.1 101 Switching Protocols\r\n\r\n'
+
+
+class FakeSocket(object):
+    def __init__(self):
+        self.buffer = b''
+
+    def sendall(self, data):
+        self.buffer += data
+
+
+def server_frame(opcode, payload, fin=1, rsv1=0):
+    return Frame(
+        opcode, payload=payload, fin=fin, rsv1=rsv1, mask=False
+    ).to_bytes()
+
+
+@pytest.fixture(params=[False, True], ids=['parser', 'fast_parser'])
+def fast_parser(request):
+    return request.param
+
+
+def test_histogram():
+    histogram = Histogram([1, 10, 100])
+    for value in [0, 1, 5, 10, 50, 1000]:
+        histogram.observe(value)
+    assert histogram.counts == [2, 2, 1, 1]
+    assert histogram.count == 6
+    assert histogram.sum == 1066
+    assert histogram.snapshot() == {
+        'count': 6,
+        'sum': 1066,
+        'buckets': [(1, 2), (10, 4), (100, 5), (float('inf'), 6)]
+    }
+    assert repr(histogram) == '<histogram count=6 sum=1066>'
+    histogram.reset()
+    assert histogram.counts == [0, 0, 0, 0]
+    assert histogram.count == 0
+
+
+def test_metrics_snapshot():
+    metrics = Metrics()
+    snapshot = metrics.snapshot()
+    assert snapshot['bytes_sent'] == 0
+    assert snapshot['frames_received'] == {
+        'continuation': 0,
+        'text': 0,
+        'binary': 0,
+        'close': 0,
+        'ping': 0,
+        'pong': 0
+    }
+    assert snapshot['ping_rtt']['count'] == 0
+    assert repr(metrics) == '<metrics 0 byte(s) sent, 0 byte(s) received>'
+
+
+def test_metrics_reset():
+    metrics = Metrics()
+    metrics.bytes_sent = 10
+    metrics.on_message_sent(Opcode.TEXT, 10)
+    metrics.reset()
+    assert metrics.bytes_sent == 0
+    assert metrics.messages_sent[Opcode.TEXT] == 0
+    assert metrics.message_size_sent.count == 0
+
+
+def test_reconnects():
+    metrics = Metrics()
+    assert metrics.reconnects == 0
+    metrics.connects = 1
+    assert metrics.reconnects == 0
+    metrics.connects = 3
+    assert metrics.snapshot()['reconnects'] == 2
+
+
+def test_rtt_estimator():
+    estimator = RTTEstimator(window=100)
+    assert estimator.min is None
+    assert estimator.avg is None
+    assert estimator.p99 is None
+    assert repr(estimator) == '<rtt no samples>'
+    for rtt in range(1, 201):
+        estimator.add(rtt / 1000.0)
+    assert estimator.count == 200
+    assert estimator.last == 0.2
+    # Only the most recent samples are kept
+    assert estimator.min == 0.101
+    assert estimator.avg == pytest.approx(0.1505)
+    assert estimator.p99 == 0.2
+    assert repr(estimator) == '<rtt min=101.0ms avg=150.5ms p99=200.0ms>'
+
+
+def test_control_messages_not_in_size_histogram():
+    metrics = Metrics()
+    metrics.on_message_sent(Opcode.PING, 4)
+    assert metrics.messages_sent[Opcode.PING] == 1
+    assert metrics.message_size_sent.count == 0
+
+
+@pytest.mark.parametrize('stream_messages', [False, True])
+def test_stream_counts(fast_parser, stream_messages):
+    stream = WebsocketStream(
+        fast_parser=fast_parser, stream_messages=stream_messages
+    )
+    data = (
+        RESPONSE +
+        server_frame(Opcode.TEXT, b'foo', fin=0) +
+        server_frame(Opcode.PING, b'ping') +
+        server_frame(Opcode.CONTINUATION, b'bar') +
+        server_frame(Opcode.BINARY, b'\x00' * 100)
+    )
+    list(stream.feed(data))
+    metrics = stream.metrics
+    assert metrics.frames_received[Opcode.TEXT] == 1
+    assert metrics.frames_received[Opcode.CONTINUATION] == 1
+    assert metrics.frames_received[Opcode.PING] == 1
+    assert metrics.frames_received[Opcode.BINARY] == 1
+    assert metrics.messages_received[Opcode.TEXT] == 1
+    assert metrics.messages_received[Opcode.PING] == 1
+    assert metrics.messages_received[Opcode.BINARY] == 1
+    assert metrics.messages_received[Opcode.CONTINUATION] == 0
+    assert metrics.message_size_received.count == 2
+    assert metrics.message_size_received.sum == 106
+
+
+@pytest.mark.parametrize('stream_messages', [False, True])
+def test_stream_compressed_counts(fast_parser, stream_messages):
+    stream = WebsocketStream(
+        fast_parser=fast_parser, stream_messages=stream_messages
+    )
+    stream.set_compression(Deflate(15, 15, False, False))
+    payload = b'Hello, World! ' * 100
+    compressed = Deflate(15, 15, False, False).compress(payload)
+    list(stream.feed(
+        RESPONSE + server_frame(Opcode.BINARY, compressed, rsv1=1)
+    ))
+    metrics = stream.metrics
+    assert metrics.compressed_bytes_received == len(compressed)
+    assert metrics.raw_bytes_received == len(payload)
+    assert metrics.message_size_received.sum == len(compressed)
+
+
+def test_websocket_metrics(fast_parser):
+    websocket = WebSocket('ws://example.com/', fast_parser=fast_parser)
+    metrics = websocket.metrics
+    assert websocket.stream.metrics is metrics
+    websocket.reset()
+    # Metrics are kept over connections
+    assert websocket.metrics is metrics
+    assert websocket.stream.metrics is metrics
+    session = WebsocketSession(websocket)
+    assert session.metrics is metrics
+
+
+def test_session_send_counts():
+    websocket = WebSocket('ws://example.com/')
+    session = WebsocketSession(websocket)
+    websocket.state.session = session
+    session._sock = FakeSocket()
+    websocket.send_text('foo')
+    session.send_fragments(Opcode.BINARY, b'\x00' * 10, 4)
+    session.send_chunks(Opcode.BINARY, iter([(b'ab', 0), (b'cd', 1)]))
+    websocket.send_many(['a', b'b'])
+    websocket.send_ping(b'')
+    metrics = websocket.metrics
+    assert metrics.bytes_sent == len(session._sock.buffer)
+    assert metrics.frames_sent[Opcode.TEXT] == 2
+    assert metrics.frames_sent[Opcode.BINARY] == 3
+    assert metrics.frames_sent[Opcode.CONTINUATION] == 3
+    assert metrics.frames_sent[Opcode.PING] == 1
+    assert metrics.messages_sent[Opcode.TEXT] == 2
+    assert metrics.messages_sent[Opcode.BINARY] == 3
+    assert metrics.messages_sent[Opcode.PING] == 1
+    assert metrics.message_size_sent.count == 5
+    assert metrics.message_size_sent.sum == 3 + 10 + 4 + 1 + 1
+    assert metrics.send_lock_wait.count == 8
+
+
+def test_session_compressed_counts():
+    websocket = WebSocket('ws://example.com/')
+    session = WebsocketSession(websocket)
+    websocket.state.session = session
+    websocket.state.compression = Deflate(15, 15, False, False)
+    session._sock = FakeSocket()
+    payload = b'Hello, World! ' * 100
+    websocket.send_binary(payload)
+    metrics = websocket.metrics
+    assert metrics.raw_bytes_sent == len(payload)
+    assert 0 < metrics.compressed_bytes_sent < len(payload)
+    assert metrics.message_size_sent.sum == metrics.compressed_bytes_sent
+
+
+def test_latency_event():
+    websocket = WebSocket('ws://example.com/', latency_events=True)
+    session = WebsocketSession(websocket)
+    websocket.state.session = session
+    payload = session._make_ping_payload()
+    events = list(websocket._on_messages(iter([Pong(payload), Pong(b'')])))
+    assert [event.name for event in events] == ['pong', 'latency', 'pong']
+    latency = events[1]
+    assert latency.rtt == session.rtt.last
+    assert latency.min == latency.avg == latency.p99 == latency.rtt
+    assert websocket.metrics.ping_rtt.count == 1
+
+
+def test_no_latency_event():
+    websocket = WebSocket('ws://example.com/')
+    session = WebsocketSession(websocket)
+    websocket.state.session = session
+    payload = session._make_ping_payload()
+    events = list(websocket._on_messages(iter([Pong(payload)])))
+    assert [event.name for event in events] == ['pong']
+    assert session.rtt.count == 1
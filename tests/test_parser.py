@@ -1,8 +1,11 @@
 import types
 
 import pytest
+from six import PY2
 
-from lomond.parser import ParseEOF, ParseError, ParseOverflow, Parser
+from lomond.parser import (
+    ParseEOF, ParseError, ParseOverflow, Parser, _ReadBytes
+)
 
 
 def test_parser_reset_is_a_generator():
@@ -62,3 +65,90 @@ def test_overflow():
         for data in test_parser.feed(b'foobar'):
             output.append(data)
     assert not output
+
+
+@pytest.mark.skipif(PY2, reason='reads are copied on Python 2')
+def test_read_is_zero_copy():
+    class TestParser(Parser):
+        def parse(self):
+            data = yield self.read(3)
+            yield data
+            data = yield self.read(3)
+            yield data
+
+    buffer = bytearray(b'foobar')
+    test_parser = TestParser()
+    output = list(test_parser.feed(memoryview(buffer)))
+    assert output == [b'foo', b'bar']
+    # Reads contained in a single feed reference the fed data
+    assert all(isinstance(data, memoryview) for data in output)
+    buffer[:3] = b'baz'
+    assert output[0] == b'baz'
+
+
+def test_read_spanning_feeds():
+    class TestParser(Parser):
+        def parse(self):
+            data = yield self.read(6)
+            yield data
+
+    buffer = bytearray(3)
+    test_parser = TestParser()
+    output = []
+    for chunk in (b'foo', b'bar'):
+        buffer[:] = chunk
+        output.extend(test_parser.feed(memoryview(buffer)))
+    # Data is assembled in a buffer owned by the parser
+    assert output == [b'foobar']
+    assert isinstance(output[0], bytearray)
+
+
+def test_get_buffer():
+    class TestParser(Parser):
+        def parse(self):
+            data = yield self.read_until(b'\r\n')
+            yield data
+            data = yield self.read(6)
+            yield data
+
+    test_parser = TestParser()
+    # No buffer while reading until a separator
+    assert test_parser.get_buffer() is None
+    assert list(test_parser.feed(b'head\r\nfo')) == [b'head\r\n']
+    # Too small
+    assert test_parser.get_buffer(5) is None
+    read_buffer = test_parser.get_buffer(4)
+    assert len(read_buffer) == 4
+    read_buffer[:2] = b'ob'
+    assert list(test_parser.buffer_updated(2)) == []
+    read_buffer = test_parser.get_buffer()
+    read_buffer[:2] = b'ar'
+    assert list(test_parser.buffer_updated(2)) == [b'foobar']
+    # Parser is exhausted
+    assert test_parser.get_buffer() is None
+
+
+def test_buffer_updated_validation_error():
+    class _ReadNoX(_ReadBytes):
+        def validate(self, data):
+            if b'x' in bytes(data):
+                raise ParseError('no x')
+
+    class TestParser(Parser):
+        def parse(self):
+            try:
+                yield _ReadNoX(2)
+            except ParseError:
+                yield 'error'
+            data = yield self.read(2)
+            yield data
+
+    test_parser = TestParser()
+    read_buffer = test_parser.get_buffer()
+    read_buffer[:2] = b'xx'
+    # Parsing continues from the value yielded after the error
+    assert list(test_parser.buffer_updated(2)) == ['error']
+    read_buffer = test_parser.get_buffer()
+    assert len(read_buffer) == 2
+    read_buffer[:2] = b'ok'
+    assert list(test_parser.buffer_updated(2)) == [b'ok']
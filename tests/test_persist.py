@@ -1,4 +1,5 @@
 from lomond.persist import persist
+from lomond import dns
 from lomond import events
 from lomond.response import Response
 
@@ -152,3 +153,25 @@ def test_persist_retry_after_can_be_disabled(mocker):
     assert isinstance(yielded_events[2], events.BackOff)
     assert yielded_events[2].delay == 3.0
     assert exit_event.waited == 3.0
+
+
+def test_persist_dns_cache(mocker):
+    mocker.patch('lomond.persist.threading.Event', FakeEvent)
+    websocket = FakeWebSocket()
+    websocket.dns_cache = None
+    list(persist(websocket, dns_cache=True))
+    assert websocket.dns_cache is dns.default_cache
+
+
+def test_persist_adaptive_ping(mocker):
+    mocker.patch('lomond.persist.threading.Event', FakeEvent)
+    calls = []
+
+    def connect(**kwargs):
+        calls.append(kwargs)
+        yield events.ConnectFail('test')
+
+    websocket = FakeWebSocket()
+    websocket.connect = connect
+    list(persist(websocket, adaptive_ping=True))
+    assert calls[0]['adaptive_ping'] is True
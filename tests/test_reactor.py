@@ -0,0 +1,317 @@
+from __future__ import unicode_literals
+
+import socket
+import sys
+import threading
+import time
+
+import pytest
+from six.moves import queue
+
+from lomond import happy_eyeballs
+from lomond.dns import DNSCache
+from lomond.websocket import WebSocket
+from socket_fixtures import get_free_port, LocalWebSocketServer
+from test_happy_eyeballs import STALLED, StalledSocket
+
+
+pytestmark = pytest.mark.skipif(
+    sys.version_info < (3, 4), reason='requires Python 3.4+'
+)
+
+
+@pytest.fixture
+def reactor():
+    from lomond.reactor import Reactor
+    reactor = Reactor()
+    thread = reactor.start()
+    yield reactor
+    reactor.stop()
+    thread.join(5)
+    reactor.close()
+
+
+def _get_events(event_queue, count, timeout=5):
+    """Get events until `count` websockets have disconnected."""
+    _events = []
+    end_events = 0
+    while end_events < count:
+        event = event_queue.get(timeout=timeout)
+        if event.name in ('disconnected', 'connect_fail'):
+            end_events += 1
+        _events.append(event)
+    return _events
+
+
+def test_reactor(reactor):
+    port = get_free_port()
+    server = LocalWebSocketServer(
+        port, messages=[('text', 'hello')], close_after_messages=True
+    )
+    server.start()
+    time.sleep(0.05)
+    event_queue = queue.Queue()
+    callback_events = []
+    websockets = [
+        WebSocket('ws://127.0.0.1:{}/'.format(port), proxies={})
+        for _ in range(2)
+    ]
+    for websocket in websockets:
+        reactor.add(
+            websocket,
+            callback=callback_events.append,
+            event_queue=event_queue,
+            ping_rate=0
+        )
+    _events = _get_events(event_queue, 2)
+    server.stop()
+    # Events are passed to the callback and the queue
+    assert callback_events == _events
+    names = [event.name for event in _events]
+    assert names.count('ready') == 2
+    assert names.count('text') == 2
+    disconnected = [
+        event for event in _events if event.name == 'disconnected'
+    ]
+    assert all(event.graceful for event in disconnected)
+    assert len(reactor) == 0
+    assert not any(websocket.is_active for websocket in websockets)
+
+
+def test_reactor_connect_fail(reactor):
+    event_queue = queue.Queue()
+    websocket = WebSocket(
+        'ws://127.0.0.1:{}/'.format(get_free_port()), proxies={}
+    )
+    session = reactor.add(websocket, event_queue=event_queue)
+    _events = _get_events(event_queue, 1)
+    assert [event.name for event in _events] == ['connecting', 'connect_fail']
+    assert session.is_finished
+    assert repr(reactor) == '<reactor 0 websocket(s)>'
+
+
+def test_reactor_dns_cache(reactor):
+    dns_cache = DNSCache()
+    event_queue = queue.Queue()
+    websocket = WebSocket(
+        'ws://127.0.0.1:{}/'.format(get_free_port()),
+        proxies={},
+        dns_cache=dns_cache
+    )
+    reactor.add(websocket, event_queue=event_queue)
+    _events = _get_events(event_queue, 1)
+    assert _events[-1].name == 'connect_fail'
+    # Addresses that couldn't be connected to aren't kept
+    assert len(dns_cache) == 0
+
+
+def test_reactor_timers(reactor):
+    port = get_free_port()
+    server = LocalWebSocketServer(port)
+    server.start()
+    time.sleep(0.05)
+    event_queue = queue.Queue()
+    websocket = WebSocket('ws://127.0.0.1:{}/'.format(port), proxies={})
+    session = reactor.add(
+        websocket, event_queue=event_queue, poll=0.05, ping_rate=0
+    )
+    names = []
+    while names.count('poll') < 3:
+        names.append(event_queue.get(timeout=5).name)
+    assert names[:3] == ['connecting', 'connected', 'ready']
+    # A single timer for the session
+    assert len(reactor._scheduler) == 1
+    websocket.close()
+    _events = _get_events(event_queue, 1)
+    server.stop()
+    assert _events[-1].name == 'disconnected'
+    assert session.is_finished
+    assert len(reactor._scheduler) == 0
+
+
+def test_reactor_resolve_in_thread(reactor):
+    port = get_free_port()
+    release = threading.Event()
+
+    def resolver(host, port):
+        release.wait(5)
+        return socket.getaddrinfo(
+            host, port, socket.AF_INET, socket.SOCK_STREAM
+        )
+
+    event_queue = queue.Queue()
+    websocket = WebSocket(
+        'ws://127.0.0.1:{}/'.format(port),
+        proxies={},
+        dns_cache=DNSCache(resolver=resolver)
+    )
+    start = time.time()
+    reactor.add(websocket, event_queue=event_queue)
+    # The lookup doesn't block the caller
+    assert time.time() - start < 1
+    assert event_queue.empty()
+    release.set()
+    _events = _get_events(event_queue, 1)
+    assert [event.name for event in _events] == ['connecting', 'connect_fail']
+
+
+def test_reactor_close_from_thread(reactor):
+    port = get_free_port()
+    server = LocalWebSocketServer(port)
+    server.start()
+    time.sleep(0.05)
+    event_queue = queue.Queue()
+    websocket = WebSocket('ws://127.0.0.1:{}/'.format(port), proxies={})
+    session = reactor.add(websocket, event_queue=event_queue, ping_rate=0)
+    while event_queue.get(timeout=5).name != 'ready':
+        pass
+    # Closed by the reactor thread, rather than this thread
+    session.close()
+    _events = _get_events(event_queue, 1)
+    server.stop()
+    assert _events[-1].name == 'disconnected'
+    assert session.is_finished
+    assert len(reactor) == 0
+    # Only the waker is left in the selector
+    assert len(reactor._selector.get_map()) == 1
+
+
+@pytest.fixture
+def stalled(monkeypatch):
+    stalled_sockets = []
+    create_socket = happy_eyeballs._create_socket
+
+    def _create_socket(family, socktype, proto):
+        if proto == STALLED[2]:
+            stalled_socket = StalledSocket()
+            stalled_sockets.append(stalled_socket)
+            return stalled_socket
+        return create_socket(family, socktype, proto)
+
+    monkeypatch.setattr(happy_eyeballs, '_create_socket', _create_socket)
+    return stalled_sockets
+
+
+def test_reactor_connect_stalled(reactor, stalled):
+    port = get_free_port()
+    server = LocalWebSocketServer(port)
+    server.start()
+    time.sleep(0.05)
+
+    def resolver(host, port):
+        return [
+            STALLED,
+            (socket.AF_INET, socket.SOCK_STREAM, 0, '', ('127.0.0.1', port))
+        ]
+
+    event_queue = queue.Queue()
+    websocket = WebSocket(
+        'ws://example.com:{}/'.format(port),
+        proxies={},
+        dns_cache=DNSCache(resolver=resolver)
+    )
+    start = time.time()
+    session = reactor.add(websocket, event_queue=event_queue, ping_rate=0)
+    while event_queue.get(timeout=5).name != 'ready':
+        pass
+    # The next address was tried while the first was still connecting
+    assert time.time() - start < 5
+    assert len(stalled) == 1
+    assert stalled[0].closed
+    websocket.close()
+    _get_events(event_queue, 1)
+    server.stop()
+    assert session.is_finished
+
+
+def test_reactor_connect_timeout(reactor, stalled, monkeypatch):
+    from lomond.reactor import ReactorSession
+    monkeypatch.setattr(ReactorSession, 'CONNECT_TIMEOUT', 0.2)
+    monkeypatch.setattr(ReactorSession, 'CONNECTION_ATTEMPT_DELAY', 0.01)
+    event_queue = queue.Queue()
+    websocket = WebSocket(
+        'ws://example.com/',
+        proxies={},
+        dns_cache=DNSCache(resolver=lambda host, port: [STALLED, STALLED])
+    )
+    reactor.add(websocket, event_queue=event_queue)
+    _events = _get_events(event_queue, 1)
+    assert _events[-1].name == 'connect_fail'
+    assert _events[-1].reason == 'connect timed out'
+    assert len(stalled) == 2
+    assert all(stalled_socket.closed for stalled_socket in stalled)
+
+
+def test_reactor_close_in_callback(reactor):
+    port = get_free_port()
+    server = LocalWebSocketServer(port)
+    server.start()
+    time.sleep(0.05)
+    event_queue = queue.Queue()
+    websocket = WebSocket('ws://127.0.0.1:{}/'.format(port), proxies={})
+
+    def on_event(event):
+        if event.name == 'ready':
+            websocket.session.close()
+
+    session = reactor.add(
+        websocket, callback=on_event, event_queue=event_queue, ping_rate=0
+    )
+    _events = _get_events(event_queue, 1)
+    server.stop()
+    names = [event.name for event in _events]
+    # Closed gracefully
+    assert 'closed' in names
+    assert _events[-1].name == 'disconnected'
+    assert _events[-1].graceful
+    assert session.is_finished
+    assert len(reactor) == 0
+
+
+def test_reactor_force_disconnect_in_callback(reactor):
+    port = get_free_port()
+    server = LocalWebSocketServer(port)
+    server.start()
+    time.sleep(0.05)
+    event_queue = queue.Queue()
+    websocket = WebSocket('ws://127.0.0.1:{}/'.format(port), proxies={})
+
+    def on_event(event):
+        if event.name == 'ready':
+            websocket.force_disconnect()
+
+    session = reactor.add(
+        websocket, callback=on_event, event_queue=event_queue, ping_rate=0
+    )
+    _events = _get_events(event_queue, 1)
+    server.stop()
+    assert [event.name for event in _events][-2:] == ['ready', 'disconnected']
+    assert _events[-1].reason == 'disconnected; force disconnect'
+    assert session.is_finished
+    assert len(reactor) == 0
+
+
+def test_reactor_stop_while_resolving():
+    from lomond.reactor import Reactor
+    reactor = Reactor()
+    thread = reactor.start()
+    release = threading.Event()
+
+    def resolver(host, port):
+        release.wait(5)
+        return []
+
+    event_queue = queue.Queue()
+    websocket = WebSocket(
+        'ws://example.com/', proxies={}, dns_cache=DNSCache(resolver=resolver)
+    )
+    session = reactor.add(websocket, event_queue=event_queue)
+    reactor.stop()
+    thread.join(5)
+    release.set()
+    reactor.close()
+    # Sessions that haven't started still get a final event
+    _events = _get_events(event_queue, 1)
+    assert [event.name for event in _events] == ['connect_fail']
+    assert _events[0].reason == 'reactor stopped'
+    assert session.is_finished
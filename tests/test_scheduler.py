@@ -0,0 +1,113 @@
+from __future__ import unicode_literals
+
+from lomond.scheduler import Scheduler
+
+
+def test_run_in_order():
+    scheduler = Scheduler()
+    calls = []
+    scheduler.call_at(2.0, calls.append, 'b')
+    scheduler.call_at(1.0, calls.append, 'a')
+    scheduler.call_at(2.0, calls.append, 'c')
+    scheduler.call_at(5.0, calls.append, 'd')
+    assert len(scheduler) == 4
+    assert scheduler.run(0.5) == 0
+    assert scheduler.run(2.0) == 3
+    assert calls == ['a', 'b', 'c']
+    assert len(scheduler) == 1
+    assert scheduler.get_deadline() == 5.0
+
+
+def test_cancel():
+    scheduler = Scheduler()
+    calls = []
+    timer = scheduler.call_at(1.0, calls.append, 'a')
+    scheduler.call_at(2.0, calls.append, 'b')
+    scheduler.cancel(timer)
+    scheduler.cancel(timer)
+    assert len(scheduler) == 1
+    assert not timer.active
+    assert scheduler.get_deadline() == 2.0
+    assert scheduler.run(3.0) == 1
+    assert calls == ['b']
+    assert len(scheduler) == 0
+    # Cancelling a timer that has run has no effect
+    scheduler.cancel(timer)
+    scheduler.cancel(None)
+    assert len(scheduler) == 0
+
+
+def test_compact():
+    scheduler = Scheduler()
+    timers = [scheduler.call_at(float(n), len) for n in range(200)]
+    for timer in timers[:150]:
+        scheduler.cancel(timer)
+    assert len(scheduler) == 50
+    assert len(scheduler._heap) < 200
+    assert scheduler.get_deadline() == 150.0
+
+
+def test_get_timeout():
+    scheduler = Scheduler()
+    assert scheduler.get_timeout(10.0) is None
+    assert scheduler.get_timeout(10.0, default=1.0) == 1.0
+    scheduler.call_at(12.0, len)
+    assert scheduler.get_timeout(10.0) == 2.0
+    assert scheduler.get_timeout(13.0) == 0.0
+
+
+def test_reschedule_in_callback():
+    scheduler = Scheduler()
+    calls = []
+
+    def callback():
+        calls.append(len(calls))
+        scheduler.call_at(0.0, callback)
+
+    scheduler.call_at(1.0, callback)
+    # Timers scheduled by callbacks wait for the next run
+    assert scheduler.run(1.0) == 1
+    assert scheduler.run(1.0) == 1
+    assert calls == [0, 1]
+
+
+def test_cancel_in_callback():
+    scheduler = Scheduler()
+    calls = []
+    timer = scheduler.call_at(2.0, calls.append, 'b')
+    scheduler.call_at(1.0, scheduler.cancel, timer)
+    assert scheduler.run(2.0) == 1
+    assert calls == []
+    assert len(scheduler) == 0
+
+
+def test_cancel_deferred_in_callback():
+    scheduler = Scheduler()
+    deferred = []
+
+    def schedule():
+        deferred.extend(scheduler.call_at(0.0, len) for _ in range(100))
+
+    def cancel():
+        for timer in deferred:
+            scheduler.cancel(timer)
+
+    scheduler.call_at(1.0, schedule)
+    scheduler.call_at(1.5, cancel)
+    scheduler.call_at(5.0, len)
+    # Timers scheduled by the first callback are deferred when the
+    # second cancels them
+    assert scheduler.run(2.0) == 2
+    assert len(scheduler) == 1
+    assert scheduler.get_deadline() == 5.0
+    assert len(scheduler) == 1
+    assert scheduler._cancelled == 0
+
+
+def test_repr():
+    scheduler = Scheduler()
+    timer = scheduler.call_at(1.0, len)
+    assert repr(scheduler) == '<scheduler 1 timer(s)>'
+    assert repr(timer) == '<timer 1.000>'
+    scheduler.cancel(timer)
+    assert repr(timer) == '<timer 1.000 inactive>'
@@ -0,0 +1,88 @@
+from __future__ import unicode_literals
+
+import errno
+import socket
+
+import pytest
+
+from lomond.send_queue import SendQueue, would_block
+
+
+class FakeSocket(object):
+    """Accepts up to `capacity` bytes per call to send."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = b''
+
+    def send(self, data):
+        if not self.capacity:
+            raise socket.error(errno.EAGAIN, 'would block')
+        # bytes() of a memoryview is its repr on Py2
+        data = bytes(bytearray(data[:self.capacity]))
+        self.data += data
+        return len(data)
+
+
+class FakeSendmsgSocket(FakeSocket):
+    def sendmsg(self, buffers):
+        return self.send(b''.join(bytes(bytearray(buffer)) for buffer in buffers))
+
+
+class BrokenSocket(object):
+    def send(self, data):
+        raise socket.error(errno.EPIPE, 'broken pipe')
+
+
+def test_watermarks():
+    with pytest.raises(ValueError):
+        SendQueue(high_watermark=10, low_watermark=11)
+    send_queue = SendQueue(high_watermark=8, low_watermark=2)
+    assert send_queue.is_drained
+    assert not send_queue.is_full
+    send_queue.push([b'foo', b'', bytearray(b'barbaz')])
+    assert len(send_queue) == 2
+    assert send_queue.buffered_amount == 9
+    assert send_queue.is_full
+    assert repr(send_queue) == '<send-queue 9 bytes>'
+
+
+def test_send_partial():
+    send_queue = SendQueue()
+    send_queue.push([b'foo', b'barbaz'])
+    sock = FakeSocket(4)
+    assert send_queue.send(sock) == 3
+    assert send_queue.send(sock) == 4
+    assert send_queue.buffered_amount == 2
+    sock.capacity = 0
+    assert send_queue.send(sock) == 0
+    sock.capacity = 4
+    assert send_queue.send(sock) == 2
+    assert sock.data == b'foobarbaz'
+    assert not send_queue
+    assert send_queue.send(sock) == 0
+
+
+def test_send_sendmsg():
+    send_queue = SendQueue()
+    send_queue.push([b'foo', b'barbaz'])
+    sock = FakeSendmsgSocket(5)
+    assert send_queue.send(sock) == 5
+    assert send_queue.buffered_amount == 4
+    send_queue.send_all(sock)
+    assert sock.data == b'foobarbaz'
+    assert send_queue.buffered_amount == 0
+
+
+def test_send_error():
+    send_queue = SendQueue()
+    send_queue.push([b'foo'])
+    with pytest.raises(socket.error):
+        send_queue.send(BrokenSocket())
+    send_queue.clear()
+    assert send_queue.buffered_amount == 0
+
+
+def test_would_block():
+    assert would_block(socket.error(errno.EAGAIN, 'again'))
+    assert not would_block(socket.error(errno.EPIPE, 'broken pipe'))
@@ -1,9 +1,20 @@
+from base64 import b64encode
+from hashlib import sha1
+import errno
 import socket
+import ssl
+import struct
+import threading
 
 import pytest
 from freezegun import freeze_time
 from lomond import errors, events
 from lomond import constants
+from lomond.compression import Deflate
+from lomond.frame_parser import FrameParser
+import lomond.mask
+from lomond.opcode import Opcode
+from lomond.dns import DNSCache
 from lomond.session import WebsocketSession, _ForceDisconnect, _SocketFail
 from lomond.websocket import WebSocket
 
@@ -33,9 +44,15 @@ class FakeSocket(object):
     def settimeout(self, *args):
         pass
 
+    def setblocking(self, *args):
+        pass
+
     def connect(self, *args):
         raise socket.error('fail')
 
+    def connect_ex(self, *args):
+        return errno.ECONNREFUSED
+
     def fileno(self):
         return 999
 
@@ -283,6 +300,79 @@ def test_check_ping_timeout(session, mocker):
     assert session._check_ping_timeout(10, 11)
 
 
+def test_check_adaptive_ping(session, mocker):
+    session._on_ready()
+    session._adaptive_ping = True
+    mocker.patch.object(session.websocket, 'send_ping')
+    session._check_auto_ping(10, 5)
+    assert session.websocket.send_ping.call_count == 0
+    session._check_auto_ping(10, 11)
+    assert session.websocket.send_ping.call_count == 1
+    # Pings continue every ping_rate seconds while there is no data
+    session._check_auto_ping(10, 15)
+    assert session.websocket.send_ping.call_count == 1
+    session._check_auto_ping(10, 22)
+    assert session.websocket.send_ping.call_count == 2
+    # Data received delays the next ping
+    session._last_received = 30.0
+    session._check_auto_ping(10, 35)
+    assert session.websocket.send_ping.call_count == 2
+    session._poll_start = 30.0
+    assert session._get_deadline(60, 10, None, None) == 40.0
+    session._check_auto_ping(10, 41)
+    assert session.websocket.send_ping.call_count == 3
+
+
+def test_check_adaptive_ping_timeout(session):
+    session._on_ready()
+    session._adaptive_ping = True
+    # Any data received counts, not just pongs
+    session._last_received = 5.0
+    assert not session._check_ping_timeout(10, 14)
+    session._poll_start = 5.0
+    assert session._get_deadline(60, 0, 10, None) == 15.0
+    assert session._check_ping_timeout(10, 16)
+
+
+def test_recv_records_last_received(session):
+    sock, remote_sock = socket.socketpair()
+    session._sock = sock
+    session._on_ready()
+    session._adaptive_ping = True
+    session._start_time -= 5.0
+    remote_sock.sendall(b'foo')
+    assert session._recv(10) == b'foo'
+    assert session._last_received >= 5.0
+    sock.close()
+    remote_sock.close()
+
+
+def test_get_deadline(session):
+    session._on_ready()
+    # First poll is due immediately
+    assert session._get_deadline(5, 30, None, None) == 0.0
+    session._poll_start = 0.0
+    session._next_ping = 30.0
+    assert session._get_deadline(5, 30, None, None) == 5.0
+    session._next_ping = 3.0
+    assert session._get_deadline(5, 30, None, None) == 3.0
+    assert session._get_deadline(5, 0, None, None) == 5.0
+    assert session._get_deadline(5, 30, 2, None) == 2.0
+    session.websocket.state.sent_close_time = 0.5
+    assert session._get_deadline(5, 30, 2, 1) == 1.5
+
+
+def test_get_timeout(session):
+    # Before the websocket is ready, wait for the poll time
+    assert session._get_timeout(5, 30, None, None) == 5
+    session._on_ready()
+    session._ready = True
+    assert session._get_timeout(5, 30, None, None) == 0.0
+    session._poll_start = session.session_time
+    session._next_ping = 30.0
+    assert 4.9 < session._get_timeout(5, 30, None, None) <= 5.0
+
+
 def test_recv_no_sock(session):
     session._sock = None
     assert session._recv(1) == b''
@@ -294,6 +384,33 @@ def test_on_pong(session):
     assert session.session_time - session._last_pong < 0.01
 
 
+def test_match_pong(session, monkeypatch):
+    monkeypatch.setattr('lomond.session.monotonic_time', lambda: 100.0)
+    first = session._make_ping_payload()
+    second = session._make_ping_payload()
+    assert len(first) == 12
+    monkeypatch.setattr('lomond.session.monotonic_time', lambda: 100.25)
+    # Pongs that aren't for automatic pings
+    assert session._match_pong(b'') is None
+    assert session._match_pong(b'\x00' * 12) is None
+    assert session._match_pong(b'\x00\x00\x00\x03' + b'\x00' * 8) is None
+    assert session._match_pong(second) == 0.25
+    # Pongs are only counted once, and a late pong is ignored
+    assert session._match_pong(second) is None
+    assert session._match_pong(first) is None
+    assert session.rtt.count == 1
+    assert session.rtt.last == 0.25
+    assert session.metrics.ping_rtt.count == 1
+
+
+def test_auto_ping_payload(session, mocker):
+    session._on_ready()
+    mocker.patch.object(session.websocket, 'send_ping')
+    session._check_auto_ping(10, 12)
+    payload = session.websocket.send_ping.call_args[0][0]
+    assert session._match_pong(payload) is not None
+
+
 def test_context_manager():
     ws = WebSocket('ws://example.com/')
     session = WebsocketSession(ws)
@@ -320,6 +437,66 @@ def test_connect_sock_fail_connect(monkeypatch, session):
         session._connect_sock('google.com', 80)
 
 
+def test_connect_sock_dns_cache(monkeypatch, session):
+    lookups = []
+
+    def resolver(host, port):
+        lookups.append((host, port))
+        return [
+            (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('10.0.0.1', port))
+        ]
+
+    session.websocket.dns_cache = DNSCache(resolver=resolver)
+    monkeypatch.setattr('socket.socket', lambda *args: FakeSocket())
+    for _ in range(2):
+        with pytest.raises(_SocketFail):
+            session._connect_sock('example.com', 80)
+    # The addresses couldn't be connected to, so aren't kept
+    assert lookups == [('example.com', 80)] * 2
+    assert len(session.websocket.dns_cache) == 0
+
+
+def test_connect_sock_tls_fallback(monkeypatch, session):
+    addresses = [
+        (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('10.0.0.1', 443)),
+        (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('10.0.0.2', 443))
+    ]
+    session.websocket.dns_cache = DNSCache(resolver=lambda *args: addresses)
+    attempts = []
+
+    class PeerSocket(FakeSocket):
+        def __init__(self, address):
+            super(PeerSocket, self).__init__()
+            self.address = address
+
+        def getpeername(self):
+            return self.address
+
+    def connect(addresses, **kwargs):
+        attempts.append([address[4] for address in addresses])
+        return PeerSocket(addresses[0][4])
+
+    def wrap_socket(sock, host):
+        if sock.address == ('10.0.0.1', 443):
+            raise ssl.SSLError('handshake failed')
+        return sock
+
+    monkeypatch.setattr('lomond.happy_eyeballs.connect', connect)
+    monkeypatch.setattr(session, '_wrap_socket', wrap_socket)
+    # A failed TLS handshake tries the remaining addresses
+    sock = session._connect_sock('example.com', 443, ssl=True)
+    assert sock.address == ('10.0.0.2', 443)
+    assert attempts == [
+        [('10.0.0.1', 443), ('10.0.0.2', 443)],
+        [('10.0.0.2', 443)]
+    ]
+    # And fails if none are left
+    addresses.pop()
+    session.websocket.dns_cache.clear()
+    with pytest.raises(_SocketFail):
+        session._connect_sock('example.com', 443, ssl=True)
+
+
 def test_sock_recv(session):
     session._sock = FakeSocket()
     with pytest.raises(_SocketFail):
@@ -403,3 +580,224 @@ def test_session_time_uses_monotonic_clock(monkeypatch, session):
     session._on_ready()
     t['now'] = 103.5
     assert session.session_time == 3.5
+
+
+def test_read_large_payload_direct(session):
+    sock, server_sock = socket.socketpair()
+    session._sock = sock
+    session.websocket.state.session = session
+    accept = b64encode(sha1(session.websocket.key + constants.WS_KEY).digest())
+    payload = b'\x01' * (session.BUFFER_SIZE * 3)
+    server_sock.sendall(
+        b'HTTP/1.1 101 Switching Protocols\r\n'
+        b'Upgrade: websocket\r\n'
+        b'Connection: Upgrade\r\n'
+        b'Sec-WebSocket-Accept: ' + accept + b'\r\n'
+        b'\r\n'
+        b'\x82\x7f' + struct.pack('!Q', len(payload)) + payload[:100]
+    )
+    _events = []
+    while not _events:
+        _events.extend(session._read(session.BUFFER_SIZE))
+    assert _events[0].name == 'ready'
+
+    # Remaining payload is received directly in to the frame buffer
+    server_sock.sendall(payload[100:])
+    read_buffer = session.websocket.get_buffer(session.BUFFER_SIZE)
+    assert len(read_buffer) == len(payload) - 100
+    while not _events[1:]:
+        _events.extend(session._read(session.BUFFER_SIZE))
+    assert _events[1].name == 'binary'
+    assert _events[1].data == payload
+    sock.close()
+    server_sock.close()
+
+
+def _recv_all(sock, size):
+    data = b''
+    while len(data) < size:
+        data += sock.recv(size - len(data))
+    return data
+
+
+@pytest.mark.skipif(
+    not hasattr(socket.socket, 'sendmsg'), reason='requires sendmsg'
+)
+def test_send_large_frame_with_sendmsg(session, mocker):
+    sock, server_sock = socket.socketpair()
+    session._sock = sock
+    sendmsg = mocker.spy(session, '_sendmsg_all')
+    payload = b'\x01' * (session.JOIN_SIZE * 8)
+    session.send(Opcode.BINARY, payload)
+    assert sendmsg.call_count == 1
+    data = _recv_all(server_sock, 14 + len(payload))
+    assert data[:2] == b'\x82\xff'
+    masking_key = bytearray(data[10:14])
+    unmasked = bytearray(data[14:])
+    lomond.mask.mask_payload(masking_key, unmasked)
+    assert unmasked == payload
+    sock.close()
+    server_sock.close()
+
+
+def test_send_large_frame_without_sendmsg(session):
+    session._sock = FakeSocket()
+    payload = b'\x01' * (session.JOIN_SIZE * 8)
+    session.send(Opcode.BINARY, payload)
+    assert len(session._sock.buffer) == 14 + len(payload)
+    assert session._sock.buffer[:2] == b'\x82\xff'
+
+
+def test_send_small_frame_joined(session, mocker):
+    session._sock = FakeSocket()
+    sendall = mocker.spy(session._sock, 'sendall')
+    session.send(Opcode.TEXT, b'foo')
+    assert sendall.call_count == 1
+    assert len(session._sock.buffer) == 9
+
+
+def test_run_with_queued_writes(session):
+    sock, server_sock = socket.socketpair()
+    session._connect = lambda: (sock, None)
+    websocket = session.websocket
+    websocket.state.session = session
+    run = session.run(
+        ping_rate=0,
+        queue_writes=True,
+        high_watermark=1024,
+        low_watermark=0
+    )
+    assert next(run).name == 'connecting'
+    assert next(run).name == 'connected'
+    request = b''
+    while b'\r\n\r\n' not in request:
+        request += server_sock.recv(4096)
+    accept = b64encode(sha1(websocket.key + constants.WS_KEY).digest())
+    server_sock.sendall(
+        b'HTTP/1.1 101 Switching Protocols\r\n'
+        b'Upgrade: websocket\r\n'
+        b'Connection: Upgrade\r\n'
+        b'Sec-WebSocket-Accept: ' + accept + b'\r\n'
+        b'\r\n'
+    )
+    assert next(run).name == 'ready'
+
+    # More than the socket buffer, so the write can't complete
+    payload = b'\x01' * (1024 * 1024)
+    websocket.send_binary(payload)
+    assert session.buffered_amount > 1024
+    assert websocket.buffered_amount == session.buffered_amount
+    event = next(run)
+    while event.name == 'poll':
+        event = next(run)
+    assert event.name == 'buffer_full'
+    assert event.buffered_amount > 1024
+
+    # The loop sends the remainder when the socket is writable
+    data = []
+    reader = threading.Thread(
+        target=lambda: data.append(_recv_all(server_sock, 14 + len(payload)))
+    )
+    reader.start()
+    event = next(run)
+    while event.name != 'buffer_drained':
+        event = next(run)
+    reader.join()
+    assert event.buffered_amount == 0
+    assert len(data[0]) == 14 + len(payload)
+    run.close()
+    assert session.buffered_amount == 0
+    sock.close()
+    server_sock.close()
+
+
+def test_send_fragments(session):
+    session._sock = FakeSocket()
+    payload = b'\x01' * 10
+    session.send_fragments(Opcode.BINARY, payload, 4, rsv1=1)
+    parser = FrameParser(parse_headers=False, validate=False)
+    frames = list(parser.feed(session._sock.buffer))
+    assert [frame.opcode for frame in frames] == [
+        Opcode.BINARY, Opcode.CONTINUATION, Opcode.CONTINUATION
+    ]
+    assert [frame.fin for frame in frames] == [0, 0, 1]
+    assert [frame.rsv1 for frame in frames] == [1, 0, 0]
+    data = bytearray()
+    for frame in frames:
+        fragment = bytearray(frame.payload)
+        lomond.mask.mask_payload(frame.masking_key, fragment)
+        data += fragment
+    assert data == payload
+
+
+def test_send_control_frame_between_fragments(session):
+    session._sock = FakeSocket()
+    write_buffers = session.write_buffers
+    threads = []
+
+    def write_fragment(buffers):
+        write_buffers(buffers)
+        if not threads:
+            # Another thread sends a pong while a message is being sent
+            thread = threading.Thread(
+                target=session.send, args=(Opcode.PONG, b'')
+            )
+            threads.append(thread)
+            thread.start()
+            thread.join(5)
+            assert not thread.is_alive()
+
+    session.write_buffers = write_fragment
+    session.send_fragments(Opcode.BINARY, b'\x01' * 8, 4)
+    parser = FrameParser(parse_headers=False, validate=False)
+    frames = list(parser.feed(session._sock.buffer))
+    assert [frame.opcode for frame in frames] == [
+        Opcode.BINARY, Opcode.PONG, Opcode.CONTINUATION
+    ]
+
+
+def test_concurrent_compressed_sends(monkeypatch):
+    # Messages must be sent in the order they were compressed, as each
+    # depends on the compressor's state after the previous message
+    monkeypatch.setattr(
+        'lomond.frame.make_masking_key', lambda: b'\x00' * 4
+    )
+    websocket = WebSocket('ws://example.com/')
+    session = WebsocketSession(websocket)
+    websocket.state.session = session
+    websocket.state.compression = Deflate(15, 15, False, False)
+    frames = []
+    session.write_buffers = lambda buffers: frames.append(
+        tuple(bytes(bytearray(buffer)) for buffer in buffers)
+    )
+    texts = [u'message {} '.format(index) * 20 for index in range(200)]
+
+    def send_texts(texts):
+        for text in texts:
+            websocket.send_text(text)
+
+    def send_stream():
+        websocket.send_stream(
+            [u'stream {} '.format(index).encode('utf-8') for index in range(50)]
+        )
+
+    threads = [
+        threading.Thread(target=send_texts, args=(texts[index::4],))
+        for index in range(4)
+    ]
+    threads.append(threading.Thread(target=send_stream))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    decompressor = Deflate(15, 15, False, False)
+    received = []
+    for header, payload in frames:
+        fin = bool(bytearray(header)[0] & 0x80)
+        received.append(decompressor.decompress_chunk(payload, fin=fin))
+    received_texts = [
+        data.decode('utf-8') for data in received
+        if data.startswith(b'message')
+    ]
+    assert sorted(received_texts) == sorted(texts)
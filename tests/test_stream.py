@@ -1,22 +1,28 @@
+# -*- coding: utf-8 -*-
+
 from __future__ import unicode_literals
 
+import struct
+
+from lomond.compression import Deflate
 from lomond.stream import WebsocketStream
-from lomond.errors import CriticalProtocolError, ProtocolError
+from lomond.errors import (
+    CriticalProtocolError, MessageTooLarge, ProtocolError
+)
 from lomond.response import Response
 import pytest
 
 
-@pytest.fixture
-def stream():
-    return WebsocketStream()
+@pytest.fixture(params=[False, True], ids=['parser', 'fast_parser'])
+def stream(request):
+    return WebsocketStream(fast_parser=request.param)
 
 
 
-def test_bad_header():
+def test_bad_header(stream):
     """Test with stupidly large headers."""
     data = b'HTTP/1.1 200 OK\r\nConnection:Keep-Alive\r\nUser-Agent:Test\r\n'
     data += b'F' * 16384
-    stream = WebsocketStream()
     with pytest.raises(CriticalProtocolError):
         list(stream.feed(data))
 
@@ -92,3 +98,112 @@ def test_continuation_frames_validation(stream):
         list(stream.feed(data))
 
     assert str(e.value) == 'continuation frame expected'
+
+
+def test_fragments_survive_buffer_reuse(stream):
+    # The session re-uses its receive buffer, fragments must be copied
+    data = (
+        b'HTTP/1.1 101 Switching Protocols\r\n\r\n'
+        b'\x02\x03foo'
+    )
+    buffer = bytearray(data)
+    messages = list(stream.feed(memoryview(buffer)))
+    assert len(messages) == 1
+    buffer[:] = b'\x80\x03bar' + b'\x00' * (len(data) - 5)
+    messages = list(stream.feed(memoryview(buffer)[:5]))
+    assert len(messages) == 1
+    assert messages[0].is_binary
+    assert messages[0].data == b'foobar'
+
+
+def test_fragmented_text(stream):
+    data = (
+        b'HTTP/1.1 101 Switching Protocols\r\n\r\n'
+        b'\x01\x03\xce\xba\xcf\x80\x01\x8c'
+    )
+    messages = list(stream.feed(data))
+    assert messages[1].is_text
+    assert messages[1].text == 'κό'
+
+
+def test_fragmented_text_with_ping(stream):
+    data = (
+        b'HTTP/1.1 101 Switching Protocols\r\n\r\n'
+        b'\x01\x03foo\x89\x00\x80\x03bar'
+    )
+    messages = list(stream.feed(data))
+    assert messages[1].is_ping
+    assert messages[2].is_text
+    assert messages[2].text == 'foobar'
+
+
+def test_text_ending_part_way_through_code_point(stream):
+    data = (
+        b'HTTP/1.1 101 Switching Protocols\r\n\r\n'
+        b'\x81\x03ab\xce'
+    )
+    with pytest.raises(CriticalProtocolError):
+        list(stream.feed(data))
+
+
+def test_stream_messages():
+    stream = WebsocketStream(stream_messages=True)
+    data = (
+        b'HTTP/1.1 101 Switching Protocols\r\n\r\n'
+        b'\x02\x03foo\x89\x00\x00\x03bar\x80\x00'
+        b'\x01\x03\xce\xba\xcf\x80\x01\x8c'
+    )
+    messages = list(stream.feed(data))[1:]
+    assert [message.is_chunk for message in messages] == [
+        True, False, True, True, True, True
+    ]
+    assert messages[0].is_binary
+    assert (messages[0].data, messages[0].fin) == (b'foo', False)
+    assert messages[1].is_ping
+    assert (messages[2].data, messages[2].fin) == (b'bar', False)
+    assert (messages[3].data, messages[3].fin) == (b'', True)
+    assert messages[4].is_text
+    assert (messages[4].text, messages[4].fin) == ('\u03ba', False)
+    assert (messages[5].text, messages[5].fin) == ('\u03cc', True)
+
+
+def test_stream_messages_continuation_validation():
+    stream = WebsocketStream(stream_messages=True)
+    data = b'HTTP/1.1 101 Switching Protocols\r\n\r\n\x80\x00'
+    with pytest.raises(ProtocolError) as e:
+        list(stream.feed(data))
+    assert str(e.value) == 'continuation frame has nothing to continue'
+
+
+def test_stream_compressed_messages():
+    stream = WebsocketStream(stream_messages=True)
+    stream.set_compression(Deflate(15, 15, False, False))
+    compressor = Deflate(15, 15, False, False)
+    first = compressor.compress_chunk('Hello, '.encode('utf-8'))
+    last = compressor.compress_chunk('World!'.encode('utf-8'), fin=True)
+    data = (
+        b'HTTP/1.1 101 Switching Protocols\r\n\r\n'
+        + b'\x41' + bytearray([len(first)]) + first
+        + b'\x80' + bytearray([len(last)]) + last
+    )
+    messages = list(stream.feed(bytes(data)))[1:]
+    assert [message.text for message in messages] == ['Hello, ', 'World!']
+    assert [message.fin for message in messages] == [False, True]
+
+
+@pytest.mark.parametrize('stream_messages', [False, True])
+def test_compressed_message_too_large(stream_messages):
+    # A small compressed message that inflates beyond max_message_size
+    stream = WebsocketStream(
+        stream_messages=stream_messages, max_message_size=10000
+    )
+    stream.set_compression(Deflate(15, 15, False, False))
+    compressed = Deflate(15, 15, False, False).compress(b'\x00' * 1000000)
+    data = (
+        b'HTTP/1.1 101 Switching Protocols\r\n\r\n'
+        + b'\xc2\x7e' + struct.pack('!H', len(compressed))
+        + compressed
+    )
+    with pytest.raises(MessageTooLarge) as e:
+        list(stream.feed(bytes(data)))
+    assert str(e.value) == 'message exceeds max_message_size (10000 bytes)'
@@ -0,0 +1,160 @@
+from __future__ import unicode_literals
+
+from base64 import b64encode
+from hashlib import sha1
+import logging
+
+from lomond import constants
+from lomond.message import Binary, BinaryChunk, Ping, Pong, Text, TextChunk
+from lomond.opcode import Opcode
+from lomond.trace import Tracer, get_tracer
+from lomond.websocket import WebSocket
+
+
+URL = 'ws://example.com/'
+
+
+def test_get_tracer():
+    assert get_tracer(None) is None
+    assert get_tracer(False) is None
+    tracer = Tracer()
+    assert get_tracer(tracer) is tracer
+    callback = [].append
+    assert get_tracer(callback).callback is callback
+    # A non-callable enables logging of trace records
+    assert get_tracer(True).callback is None
+
+
+def test_repr():
+    assert repr(Tracer(sample_rate=10)) == 'Tracer(None, sample_rate=10)'
+
+
+def test_trace():
+    records = []
+    tracer = Tracer(records.append)
+    tracer.trace(URL, 'unit_test', foo='bar')
+    assert records == [{'stage': 'unit_test', 'url': URL, 'foo': 'bar'}]
+
+
+def test_trace_logs(caplog):
+    with caplog.at_level(logging.DEBUG, logger='lomond'):
+        Tracer().trace(URL, 'unit_test')
+    assert 'TRACE' in caplog.text
+    assert 'unit_test' in caplog.text
+
+
+def test_socket_records():
+    records = []
+    tracer = Tracer(records.append)
+    tracer.socket_send(URL, 10)
+    tracer.socket_recv(URL, 20)
+    assert records == [
+        {'stage': 'socket_send', 'url': URL, 'length': 10},
+        {'stage': 'socket_recv', 'url': URL, 'length': 20},
+    ]
+
+
+def test_message_sent():
+    records = []
+    tracer = Tracer(records.append)
+    tracer.message_sent(URL, Opcode.PING, 0)
+    tracer.message_sent(URL, Opcode.PONG, 1)
+    tracer.message_sent(URL, Opcode.TEXT, 2, True)
+    tracer.message_sent(URL, Opcode.BINARY, 3, False)
+    assert records == [
+        {'stage': 'send_ping', 'url': URL, 'length': 0},
+        {'stage': 'send_pong', 'url': URL, 'length': 1},
+        {'stage': 'send_text', 'url': URL, 'length': 2, 'compressed': True},
+        {
+            'stage': 'send_binary',
+            'url': URL,
+            'length': 3,
+            'compressed': False
+        },
+    ]
+
+
+def test_message_received():
+    records = []
+    tracer = Tracer(records.append)
+    for message in [
+        Ping(b'p'),
+        Pong(b'po'),
+        Binary(b'bin'),
+        Text('text'),
+        BinaryChunk(b'b', False),
+        TextChunk('t', True),
+    ]:
+        tracer.message_received(URL, message)
+    assert records == [
+        {'stage': 'message_ping', 'url': URL, 'length': 1},
+        {'stage': 'message_pong', 'url': URL, 'length': 2},
+        {'stage': 'message_binary', 'url': URL, 'length': 3},
+        {'stage': 'message_text', 'url': URL, 'length': 4},
+        {
+            'stage': 'message_binary_chunk',
+            'url': URL,
+            'length': 1,
+            'fin': False
+        },
+        {'stage': 'message_text_chunk', 'url': URL, 'length': 1, 'fin': True},
+    ]
+
+
+def test_sample_rate():
+    records = []
+    tracer = Tracer(records.append, sample_rate=3)
+    for length in range(9):
+        tracer.socket_recv(URL, length)
+    assert [record['length'] for record in records] == [2, 5, 8]
+    # Changes of state are not sampled
+    tracer.trace(URL, 'disconnected')
+    assert records[-1]['stage'] == 'disconnected'
+
+
+def test_websocket_without_tracer():
+    websocket = WebSocket(URL)
+    assert websocket.tracer is None
+    # Does nothing without a tracer
+    websocket._emit_trace('unit_test')
+
+
+def test_websocket_set_trace():
+    records = []
+    websocket = WebSocket(URL)
+    websocket.trace = records.append
+    assert websocket.tracer.callback == records.append
+    websocket._emit_trace('unit_test')
+    assert records == [{'stage': 'unit_test', 'url': URL}]
+    websocket.trace = None
+    assert websocket.tracer is None
+    websocket._emit_trace('unit_test')
+    assert len(records) == 1
+
+
+def test_websocket_feed_traced():
+    records = []
+    websocket = WebSocket(URL, trace=Tracer(records.append, sample_rate=2))
+    accept = b64encode(sha1(websocket.key + constants.WS_KEY).digest())
+    data = (
+        b'HTTP/1.1 101 Switching Protocols\r\n'
+        b'Upgrade: websocket\r\n'
+        b'Connection: Upgrade\r\n'
+        b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n'
+        b'\x81\x01a\x81\x01b\x82\x01c\x89\x00'
+    )
+    events = list(websocket.feed(data))
+    assert [event.name for event in events] == [
+        'ready', 'text', 'text', 'binary', 'ping'
+    ]
+    # Messages are sampled, the handshake is always traced
+    assert records == [
+        {
+            'stage': 'handshake_ready',
+            'url': URL,
+            'protocol': None,
+            'extensions': []
+        },
+        {'stage': 'message_text', 'url': URL, 'length': 1},
+        {'stage': 'message_ping', 'url': URL, 'length': 0},
+    ]
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import pytest
+import six
+
+from lomond.utf8decoder import Utf8Decoder
+
+
+pytestmark = pytest.mark.skipif(six.PY2, reason='requires Python 3 codec')
+
+
+def test_validate():
+    decoder = Utf8Decoder()
+    data = 'Hello, κόσμε'.encode('utf-8')
+    assert decoder.validate(data) == (True, True, len(data), len(data))
+
+
+def test_validate_split_code_point():
+    decoder = Utf8Decoder()
+    assert decoder.validate(b'ab\xce') == (True, False, 3, 3)
+    assert decoder.validate(b'\xba') == (True, True, 1, 4)
+
+
+@pytest.mark.parametrize('data, index', [
+    (b'a\x80b', 1),
+    (b'ab\xc0', 2),
+    (b'\xf4\x90\x80\x80', 1),
+    # Surrogates are rejected before the sequence is complete
+    (b'\xed\xa0', 1),
+    (b'ab\xed\xa0\x80', 3),
+])
+def test_validate_invalid(data, index):
+    decoder = Utf8Decoder()
+    assert decoder.validate(data) == (False, False, index, index)
+
+
+def test_validate_invalid_across_chunks():
+    decoder = Utf8Decoder()
+    assert decoder.validate(b'abc\xed') == (True, False, 4, 4)
+    assert decoder.validate(b'\xa0\x80') == (False, False, 0, 4)
+
+
+def test_reset():
+    decoder = Utf8Decoder()
+    decoder.validate(b'a\xce')
+    decoder.reset()
+    assert decoder.validate(b'a') == (True, True, 1, 1)
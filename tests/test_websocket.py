@@ -1,11 +1,12 @@
 from base64 import b64decode
+import io
 import logging
 
 import pytest
 from lomond import constants
 from lomond.errors import ProtocolError, HandshakeError
 from lomond.events import Binary, Closed, Ping, Pong, Ready, Text
-from lomond.message import Close
+from lomond.message import BinaryChunk, Close, TextChunk
 from lomond.opcode import Opcode
 from lomond.response import Response
 from lomond.session import WebsocketSession
@@ -25,6 +26,17 @@ class FakeSession(object):
     def send(self, opcode, bytes):
         self.socket_buffer.append((opcode, bytes))
 
+    def send_fragments(self, opcode, data, fragment_size, rsv1=0):
+        self.socket_buffer.append((opcode, data, fragment_size))
+
+    def send_frames(self, frames, compression=None):
+        self.socket_buffer.extend(
+            (frame.opcode, bytes(frame.payload)) for frame in frames
+        )
+
+    def _match_pong(self, data):
+        return None
+
     @property
     def session_time(self):
         _t = self._t
@@ -403,6 +415,18 @@ def test_stream_feed_raising_exceptions(
         )
 
 
+def test_message_too_large(monkeypatch):
+    ws = WebSocket('ws://example.com', max_frame_size=2)
+    ws.state.session = FakeSession()
+    monkeypatch.setattr(ws.state, 'key', b'AAAAAAAAAAAAAAAAAAAAAA==')
+    _events = list(ws.feed(generate_data(b'\x82\x03foo')))
+    assert _events[1].name == 'protocol_error'
+    assert _events[1].error == 'frame exceeds max_frame_size (2 bytes)'
+    opcode, payload = ws.session.socket_buffer[0]
+    assert opcode == Opcode.CLOSE
+    assert payload[:2] == b'\x03\xf1'
+
+
 def test_generator_exit(websocket_with_fake_session, caplog):
     # http://stackoverflow.com/questions/30862196/generatorexit-in-python-generator
     #
@@ -445,3 +469,109 @@ def test_yielding_events_from_on_close(websocket):
     events = list(websocket.feed(data))
     assert len(events) == 2
     assert isinstance(events[1], Closed)
+
+
+def test_send_many(websocket_with_fake_session):
+    ws = websocket_with_fake_session
+    ws.send_many([u'foo', b'bar'])
+    assert ws.session.socket_buffer == [
+        (Opcode.TEXT, b'foo'),
+        (Opcode.BINARY, b'bar')
+    ]
+    ws.send_many([])
+    assert len(ws.session.socket_buffer) == 2
+    with pytest.raises(TypeError):
+        ws.send_many([1])
+
+
+def test_send_fragmented(websocket_with_fake_session):
+    ws = websocket_with_fake_session
+    ws.fragment_size = 4
+    ws.send_binary(b'foo')
+    ws.send_binary(b'foobar')
+    ws.send_text(u'foobar')
+    assert ws.session.socket_buffer == [
+        (Opcode.BINARY, b'foo'),
+        (Opcode.BINARY, b'foobar', 4),
+        (Opcode.TEXT, b'foobar', 4)
+    ]
+
+
+def test_send_many_fragmented(websocket_with_fake_session):
+    ws = websocket_with_fake_session
+    ws.fragment_size = 4
+    ws.send_many([u'foo', b'foobar', b'bar', u'foobar'])
+    assert ws.session.socket_buffer == [
+        (Opcode.TEXT, b'foo'),
+        (Opcode.BINARY, b'foobar', 4),
+        (Opcode.BINARY, b'bar'),
+        (Opcode.TEXT, b'foobar', 4)
+    ]
+
+
+def test_send_stream(websocket, monkeypatch):
+    monkeypatch.setattr(
+        'lomond.frame.make_masking_key', lambda: b'\x00' * 4
+    )
+    session = WebsocketSession(websocket)
+    websocket.state.session = session
+    frames = []
+    session.write_buffers = lambda buffers: frames.append(
+        tuple(bytes(buffer) for buffer in buffers)
+    )
+    websocket.send_stream(io.BytesIO(b'foobar'), chunk_size=4)
+    websocket.send_stream([u'foo', u'bar'], opcode=Opcode.TEXT)
+    assert frames == [
+        (b'\x02\x84\x00\x00\x00\x00', b'foob'),
+        (b'\x80\x82\x00\x00\x00\x00', b'ar'),
+        (b'\x01\x83\x00\x00\x00\x00', b'foo'),
+        (b'\x80\x83\x00\x00\x00\x00', b'bar'),
+    ]
+    with pytest.raises(ValueError):
+        websocket.send_stream([b'foo'], opcode=Opcode.PING)
+
+
+def test_send_stream_leaves_chunks_unmasked(websocket, monkeypatch):
+    monkeypatch.setattr(
+        'lomond.frame.make_masking_key', lambda: b'\xff' * 4
+    )
+    session = WebsocketSession(websocket)
+    websocket.state.session = session
+    frames = []
+    session.write_buffers = lambda buffers: frames.append(
+        tuple(bytes(buffer) for buffer in buffers)
+    )
+    chunks = [bytearray(b'foo'), memoryview(bytearray(b'bar'))]
+    websocket.send_stream(chunks)
+    # The caller's buffers aren't masked in place
+    assert chunks[0] == bytearray(b'foo')
+    assert chunks[1].tobytes() == b'bar'
+    assert frames[0][1] == bytes(bytearray(c ^ 0xff for c in bytearray(b'foo')))
+
+
+def test_stream_messages():
+    ws = WebSocket('ws://example.com', stream_messages=True)
+    assert ws.stream.stream_messages
+    ws.reset()
+    assert ws.stream.stream_messages
+    _events = list(ws._on_messages([
+        BinaryChunk(b'foo', False),
+        TextChunk(u'bar', True)
+    ]))
+    assert _events[0].name == 'binary_chunk'
+    assert (_events[0].data, _events[0].fin) == (b'foo', False)
+    assert _events[1].name == 'text_chunk'
+    assert (_events[1].text, _events[1].fin) == (u'bar', True)
+
+
+def test_send_many_writes_once(websocket, mocker):
+    session = WebsocketSession(websocket)
+    websocket.state.session = session
+    write = mocker.patch.object(session, 'write')
+    websocket.send_many([u'foo', b'bar'])
+    assert write.call_count == 1
+    data = write.call_args[0][0]
+    # Two masked frames with 3 byte payloads
+    assert len(data) == 18
+    assert data[0] == 0x81
+    assert data[9] == 0x82